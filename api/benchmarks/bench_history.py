@@ -0,0 +1,98 @@
+"""
+bench_history.py — Memória do histórico em memória: dicts x colunas
+
+Mede com tracemalloc quanto ocupa o histórico completo guardado como um
+dict por linha (formato do get_logs() original: datetime + string da mesma
+data + 5 campos) e como CycleHistory (colunas array por produto), além do
+tempo para montar cada um e para gerar o JSON do /logs.
+
+Uso (a partir de api/):
+    python -m benchmarks.bench_history                # 500k linhas sintéticas
+    python -m benchmarks.bench_history -n 200000
+    python -m benchmarks.bench_history tmp/logs.txt   # arquivo real
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmarks.bench_parser import linhas_sinteticas
+from core.cycle_history import CycleHistory
+from core.log_parser import parse_log_line, parse_log_line_tolerant
+
+
+def medir(nome: str, montar):
+    # tempo sem tracemalloc (que deixa as alocações bem mais lentas), memória numa segunda montagem
+    gc.collect()
+    t0 = time.perf_counter()
+    montar()
+    dt = time.perf_counter() - t0
+    gc.collect()
+    tracemalloc.start()
+    resultado = montar()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nome:<24} {atual / 1e6:9.1f} MB   {dt:7.2f} s")
+    return resultado, atual
+
+
+def logs_json_dicts(registros: list[dict], limite: int = 50) -> bytes:
+    """/logs no formato antigo: agrupa os dicts, ordena e serializa."""
+    produtos: dict[str, list[dict]] = {}
+    for r in registros:
+        produtos.setdefault(r["produto"], []).append(r)
+    saida = {}
+    for prod, logs in produtos.items():
+        logs = sorted(logs, key=lambda r: r["datetime"], reverse=True)
+        saida[prod] = {
+            "media": sum(r["tempo_total"] for r in logs) / len(logs),
+            "logs": [dict(r, datetime=r["datetime"].isoformat()) for r in logs[:limite]],
+        }
+    return json.dumps(saida, sort_keys=True).encode("utf-8")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("arquivo", nargs="?")
+    ap.add_argument("-n", "--linhas", type=int, default=500_000)
+    args = ap.parse_args()
+
+    if args.arquivo:
+        with open(args.arquivo, encoding="utf-8", errors="replace") as f:
+            linhas = [line.strip() for line in f]
+    else:
+        linhas = linhas_sinteticas(args.linhas)
+    print(f"{len(linhas):,} linhas")
+
+    dicts, mem_dicts = medir("dict por linha", lambda: [r for r in map(parse_log_line_tolerant, linhas) if r])
+    t0 = time.perf_counter()
+    json_dicts = logs_json_dicts(dicts)
+    print(f"{'  JSON do /logs':<24} {'':>12}   {time.perf_counter() - t0:7.2f} s")
+    n = len(dicts)
+    del dicts
+
+    def montar_historico():
+        h = CycleHistory()
+        h.add_records(r for r in map(parse_log_line, linhas) if r is not None)
+        return h
+
+    historico, mem_hist = medir("CycleHistory (colunas)", montar_historico)
+    t0 = time.perf_counter()
+    json_hist = historico.logs_json()
+    print(f"{'  JSON do /logs':<24} {'':>12}   {time.perf_counter() - t0:7.2f} s")
+
+    # as duas formas devem produzir o mesmo /logs (a ordem entre ciclos do mesmo segundo pode diferir)
+    a, b = json.loads(json_dicts), json.loads(json_hist)
+    assert a.keys() == b.keys()
+    for prod in a:
+        assert a[prod]["media"] == b[prod]["media"]
+        assert [r["data"] for r in a[prod]["logs"]] == [r["data"] for r in b[prod]["logs"]]
+
+    print(f"bytes por ciclo: {mem_dicts / n:.0f} (dicts) x {mem_hist / n:.0f} (colunas)")
+    print(f"redução: {mem_dicts / mem_hist:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+bench_html.py — Extração da tabela da página de exportação de OPs
+
+Compara o caminho original (BeautifulSoup "html.parser" + soup.text para o
+aviso de "nenhuma ordem") com core.html_table.extract_first_table() sobre
+uma página de exportação salva (benchmarks/data/export_ordens.html).
+
+Uso (a partir de api/):
+    python -m benchmarks.bench_html                  # página de exemplo (300 OPs)
+    python -m benchmarks.bench_html -x 20            # tabela replicada 20x
+    python -m benchmarks.bench_html pagina.html      # outra página salva
+"""
+
+import argparse
+import pathlib
+import time
+
+from bs4 import BeautifulSoup
+
+from core.html_table import EMPTY_RESULT_SENTINEL, extract_first_table, is_empty_result
+
+AMOSTRA = pathlib.Path(__file__).parent / "data" / "export_ordens.html"
+
+
+def extrair_bs4(raw: bytes) -> list[list[str]] | None:
+    """Caminho original de get_orders_by_code."""
+    soup = BeautifulSoup(raw.decode("utf-8", errors="replace"), "html.parser")
+    if EMPTY_RESULT_SENTINEL in soup.text:
+        return None
+    table = soup.find("table")
+    if not table:
+        return None
+    return [[td.text.strip() for td in tr.find_all("td")] for tr in table.find_all("tr")]
+
+
+def extrair_rapido(raw: bytes) -> list[list[str]] | None:
+    if is_empty_result(raw):
+        return None
+    return extract_first_table(raw)
+
+
+def replicar(raw: bytes, vezes: int) -> bytes:
+    """Repete as linhas do <tbody> para simular exportações maiores."""
+    if vezes <= 1:
+        return raw
+    ini = raw.index(b"<tbody>") + len(b"<tbody>")
+    fim = raw.index(b"</tbody>")
+    return raw[:ini] + raw[ini:fim] * vezes + raw[fim:]
+
+
+def medir(nome: str, fn, raw: bytes, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn(raw)
+        melhor = min(melhor, time.perf_counter() - t0)
+    print(f"{nome:<26} {melhor * 1000:9.2f} ms   {len(raw) / melhor / 1e6:8.1f} MB/s")
+    return melhor
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pagina", nargs="?", default=str(AMOSTRA))
+    ap.add_argument("-x", "--replicar", type=int, default=1, help="repete as linhas da tabela N vezes")
+    ap.add_argument("-n", "--repeticoes", type=int, default=5)
+    args = ap.parse_args()
+
+    raw = replicar(pathlib.Path(args.pagina).read_bytes(), args.replicar)
+
+    # confere que os dois caminhos extraem as mesmas células antes de medir
+    assert extrair_bs4(raw) == extrair_rapido(raw)
+
+    linhas = len(extrair_rapido(raw) or [])
+    print(f"{len(raw) / 1024:,.0f} KiB, {linhas:,} linhas na tabela")
+    antigo = medir("BeautifulSoup html.parser", extrair_bs4, raw, args.repeticoes)
+    novo = medir("extract_first_table", extrair_rapido, raw, args.repeticoes)
+    print(f"ganho: {antigo / novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+bench_parser.py — Micro-benchmark do parser de linhas do logs.txt
+
+Compara o parser tolerante (implementação original) com o caminho rápido
+parse_log_line() sobre linhas sintéticas ou sobre um logs.txt real.
+
+Uso (a partir de api/):
+    python -m benchmarks.bench_parser                 # 200k linhas sintéticas
+    python -m benchmarks.bench_parser tmp/logs.txt    # arquivo real
+"""
+
+import datetime
+import random
+import sys
+import time
+
+from core.log_parser import parse_log_line, parse_log_line_tolerant
+
+PRODUTOS = ["TKC110 002 002", "TKC110 002 003", "TKC220 001 001", "TKC330 004 002"]
+
+
+def linhas_sinteticas(n: int) -> list[str]:
+    rnd = random.Random(42)
+    inicio = datetime.datetime(2025, 1, 1, 6, 0, 0)
+    linhas = []
+    segundos = 0
+    for _ in range(n):
+        # várias estações terminando no mesmo segundo é o caso comum
+        segundos += rnd.choice((0, 0, 1, 2, 5))
+        ts = (inicio + datetime.timedelta(seconds=segundos)).strftime("%Y-%m-%d %H:%M:%S")
+        tp, pausa = rnd.randint(30, 600), rnd.randint(0, 120)
+        linhas.append(f"{ts} | {rnd.choice(PRODUTOS)};{tp};{pausa};{tp + pausa};1")
+    return linhas
+
+
+def medir(nome: str, fn, linhas: list[str], repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        for line in linhas:
+            fn(line)
+        melhor = min(melhor, time.perf_counter() - t0)
+    print(f"{nome:<28} {melhor:8.3f} s   {len(linhas) / melhor:12,.0f} linhas/s")
+    return melhor
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8", errors="replace") as f:
+            linhas = [line.strip() for line in f]
+    else:
+        linhas = linhas_sinteticas(200_000)
+
+    # confere que os dois caminhos concordam antes de medir
+    for line in linhas[:1000]:
+        a, b = parse_log_line_tolerant(line), parse_log_line(line)
+        assert (a is None) == (b is None), line
+        if a is not None:
+            assert a["data"] == b.data and a["tempo_total"] == b.tempo_total, line
+
+    print(f"{len(linhas):,} linhas")
+    antigo = medir("parse_log_line_tolerant", parse_log_line_tolerant, linhas)
+    novo = medir("parse_log_line (rápido)", parse_log_line, linhas)
+    print(f"ganho: {antigo / novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
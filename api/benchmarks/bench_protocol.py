@@ -0,0 +1,96 @@
+"""
+bench_protocol.py — Linha de texto x quadro binário no ingest
+
+Mede os bytes por ciclo e o custo de decodificar no servidor os mesmos
+ciclos enviados como linhas de texto com device/seq
+("codigo;tp;pausa;total;qtd;device;seq;epoch;loop_us\\n", decode + split)
+e como quadros binários de core/protocol.py (struct sobre memoryview).
+
+Uso (a partir de api/):
+    python -m benchmarks.bench_protocol               # 200k ciclos, 20 por quadro
+    python -m benchmarks.bench_protocol -n 500000 -l 50
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.bench_parser import PRODUTOS
+from core.dedupe import parse_device_seq
+from core.protocol import FrameRecord, encode_frame, parse_frame
+
+DEVICE = "esp-a1b2c3d4e5f6"
+
+
+def ciclos_sinteticos(n: int) -> list[FrameRecord]:
+    rnd = random.Random(42)
+    epoch = 1_760_000_000
+    ciclos = []
+    for seq in range(1, n + 1):
+        epoch += rnd.choice((0, 1, 2, 5))
+        tp, pausa = rnd.randint(30_000, 600_000), rnd.randint(0, 120_000)
+        ciclos.append(FrameRecord(seq, epoch, tp, pausa, tp + pausa, 1, rnd.randint(200, 5000), rnd.choice(PRODUTOS)))
+    return ciclos
+
+
+def linha_texto(r: FrameRecord) -> bytes:
+    return (
+        f"{r.produto};{r.tempo_producao_ms // 1000};{r.tempo_pausa_ms // 1000};{r.tempo_total_ms // 1000};"
+        f"{r.quantidade};{DEVICE};{r.seq};{r.epoch};{r.loop_us}\n"
+    ).encode("utf-8")
+
+
+def decodificar_texto(linhas: list[bytes]) -> int:
+    n = 0
+    for data in linhas:
+        msg = data.decode("utf-8", errors="ignore").strip()
+        device, seq, epoch = parse_device_seq(msg)
+        partes = msg.split(";")
+        int(partes[1]), int(partes[2]), int(partes[3]), int(partes[4]), int(partes[8])
+        n += 1
+    return n
+
+
+def decodificar_quadros(quadros: list[bytes]) -> int:
+    n = 0
+    for q in quadros:
+        _, registros = parse_frame(q)
+        n += len(registros)
+    return n
+
+
+def medir(nome: str, fn, dados, repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        n = fn(dados)
+        melhor = min(melhor, time.perf_counter() - t0)
+    print(f"{nome:<28} {melhor:8.3f} s   {n / melhor:12,.0f} ciclos/s")
+    return melhor
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--ciclos", type=int, default=200_000)
+    ap.add_argument("-l", "--lote", type=int, default=20, help="ciclos por quadro")
+    args = ap.parse_args()
+
+    ciclos = ciclos_sinteticos(args.ciclos)
+    linhas = [linha_texto(r) for r in ciclos]
+    quadros = [encode_frame(DEVICE, ciclos[i : i + args.lote]) for i in range(0, len(ciclos), args.lote)]
+
+    # o quadro devolve exatamente os ciclos codificados
+    assert [r for q in quadros for r in parse_frame(q)[1]] == ciclos
+
+    bytes_texto = sum(map(len, linhas))
+    bytes_quadro = sum(map(len, quadros))
+    print(f"{len(ciclos):,} ciclos, {args.lote} por quadro")
+    print(f"bytes por ciclo: {bytes_texto / len(ciclos):.1f} (texto) x {bytes_quadro / len(ciclos):.1f} (binário)")
+
+    texto = medir("texto (decode + split)", decodificar_texto, linhas)
+    binario = medir("quadro (struct/memoryview)", decodificar_quadros, quadros)
+    print(f"ganho: {texto / binario:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+bench_startup.py — Tempo de start do servidor (dev e executável do PyInstaller)
+
+Sobe o servidor numa cópia isolada (pasta temporária com tmp/ próprio) e
+mede, a partir do spawn do processo:
+
+ - tcp      primeira conexão aceita na porta TCP
+ - ingest   primeiro "OK" de um registro no formato antigo (escritor ativo)
+ - ready    primeiro 200 do /ready
+ - scraper  login em segundo plano concluído (ok ou falhou), pelo /ready
+
+Modo dev (python main.py) por padrão; --exe mede o build do main.spec
+(a pasta do executável é copiada inteira) e --build roda o pyinstaller
+antes. --logs copia um logs.txt para o tmp/ da cópia (gere com
+`python -m benchmarks.loadgen prefill`) para medir o start com histórico.
+
+As portas são as do main.py (TCP_PORT / FLASK_PORT) e precisam estar
+livres. O registro enviado para medir o ingest fica só na cópia.
+
+Uso (a partir de api/):
+    python -m benchmarks.bench_startup                       # 5 starts, modo dev
+    python -m benchmarks.bench_startup --frio --importtime   # sem __pycache__ + imports mais lentos
+    python -m benchmarks.bench_startup --logs tmp/logs.txt -r 3
+    python -m benchmarks.bench_startup --build               # pyinstaller main.spec + dist/
+    python -m benchmarks.bench_startup --exe dist/monitor_build/monitor_realtime/monitor_realtime
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# o main.spec gera o EXE de um arquivo em dist/monitor_realtime e a pasta
+# do COLLECT em dist/monitor_build/monitor_realtime/; mede o da pasta
+EXE_PADRAO = os.path.join(
+    API_DIR, "dist", "monitor_build", "monitor_realtime", "monitor_realtime" + (".exe" if os.name == "nt" else "")
+)
+
+ETAPAS = ("tcp", "ingest", "ready", "scraper")
+
+
+def _copiar_dev(destino: str, frio: bool) -> list[str]:
+    ignorar = ["tmp", "dist", "build", "configs.json", ".venv"]
+    if frio:
+        ignorar.append("__pycache__")
+    shutil.copytree(API_DIR, destino, ignore=shutil.ignore_patterns(*ignorar))
+    return [sys.executable, "main.py"]
+
+
+def _copiar_exe(exe: str, destino: str) -> list[str]:
+    shutil.copytree(os.path.dirname(os.path.abspath(exe)), destino)
+    return [os.path.join(destino, os.path.basename(exe))]
+
+
+def _tcp(porta: int) -> socket.socket | None:
+    try:
+        return socket.create_connection(("127.0.0.1", porta), timeout=0.05)
+    except OSError:
+        return None
+
+
+def _ready(porta: int) -> dict | None:
+    """Corpo do /ready se respondeu 200; None se ainda não (503 ou sem HTTP)."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{porta}/ready", timeout=0.5) as r:
+            return json.loads(r.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def um_start(cmd: list[str], cwd: str, args) -> dict[str, float | None]:
+    """Tempos (s) de cada etapa de um start; None se não chegou dentro do --timeout."""
+    tempos: dict[str, float | None] = dict.fromkeys(ETAPAS)
+    conn = None
+    resposta = b""
+    with open(os.path.join(cwd, "saida.txt"), "wb") as saida:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=saida, stderr=subprocess.STDOUT)
+        try:
+            fim = t0 + args.timeout
+            while time.perf_counter() < fim and proc.poll() is None:
+                agora = time.perf_counter() - t0
+                if tempos["tcp"] is None:
+                    conn = _tcp(args.tcp_porta)
+                    if conn is not None:
+                        tempos["tcp"] = agora
+                        conn.settimeout(0.005)
+                        conn.sendall(b"BENCH;10;0;10;1\n")
+                if conn is not None and tempos["ingest"] is None:
+                    try:
+                        resposta += conn.recv(16)
+                    except (TimeoutError, BlockingIOError):
+                        pass
+                    if b"OK" in resposta:
+                        tempos["ingest"] = time.perf_counter() - t0
+                if tempos["ready"] is None or tempos["scraper"] is None:
+                    corpo = _ready(args.http_porta)
+                    if corpo is not None:
+                        if tempos["ready"] is None:
+                            tempos["ready"] = time.perf_counter() - t0
+                        if corpo.get("segundos", {}).get("scraper") is not None:
+                            tempos["scraper"] = time.perf_counter() - t0
+                if all(v is not None for v in tempos.values()):
+                    break
+                time.sleep(0.005)
+        finally:
+            if conn is not None:
+                conn.close()
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+    return tempos
+
+
+def importtime(cwd: str, n: int = 12) -> None:
+    """Os n módulos mais lentos (cumulativo) do import do main.py, via -X importtime."""
+    r = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=cwd, capture_output=True, text=True
+    )
+    linhas = []
+    for linha in r.stderr.splitlines():
+        partes = linha.split("|")
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            linhas.append((int(partes[1]), partes[2].rstrip()))
+    print("\nimport main (cumulativo):")
+    for us, nome in sorted(linhas, reverse=True)[:n]:
+        print(f"  {us / 1000:8.1f} ms  {nome}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-r", "--repeticoes", type=int, default=5)
+    ap.add_argument("--exe", nargs="?", const=EXE_PADRAO, help="mede o executável (padrão: dist/ do main.spec)")
+    ap.add_argument("--build", action="store_true", help="roda pyinstaller main.spec antes (implica --exe)")
+    ap.add_argument("--frio", action="store_true", help="dev: sem __pycache__ (compila tudo no start)")
+    ap.add_argument("--logs", help="logs.txt copiado para o tmp/ da cópia antes de cada start")
+    ap.add_argument("--importtime", action="store_true", help="dev: lista os imports mais lentos do main.py")
+    ap.add_argument("--tcp-porta", type=int, default=5050)
+    ap.add_argument("--http-porta", type=int, default=8080)
+    ap.add_argument("--timeout", type=float, default=60.0, help="segundos por start")
+    args = ap.parse_args()
+
+    if args.build:
+        subprocess.run([sys.executable, "-m", "PyInstaller", "--noconfirm", "main.spec"], cwd=API_DIR, check=True)
+        args.exe = args.exe or EXE_PADRAO
+
+    modo = f"executável {args.exe}" if args.exe else f"dev ({'sem' if args.frio else 'com'} __pycache__)"
+    print(f"{modo}, {args.repeticoes} starts" + (f", logs {args.logs}" if args.logs else ""))
+
+    resultados: dict[str, list[float]] = {e: [] for e in ETAPAS}
+    for i in range(args.repeticoes):
+        # cópia nova a cada start: tmp/ vazio (ou só com o --logs) e sem configs.json
+        with tempfile.TemporaryDirectory() as base:
+            destino = os.path.join(base, "app")
+            cmd = _copiar_exe(args.exe, destino) if args.exe else _copiar_dev(destino, args.frio)
+            if args.logs:
+                os.makedirs(os.path.join(destino, "tmp"), exist_ok=True)
+                shutil.copyfile(args.logs, os.path.join(destino, "tmp", "logs.txt"))
+            tempos = um_start(cmd, destino, args)
+            if args.importtime and not args.exe and i == 0:
+                importtime(destino)
+        linha = "  ".join(f"{e} {'-' if v is None else f'{v * 1000:.0f} ms'}" for e, v in tempos.items())
+        print(f"  #{i + 1}: {linha}")
+        for e, v in tempos.items():
+            if v is not None:
+                resultados[e].append(v)
+
+    print(f"\n{'etapa':<10} {'mediana':>10} {'mín':>10} {'máx':>10}")
+    for e, valores in resultados.items():
+        if not valores:
+            print(f"{e:<10} {'-':>10}")
+            continue
+        print(
+            f"{e:<10} {statistics.median(valores) * 1000:8.0f} ms {min(valores) * 1000:7.0f} ms "
+            f"{max(valores) * 1000:7.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
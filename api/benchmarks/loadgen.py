@@ -0,0 +1,605 @@
+"""
+loadgen.py — Frota simulada de estações contra o servidor TCP + /logs
+
+Simula N estações falando o protocolo real com o tcp_server do main.py e,
+ao mesmo tempo, pollers do /logs como o dashboard. Mede:
+
+ - vazão de ingest (registros confirmados por segundo)
+ - latência do ACK (envio -> confirmação), em percentis
+ - registros sem confirmação / perdidos (e repetidos, se o logs.txt for lido)
+ - latência e tamanho do /logs enquanto o ingest acontece
+
+Protocolos (--protocolo):
+    texto    linha "codigo;tp;pausa;total;qtd\\n", um "OK" por registro
+             (firmware original: sem reenvio, o que cai junto com a conexão fica sem ACK)
+    seq      linha com ";device;seq;epoch;loop_us" e ACK cumulativo; reenvia o pendente
+             depois de reconectar, como o outbox
+    binario  quadros de core/protocol.py com todos os pendentes, ACK cumulativo
+
+O servidor limita as conexões por IP (TCP_MAX_CONEXOES_POR_IP, derruba a
+mais antiga): contra 127.0.0.1 use --ips-loopback (Linux) para cada estação
+ter o próprio IP, ou aumente o limite.
+
+Perturbações: --tempestade derruba todas as conexões ao mesmo tempo a cada
+S segundos (todas reconectam juntas); --parcial escreve uma fração das
+mensagens em pedaços, com pausas entre eles.
+
+O relatório em JSON (--saida) guarda a configuração, o commit e os
+resultados, e dois relatórios podem ser comparados com o subcomando
+`comparar`. Para medir o /logs com o logs.txt grande, gere o histórico
+com `prefill` ANTES de subir o servidor (o backend sqlite importa o
+logs.txt na primeira execução).
+
+Uso (a partir de api/, com o main.py rodando):
+    python -m benchmarks.loadgen prefill tmp/logs.txt -n 1000000
+    python -m benchmarks.loadgen run -e 50 -t 2 -d 60 --http http://localhost:8080 --saida r1.json
+    python -m benchmarks.loadgen run -e 200 --protocolo seq --tempestade 10 --parcial 0.2 --logs tmp/logs.txt
+    python -m benchmarks.loadgen comparar r1.json r2.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import random
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+from benchmarks.bench_parser import PRODUTOS
+from core.dedupe import parse_device_seq
+from core.protocol import MAX_REGISTROS, FrameRecord, encode_frame
+
+
+def percentis(valores: list[float], escala: float = 1000.0) -> dict[str, float | None]:
+    """p50/p90/p99/máx (em ms por padrão)."""
+    if not valores:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    v = sorted(valores)
+
+    def p(q: float) -> float:
+        return round(v[min(len(v) - 1, int(q * len(v)))] * escala, 3)
+
+    return {"p50": p(0.50), "p90": p(0.90), "p99": p(0.99), "max": round(v[-1] * escala, 3)}
+
+
+# -----------------------------------------------------------
+# estações
+# -----------------------------------------------------------
+
+
+class Resultado:
+    def __init__(self):
+        self.enviados = 0
+        self.confirmados = 0
+        self.reenvios = 0
+        self.nacks = 0
+        self.conexoes = 0
+        self.falhas_conexao = 0
+        self.latencias_ack: list[float] = []
+        self.sem_ack = 0
+
+
+class Estacao:
+    def __init__(
+        self,
+        device: str,
+        args,
+        resultado: Resultado,
+        tempestade: asyncio.Event,
+        rnd: random.Random,
+        origem: tuple[str, int] | None = None,
+    ):
+        self.device = device
+        # endereço local da conexão (--ips-loopback: um IP por estação)
+        self.origem = origem
+        self.args = args
+        self.res = resultado
+        self.tempestade = tempestade
+        self.rnd = rnd
+        self.produto = rnd.choice(PRODUTOS)
+        self.seq = 0
+        # texto: instantes de envio aguardando "OK", na ordem
+        self.aguardando: deque[float] = deque()
+        # seq/binario: outbox (seq -> (registro, instante do primeiro envio))
+        self.outbox: dict[int, tuple[FrameRecord, float | None]] = {}
+        self.confirmado_ate = 0
+        # NACK do servidor (sobrecarga): não reconecta antes disso, como o firmware
+        self.espera_ate = 0.0
+        self.ultimo_ack = 0.0
+        self.ultimo_envio = 0.0
+        self.novo = asyncio.Event()
+
+    # --- geração de ciclos --------------------------------------------
+
+    def _ciclo(self) -> FrameRecord:
+        self.seq += 1
+        tp = self.rnd.randint(20_000, 600_000)
+        pausa = self.rnd.randint(0, 120_000)
+        loop_us = self.rnd.randint(100, 3000)
+        return FrameRecord(self.seq, int(time.time()), tp, pausa, tp + pausa, 1, loop_us, self.produto)
+
+    async def produzir(self, fim: float) -> None:
+        while True:
+            espera = self.rnd.expovariate(self.args.taxa) if self.args.taxa > 0 else 1.0
+            if time.monotonic() + espera >= fim:
+                return
+            await asyncio.sleep(espera)
+            r = self._ciclo()
+            self.outbox[r.seq] = (r, None)
+            self.novo.set()
+
+    # --- escrita ------------------------------------------------------
+
+    def _mensagem(self, r: FrameRecord) -> bytes:
+        campos = f"{r.produto};{r.tempo_producao_ms // 1000};{r.tempo_pausa_ms // 1000};{r.tempo_total_ms // 1000};1"
+        if self.args.protocolo == "texto":
+            return f"{campos}\n".encode()
+        return f"{campos};{self.device};{r.seq};{r.epoch};{r.loop_us}\n".encode()
+
+    async def _escrever(self, writer: asyncio.StreamWriter, dados: bytes) -> None:
+        if self.args.parcial and self.rnd.random() < self.args.parcial and len(dados) > 2:
+            # escrita parcial: a mensagem chega quebrada em 2 ou 3 pedaços
+            cortes = sorted(self.rnd.sample(range(1, len(dados)), min(2, len(dados) - 1)))
+            inicio = 0
+            for corte in (*cortes, len(dados)):
+                writer.write(dados[inicio:corte])
+                await writer.drain()
+                inicio = corte
+                await asyncio.sleep(self.rnd.uniform(0.001, 0.01))
+            return
+        writer.write(dados)
+        await writer.drain()
+
+    async def _enviar_pendentes(self, writer: asyncio.StreamWriter, enviado_ate: int) -> int:
+        """Envia o que ainda não foi escrito nesta conexão; devolve o maior seq escrito."""
+        pendentes = [s for s in sorted(self.outbox) if s > enviado_ate]
+        if not pendentes:
+            return enviado_ate
+        agora = time.perf_counter()
+        self.ultimo_envio = time.monotonic()
+        for s in pendentes:
+            r, primeiro = self.outbox[s]
+            if primeiro is None:
+                self.outbox[s] = (r, agora)
+                self.res.enviados += 1
+            else:
+                self.res.reenvios += 1
+
+        if self.args.protocolo == "texto":
+            for s in pendentes:
+                r, _ = self.outbox.pop(s)
+                self.aguardando.append(agora)
+                await self._escrever(writer, self._mensagem(r))
+        elif self.args.protocolo == "seq":
+            for s in pendentes:
+                await self._escrever(writer, self._mensagem(self.outbox[s][0]))
+        else:
+            for i in range(0, len(pendentes), MAX_REGISTROS):
+                lote = [self.outbox[s][0] for s in pendentes[i : i + MAX_REGISTROS]]
+                await self._escrever(writer, encode_frame(self.device, lote))
+        return pendentes[-1]
+
+    # --- leitura dos ACKs ----------------------------------------------
+
+    async def _ler_acks(self, reader: asyncio.StreamReader) -> None:
+        try:
+            await self._ler_acks_ate_fechar(reader)
+        except (ConnectionError, OSError):
+            pass
+
+    async def _ler_acks_ate_fechar(self, reader: asyncio.StreamReader) -> None:
+        sobra = b""
+        while True:
+            if self.args.protocolo == "texto":
+                dados = await reader.read(4096)
+                if not dados:
+                    return
+                dados = sobra + dados
+                self.res.nacks += dados.count(b"NACK")
+                n = dados.count(b"OK")
+                sobra = dados[-1:] if dados.endswith(b"O") else b""
+                agora = time.perf_counter()
+                for _ in range(min(n, len(self.aguardando))):
+                    self.res.latencias_ack.append(agora - self.aguardando.popleft())
+                    self.res.confirmados += 1
+                continue
+
+            linha = await reader.readline()
+            if not linha:
+                return
+            partes = linha.split()
+            if len(partes) == 3 and partes[0] == b"NACK":
+                # nada a partir desse seq foi gravado; o servidor fecha a conexão
+                self.res.nacks += 1
+                self.espera_ate = time.monotonic() + self.args.espera_nack
+                continue
+            if len(partes) != 3 or partes[0] != b"ACK" or partes[1].decode() != self.device:
+                continue
+            ate = int(partes[2])
+            agora = time.perf_counter()
+            for s in [s for s in self.outbox if s <= ate]:
+                _, primeiro = self.outbox.pop(s)
+                if primeiro is not None:
+                    self.res.latencias_ack.append(agora - primeiro)
+                self.res.confirmados += 1
+            self.confirmado_ate = max(self.confirmado_ate, ate)
+            self.ultimo_ack = time.monotonic()
+
+    # --- conexão ---------------------------------------------------------
+
+    async def rodar(self, fim_producao: float, fim: float) -> None:
+        produtor = asyncio.create_task(self.produzir(fim_producao))
+        try:
+            while time.monotonic() < fim:
+                if time.monotonic() >= fim_producao and not self.outbox and not self.aguardando:
+                    break
+                if time.monotonic() < self.espera_ate:
+                    await asyncio.sleep(self.espera_ate - time.monotonic())
+                    continue
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.args.host, self.args.porta, local_addr=self.origem), timeout=5
+                    )
+                except (OSError, asyncio.TimeoutError):
+                    self.res.falhas_conexao += 1
+                    await asyncio.sleep(self.rnd.uniform(0.2, 1.0))
+                    continue
+                self.res.conexoes += 1
+                await self._sessao(reader, writer, fim_producao, fim)
+        finally:
+            produtor.cancel()
+            # texto: o que caiu junto com a conexão não tem como ser confirmado
+            self.res.sem_ack += len(self.aguardando) + len(self.outbox)
+
+    async def _sessao(self, reader, writer, fim_producao: float, fim: float) -> None:
+        leitor = asyncio.create_task(self._ler_acks(reader))
+        tempestade = asyncio.create_task(self.tempestade.wait())
+        # texto: o outbox só tem o que nunca foi escrito (sem reenvio);
+        # seq/binario: reconectou, tudo sem ACK vai de novo
+        enviado_ate = 0 if self.args.protocolo == "texto" else self.confirmado_ate
+        try:
+            while time.monotonic() < fim:
+                enviado_ate = await self._enviar_pendentes(writer, enviado_ate)
+                if time.monotonic() >= fim_producao and not self.outbox and not self.aguardando:
+                    break
+                self.novo.clear()
+                novo = asyncio.create_task(self.novo.wait())
+                feitos, _ = await asyncio.wait(
+                    {novo, leitor, tempestade}, timeout=1.0, return_when=asyncio.FIRST_COMPLETED
+                )
+                novo.cancel()
+                if leitor in feitos:
+                    # servidor fechou a conexão
+                    break
+                if tempestade in feitos:
+                    writer.transport.abort()
+                    break
+                if (
+                    self.args.protocolo != "texto"
+                    and self.outbox
+                    and time.monotonic() - max(self.ultimo_ack, self.ultimo_envio) > self.args.ack_timeout
+                ):
+                    # sem ACK no prazo: reenvia a partir do mais antigo pendente (como o firmware)
+                    enviado_ate = self.confirmado_ate
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            tempestade.cancel()
+            leitor.cancel()
+            if self.args.protocolo == "texto":
+                self.res.sem_ack += len(self.aguardando)
+                self.aguardando.clear()
+            writer.close()
+
+
+async def _tempestades(evento: asyncio.Event, intervalo: float, fim: float, contagem: list[int]) -> None:
+    while time.monotonic() + intervalo < fim:
+        await asyncio.sleep(intervalo)
+        evento.set()
+        contagem[0] += 1
+        await asyncio.sleep(0)
+        evento.clear()
+
+
+# -----------------------------------------------------------
+# pollers do /logs
+# -----------------------------------------------------------
+
+
+def _get(url: str, etag: str | None) -> tuple[int, int, str | None]:
+    req = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as r:
+            return r.status, len(r.read()), r.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, 0, etag
+        raise
+
+
+async def _poller(url: str, intervalo: float, usar_etag: bool, fim: float, saida: dict) -> None:
+    etag = None
+    while time.monotonic() < fim:
+        t0 = time.perf_counter()
+        try:
+            status, tamanho, novo = await asyncio.to_thread(_get, url, etag if usar_etag else None)
+        except Exception:
+            saida["erros"] += 1
+        else:
+            saida["latencias"].append(time.perf_counter() - t0)
+            saida["status"][status] = saida["status"].get(status, 0) + 1
+            if tamanho:
+                saida["bytes"] = tamanho
+            etag = novo
+        await asyncio.sleep(intervalo)
+
+
+def _metricas_servidor(base: str) -> dict[str, float]:
+    """Amostras sem rótulo do /metrics (prefixo timesensor_), se o servidor tiver."""
+    try:
+        with urllib.request.urlopen(base + "/metrics", timeout=10) as r:
+            texto = r.read().decode()
+    except Exception:
+        return {}
+    valores = {}
+    for linha in texto.splitlines():
+        if linha.startswith("timesensor_") and "{" not in linha:
+            nome, _, valor = linha.partition(" ")
+            try:
+                valores[nome] = float(valor)
+            except ValueError:
+                pass
+    return valores
+
+
+# -----------------------------------------------------------
+# verificação no logs.txt
+# -----------------------------------------------------------
+
+
+def _contar_logs(caminho: str, inicio: int, prefixo: str) -> dict[str, int]:
+    """Linhas gravadas a partir do byte `inicio` vindas desta rodada (e repetições por (device, seq))."""
+    vistos: set[tuple[str, int]] = set()
+    linhas = repetidos = 0
+    with open(caminho, "rb") as f:
+        f.seek(inicio)
+        for bruta in f:
+            linha = bruta.decode("utf-8", "replace")
+            linhas += 1
+            campos = parse_device_seq(linha)
+            if campos is None or not campos[0].startswith(prefixo):
+                continue
+            chave = (campos[0], campos[1])
+            if chave in vistos:
+                repetidos += 1
+            vistos.add(chave)
+    return {"linhas": linhas, "unicos_com_seq": len(vistos), "repetidos": repetidos}
+
+
+def _tamanho(caminho: str | None) -> int:
+    if not caminho:
+        return 0
+    try:
+        with open(caminho, "rb") as f:
+            return f.seek(0, 2)
+    except OSError:
+        return 0
+
+
+# -----------------------------------------------------------
+# subcomandos
+# -----------------------------------------------------------
+
+
+async def _rodar(args) -> dict:
+    rnd = random.Random(args.semente)
+    res = Resultado()
+    tempestade = asyncio.Event()
+    tempestades = [0]
+    inicio_logs = _tamanho(args.logs)
+    metricas_antes = _metricas_servidor(args.http) if args.http else {}
+
+    t0 = time.monotonic()
+    fim_producao = t0 + args.duracao
+    fim = fim_producao + args.espera
+    # devices novos a cada rodada: o servidor guarda o último seq de cada um
+    # e descartaria como repetidos os seqs de uma rodada anterior
+    prefixo = f"sim{int(time.time()) % 100_000:05d}-"
+    estacoes = [
+        Estacao(
+            f"{prefixo}{i:04d}",
+            args,
+            res,
+            tempestade,
+            random.Random(rnd.random()),
+            (f"127.0.{1 + i // 250}.{1 + i % 250}", 0) if args.ips_loopback else None,
+        )
+        for i in range(args.estacoes)
+    ]
+
+    tarefas = [asyncio.create_task(e.rodar(fim_producao, fim)) for e in estacoes]
+    if args.tempestade:
+        tarefas.append(asyncio.create_task(_tempestades(tempestade, args.tempestade, fim_producao, tempestades)))
+
+    polls = {"latencias": [], "status": {}, "erros": 0, "bytes": 0}
+    if args.http and args.pollers:
+        url = args.http.rstrip("/") + "/logs"
+        tarefas += [
+            asyncio.create_task(_poller(url, args.intervalo_poll, args.etag, fim_producao, polls))
+            for _ in range(args.pollers)
+        ]
+
+    await asyncio.gather(*tarefas)
+    duracao = time.monotonic() - t0
+
+    relatorio = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k != "func"},
+        "ingest": {
+            "duracao_s": round(duracao, 2),
+            "enviados": res.enviados,
+            "confirmados": res.confirmados,
+            "sem_ack": res.sem_ack,
+            "reenvios": res.reenvios,
+            "nacks": res.nacks,
+            "conexoes": res.conexoes,
+            "falhas_conexao": res.falhas_conexao,
+            "tempestades": tempestades[0],
+            "vazao_rps": round(res.confirmados / args.duracao, 1) if args.duracao else None,
+            "ack_ms": percentis(res.latencias_ack),
+        },
+    }
+    if args.http and args.pollers:
+        relatorio["logs_http"] = {
+            "requisicoes": len(polls["latencias"]),
+            "erros": polls["erros"],
+            "status": {str(k): v for k, v in polls["status"].items()},
+            "bytes": polls["bytes"],
+            "latencia_ms": percentis(polls["latencias"]),
+        }
+    if args.logs:
+        gravados = _contar_logs(args.logs, inicio_logs, prefixo)
+        if args.protocolo != "texto":
+            gravados["perdidos"] = max(0, res.enviados - gravados["unicos_com_seq"])
+        relatorio["logs_txt"] = gravados
+    if args.http:
+        depois = _metricas_servidor(args.http)
+        relatorio["servidor"] = {k: round(v - metricas_antes.get(k, 0), 6) for k, v in depois.items()}
+    return relatorio
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def cmd_run(args) -> None:
+    relatorio = asyncio.run(_rodar(args))
+    ing = relatorio["ingest"]
+    print(
+        f"{args.estacoes} estações, {args.protocolo}, {ing['duracao_s']} s: "
+        f"{ing['enviados']} enviados, {ing['confirmados']} confirmados, {ing['sem_ack']} sem ACK, "
+        f"{ing['reenvios']} reenvios, {ing['nacks']} NACKs, {ing['conexoes']} conexões "
+        f"({ing['tempestades']} tempestades)"
+    )
+    print(f"vazão: {ing['vazao_rps']} reg/s   ACK ms: {ing['ack_ms']}")
+    if "logs_http" in relatorio:
+        h = relatorio["logs_http"]
+        print(f"/logs: {h['requisicoes']} req, {h['erros']} erros, {h['bytes']:,} bytes, ms: {h['latencia_ms']}")
+    if "logs_txt" in relatorio:
+        print(f"logs.txt: {relatorio['logs_txt']}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"relatório: {args.saida}")
+
+
+def cmd_prefill(args) -> None:
+    """Anexa N linhas sintéticas ao logs.txt, espalhadas pelos últimos --dias dias."""
+    rnd = random.Random(args.semente)
+    fim = datetime.datetime.now().replace(microsecond=0)
+    passo = args.dias * 86400 / max(args.linhas, 1)
+    t = fim - datetime.timedelta(days=args.dias)
+    t0 = time.perf_counter()
+    with open(args.arquivo, "a", encoding="utf-8") as f:
+        bloco = []
+        for i in range(args.linhas):
+            t += datetime.timedelta(seconds=passo)
+            tp, pausa = rnd.randint(30, 600), rnd.randint(0, 120)
+            bloco.append(f"{t:%Y-%m-%d %H:%M:%S} | {rnd.choice(PRODUTOS)};{tp};{pausa};{tp + pausa};1\n")
+            if len(bloco) >= 65536:
+                f.writelines(bloco)
+                bloco.clear()
+        f.writelines(bloco)
+    print(f"{args.linhas:,} linhas em {args.arquivo} ({time.perf_counter() - t0:.1f} s)")
+
+
+def cmd_comparar(args) -> None:
+    """Lado a lado das métricas principais de dois relatórios."""
+    with open(args.a, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(args.b, encoding="utf-8") as f:
+        b = json.load(f)
+
+    def campos(r: dict) -> dict[str, float | None]:
+        ing = r.get("ingest", {})
+        http = r.get("logs_http", {})
+        saida = {
+            "vazao_rps": ing.get("vazao_rps"),
+            "sem_ack": ing.get("sem_ack"),
+            "perdidos": r.get("logs_txt", {}).get("perdidos"),
+            "repetidos": r.get("logs_txt", {}).get("repetidos"),
+        }
+        for p in ("p50", "p99", "max"):
+            saida[f"ack_{p}_ms"] = ing.get("ack_ms", {}).get(p)
+            saida[f"logs_{p}_ms"] = http.get("latencia_ms", {}).get(p)
+        saida["logs_bytes"] = http.get("bytes")
+        return saida
+
+    ca, cb = campos(a), campos(b)
+    print(f"{'':<16} {a.get('commit') or args.a:>18} {b.get('commit') or args.b:>18} {'b/a':>8}")
+    for k in ca:
+        va, vb = ca[k], cb[k]
+        numeros = isinstance(va, (int, float)) and isinstance(vb, (int, float))
+        razao = f"{vb / va:8.2f}" if numeros and va else f"{'':>8}"
+        print(f"{k:<16} {str(va):>18} {str(vb):>18} {razao}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = ap.add_subparsers(required=True)
+
+    run = sub.add_parser("run", help="simula a frota contra um servidor rodando")
+    run.add_argument("--host", default="127.0.0.1")
+    run.add_argument("--porta", type=int, default=5050)
+    run.add_argument("-e", "--estacoes", type=int, default=20)
+    run.add_argument("-t", "--taxa", type=float, default=1.0, help="ciclos por segundo por estação (Poisson)")
+    run.add_argument("-d", "--duracao", type=float, default=30.0, help="segundos gerando ciclos")
+    run.add_argument("--espera", type=float, default=10.0, help="segundos extras para os ACKs pendentes")
+    run.add_argument("--protocolo", choices=("texto", "seq", "binario"), default="texto")
+    run.add_argument("--tempestade", type=float, default=0.0, help="derruba todas as conexões a cada S segundos")
+    run.add_argument("--parcial", type=float, default=0.0, help="fração das mensagens escritas em pedaços")
+    run.add_argument("--ack-timeout", type=float, default=5.0, help="seq/binario: reenvia sem ACK nesse prazo")
+    run.add_argument("--espera-nack", type=float, default=5.0, help="segundos sem reconectar depois de um NACK")
+    run.add_argument(
+        "--ips-loopback",
+        action="store_true",
+        help="cada estação conecta de um IP 127.0.x.y próprio (Linux), como estações reais no limite por IP",
+    )
+    run.add_argument("--http", help="base do Flask (ex.: http://localhost:8080) para os pollers e o /metrics")
+    run.add_argument("--pollers", type=int, default=4)
+    run.add_argument("--intervalo-poll", type=float, default=1.0)
+    run.add_argument("--etag", action="store_true", help="pollers mandam If-None-Match como o dashboard")
+    run.add_argument("--logs", help="logs.txt do servidor (conta gravados, perdidos e repetidos)")
+    run.add_argument("--semente", type=int, default=42)
+    run.add_argument("--saida", help="arquivo JSON do relatório")
+    run.set_defaults(func=cmd_run)
+
+    pre = sub.add_parser("prefill", help="anexa linhas sintéticas a um logs.txt")
+    pre.add_argument("arquivo")
+    pre.add_argument("-n", "--linhas", type=int, default=1_000_000)
+    pre.add_argument("--dias", type=float, default=30)
+    pre.add_argument("--semente", type=int, default=42)
+    pre.set_defaults(func=cmd_prefill)
+
+    cmp_ = sub.add_parser("comparar", help="compara dois relatórios JSON")
+    cmp_.add_argument("a")
+    cmp_.add_argument("b")
+    cmp_.set_defaults(func=cmd_comparar)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+acks.py — Respostas às estações (OK / ACK cumulativo / NACK)
+
+handle_client() enfileira, na ordem de chegada, um item por registro:
+(future da gravação ou None se já gravado, device, seq). enviar_acks()
+consome a fila numa task por conexão e responde cada registro só depois
+que o lote dele foi gravado.
+"""
+
+import asyncio
+
+
+# marcador na fila de ACKs: registro recusado por sobrecarga (responde NACK)
+NACK = object()
+
+
+def _gravado_ok(fut) -> bool:
+    """Registro já resolvido sem erro (None = duplicado, nada a gravar)."""
+    if fut is NACK:
+        return False
+    return fut is None or (fut.done() and not fut.cancelled() and fut.exception() is None)
+
+
+async def enviar_acks(writer: asyncio.StreamWriter, pendentes: asyncio.Queue) -> None:
+    """
+    Envia os ACKs na ordem de chegada, cada um só depois do lote do registro ser gravado.
+    Formato antigo: um "OK" por registro. Registros com (device, seq): um
+    "ACK <device> <seq>\\n" cumulativo (tudo até seq está gravado) para todos
+    os que já estão gravados em sequência.
+    Registros recusados por sobrecarga: "NACK" (formato antigo) ou
+    "NACK <device> <seq>\\n", e aí a conexão fecha (o ACK cumulativo não pode
+    passar por cima de um seq que não foi gravado).
+    O ACK de um device nunca volta para um seq menor que um já confirmado
+    na conexão (seqs fora de ordem dentro de um lote).
+    """
+    # maior seq já confirmado por device nesta conexão
+    confirmados: dict[str, int] = {}
+    proximo = None
+    tem_proximo = False
+    while True:
+        item = proximo if tem_proximo else await pendentes.get()
+        tem_proximo = False
+        if item is None:
+            break
+        fut, device, seq = item
+        if fut is NACK:
+            try:
+                writer.write(b"NACK" if seq is None else f"NACK {device} {seq}\n".encode("ascii"))
+                await writer.drain()
+            except Exception:
+                pass
+            if seq is not None:
+                writer.close()
+                break
+            continue
+        try:
+            if fut is not None:
+                await fut
+        except Exception as e:
+            print("[TCP] Registro não gravado, sem ACK:", e)
+            if seq is None:
+                continue
+            # o ACK cumulativo não pode pular o registro perdido: fecha a conexão
+            # e a estação reenvia a partir dele (os já gravados são descartados)
+            writer.close()
+            break
+
+        if seq is None:
+            resposta = b"OK"
+        else:
+            while not pendentes.empty():
+                proximo = pendentes.get_nowait()
+                if proximo is None or proximo[1] != device or not _gravado_ok(proximo[0]):
+                    tem_proximo = True
+                    break
+                seq = max(seq, proximo[2])
+            seq = confirmados[device] = max(seq, confirmados.get(device, seq))
+            resposta = f"ACK {device} {seq}\n".encode("ascii")
+
+        try:
+            writer.write(resposta)
+            await writer.drain()
+        except Exception:
+            pass
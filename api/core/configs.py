@@ -13,12 +13,27 @@ class ConfigManager:
 
         self.file_path = base_dir / file_path
         self.data = {}
+        self._mtime_ns = None
         self.load()
 
+    def _current_mtime(self):
+        try:
+            return self.file_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """Reload only when the file changed on disk since the last load/save."""
+        if self._current_mtime() == self._mtime_ns:
+            return False
+        self.load()
+        return True
+
     def load(self):
         if self.file_path.exists():
             with open(self.file_path, "r", encoding="utf-8") as f:
                 self.data = json.load(f)
+            self._mtime_ns = self._current_mtime()
         else:
             self.data = {
                 "username": "",
@@ -30,6 +45,7 @@ class ConfigManager:
         print("Configs saved to ", self.file_path)
         with open(self.file_path, "w", encoding="utf-8") as f:
             json.dump(self.data, f, indent=4, ensure_ascii=False)
+        self._mtime_ns = self._current_mtime()
 
     def get(self, key, default=None):
         return self.data.get(key, default)
@@ -45,17 +61,26 @@ class ConfigManager:
 
 
 class Configs(ConfigManager):
-    def __init__(self):
-        super().__init__()
-
+    def _read_fields(self):
         self.username = self.get("username")
         self.password = self.get("password")
         self.printer = self.get("printer")
+
+    def _normalize(self):
         ops = self.data.get("operators", [])
-        self.data["operators"] = [
+        normalized = [
             o if isinstance(o, dict) else {"name": o} for o in ops
         ]
-        self.save()
+        self.data["operators"] = normalized
+        # only rewrite the file when normalizing actually changed something
+        if normalized != ops:
+            self.save()
+
+    def load(self):
+        super().load()
+        # every load (also reload_if_changed) goes through the same defaults
+        self._normalize()
+        self._read_fields()
 
     @property
     def operators(self):
@@ -0,0 +1,220 @@
+"""
+cycle_history.py — Histórico de ciclos em memória, em colunas compactas
+
+Alternativa aos dicts por registro (7 chaves, datetime + string da mesma
+data) para manter o histórico inteiro em memória no backend "text":
+
+ - um conjunto de colunas `array` por produto: epoch (int64) e
+   tempo_producao / tempo_pausa / tempo_total / quantidade (int32),
+   cerca de 24 bytes por ciclo
+ - o nome do produto é guardado uma vez (interned), não por registro
+ - as colunas de cada produto ficam em ordem cronológica, então uma janela
+   é uma fatia contínua achada por busca binária; um registro atrasado
+   (reenvio do outbox) entra direto na posição dele (busca binária +
+   array.insert, um memmove em C) em vez de reordenar a coluna inteira;
+   as views são memoryviews
+   sobre os próprios arrays (sem cópia) e viram arrays NumPy com
+   np.frombuffer
+ - soma/contagem de tempo_total por produto para a média
+ - o JSON do /logs é montado direto das colunas, sem dicts intermediários
+"""
+
+import bisect
+import json
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from core.log_parser import CycleRecord
+from core.utils.time_utils import epoch_seconds
+
+_FMT = "%Y-%m-%d %H:%M:%S"
+
+# colunas de duração (mesma ordem do CycleRecord)
+COLUNAS = ("tempo_producao", "tempo_pausa", "tempo_total", "quantidade")
+
+
+class _Produto:
+    __slots__ = ("nome", "nome_json", "epoch", "tempo_producao", "tempo_pausa", "tempo_total", "quantidade", "soma")
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.nome_json = json.dumps(nome)
+        self.epoch = array("q")
+        self.tempo_producao = array("i")
+        self.tempo_pausa = array("i")
+        self.tempo_total = array("i")
+        self.quantidade = array("i")
+        self.soma = 0
+
+    def inserir(self, i: int, epoch: int, tp: int, pausa: int, total: int, qtd: int) -> None:
+        """Insere um registro atrasado na posição i (mantém as colunas em ordem)."""
+        self.epoch.insert(i, epoch)
+        self.tempo_producao.insert(i, tp)
+        self.tempo_pausa.insert(i, pausa)
+        self.tempo_total.insert(i, total)
+        self.quantidade.insert(i, qtd)
+
+
+class HistoryView:
+    """Fatia [a, b) das colunas de um produto; memoryviews sem cópia dos arrays."""
+
+    __slots__ = ("produto", "epoch", "tempo_producao", "tempo_pausa", "tempo_total", "quantidade")
+
+    def __init__(self, p: _Produto, a: int, b: int):
+        self.produto = p.nome
+        self.epoch = memoryview(p.epoch)[a:b]
+        self.tempo_producao = memoryview(p.tempo_producao)[a:b]
+        self.tempo_pausa = memoryview(p.tempo_pausa)[a:b]
+        self.tempo_total = memoryview(p.tempo_total)[a:b]
+        self.quantidade = memoryview(p.quantidade)[a:b]
+
+    def __len__(self) -> int:
+        return len(self.epoch)
+
+    def release(self) -> None:
+        for nome in ("epoch", *COLUNAS):
+            getattr(self, nome).release()
+
+
+class CycleHistory:
+    def __init__(self):
+        self._produtos: dict[str, _Produto] = {}
+        self._lock = threading.Lock()
+        self.total = 0
+
+    # -------------------------------------------------------
+    # escrita
+    # -------------------------------------------------------
+
+    def add_records(self, registros: Iterable[CycleRecord]) -> None:
+        """Listener do escritor (e carga inicial): anexa os registros às colunas do produto."""
+        with self._lock:
+            for r in registros:
+                p = self._produtos.get(r.produto)
+                if p is None:
+                    p = self._produtos[r.produto] = _Produto(sys.intern(r.produto))
+                epoch = epoch_seconds(r.datetime)
+                if p.epoch and epoch < p.epoch[-1]:
+                    # depois dos registros do mesmo segundo, como se tivesse chegado em ordem
+                    i = bisect.bisect_right(p.epoch, epoch)
+                    p.inserir(i, epoch, r.tempo_producao, r.tempo_pausa, r.tempo_total, r.quantidade)
+                else:
+                    p.epoch.append(epoch)
+                    p.tempo_producao.append(r.tempo_producao)
+                    p.tempo_pausa.append(r.tempo_pausa)
+                    p.tempo_total.append(r.tempo_total)
+                    p.quantidade.append(r.quantidade)
+                p.soma += r.tempo_total
+                self.total += 1
+
+    # -------------------------------------------------------
+    # consulta
+    # -------------------------------------------------------
+
+    def products(self) -> list[str]:
+        with self._lock:
+            return list(self._produtos)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def nbytes(self) -> int:
+        """Bytes ocupados pelas colunas."""
+        with self._lock:
+            return sum(
+                len(getattr(p, nome)) * getattr(p, nome).itemsize
+                for p in self._produtos.values()
+                for nome in ("epoch", *COLUNAS)
+            )
+
+    def _fatia(self, p: _Produto, inicio: int | None, fim: int | None) -> tuple[int, int]:
+        a = 0 if inicio is None else bisect.bisect_left(p.epoch, inicio)
+        b = len(p.epoch) if fim is None else bisect.bisect_left(p.epoch, fim)
+        return a, b
+
+    def _alvos(self, produto: str | None) -> list[_Produto]:
+        if produto:
+            p = self._produtos.get(produto)
+            return [p] if p is not None else []
+        return list(self._produtos.values())
+
+    @contextmanager
+    def window(
+        self,
+        produto: str | None = None,
+        inicio: int | None = None,
+        fim: int | None = None,
+    ) -> Iterator[list[HistoryView]]:
+        """
+        Views da janela [inicio, fim) (epoch) de cada produto (ou só de um).
+        Arrays com views vivas não podem crescer, então o lock fica preso
+        (e o escritor espera) até o bloco terminar; as views são liberadas
+        na saída e não devem ser guardadas.
+        """
+        with self._lock:
+            views = []
+            for p in self._alvos(produto):
+                a, b = self._fatia(p, inicio, fim)
+                if a < b:
+                    views.append(HistoryView(p, a, b))
+            try:
+                yield views
+            finally:
+                for v in views:
+                    v.release()
+
+    def medias(self, produtos) -> dict[str, float]:
+        with self._lock:
+            medias = {}
+            for prod in produtos:
+                p = self._produtos.get(prod)
+                medias[prod] = p.soma / len(p.epoch) if p and len(p.epoch) else 0
+            return medias
+
+    @staticmethod
+    def _registro_json(nome_json: str, epoch: int, tp: int, pausa: int, total: int, qtd: int) -> str:
+        data = time.strftime(_FMT, time.gmtime(epoch))
+        return (
+            f'{{"data": "{data}", "datetime": "{data[:10]}T{data[11:]}", "produto": {nome_json}, '
+            f'"quantidade": {qtd}, "tempo_pausa": {pausa}, "tempo_producao": {tp}, "tempo_total": {total}}}'
+        )
+
+    def iter_json(self, produto: str | None = None, inicio: int | None = None, fim: int | None = None) -> Iterator[str]:
+        """Um objeto JSON por ciclo da janela (mesmo formato do /logs), produto a produto."""
+        with self._lock:
+            fatias = [(p, *self._fatia(p, inicio, fim)) for p in self._alvos(produto)]
+            # cópia das fatias: o escritor pode anexar enquanto o JSON é gerado
+            colunas = [
+                (p.nome_json, p.epoch[a:b], p.tempo_producao[a:b], p.tempo_pausa[a:b], p.tempo_total[a:b], p.quantidade[a:b])
+                for p, a, b in fatias
+            ]
+        for nome_json, *cols in colunas:
+            for linha in zip(*cols):
+                yield self._registro_json(nome_json, *linha)
+
+    def logs_json(self, limite: int = 50) -> bytes:
+        """
+        JSON do /logs direto das colunas:
+        {produto: {"logs": [últimos `limite`, do mais novo ao mais antigo], "media": float}}
+        """
+        with self._lock:
+            partes = []
+            for nome in sorted(self._produtos):
+                p = self._produtos[nome]
+                n = len(p.epoch)
+                a = max(0, n - limite)
+                logs = ", ".join(
+                    self._registro_json(p.nome_json, p.epoch[i], p.tempo_producao[i], p.tempo_pausa[i], p.tempo_total[i], p.quantidade[i])
+                    for i in range(n - 1, a - 1, -1)
+                )
+                media = p.soma / n if n else 0
+                partes.append(f'{p.nome_json}: {{"logs": [{logs}], "media": {json.dumps(media)}}}')
+        return ("{" + ", ".join(partes) + "}").encode("utf-8")
+
+    def stats(self) -> dict[str, Any]:
+        return {"ciclos": self.total, "produtos": len(self._produtos), "bytes": self.nbytes()}
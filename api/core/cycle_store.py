@@ -0,0 +1,358 @@
+"""
+cycle_store.py — Armazenamento dos ciclos em SQLite (WAL)
+
+Guarda os mesmos campos que o parser de logs produz (e, dos registros com
+seq, a estação de origem e as durações em ms), com índices em
+(produto, datetime) e (datetime), para que /logs e as consultas futuras
+rodem como SQL indexado em vez de varrer o logs.txt inteiro.
+
+ - inserts em lote (chamado pela thread escritora a cada group commit)
+ - tabela `produtos` com soma/contagem de tempo_total, atualizada na mesma
+   transação, para a média por produto sair em O(produtos)
+ - importador único do histórico em texto (segmentos arquivados + logs.txt,
+   também via linha de comando), numa transação só com a marca de importado
+
+Uso do importador:
+    python -m core.cycle_store tmp/logs.txt tmp/ciclos.db [tmp/segments]
+"""
+
+import contextlib
+import itertools
+import os
+import sqlite3
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from core.log_parser import CycleRecord, parse_log_line, parse_timestamp
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ciclos (
+    id INTEGER PRIMARY KEY,
+    datetime TEXT NOT NULL,
+    produto TEXT NOT NULL,
+    tempo_producao INTEGER NOT NULL DEFAULT 0,
+    tempo_pausa INTEGER NOT NULL DEFAULT 0,
+    tempo_total INTEGER NOT NULL DEFAULT 0,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    tempo_producao_ms INTEGER,
+    tempo_pausa_ms INTEGER,
+    tempo_total_ms INTEGER,
+    device TEXT,
+    seq INTEGER,
+    epoch INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_ciclos_produto_datetime ON ciclos (produto, datetime);
+CREATE INDEX IF NOT EXISTS idx_ciclos_datetime ON ciclos (datetime);
+
+CREATE TABLE IF NOT EXISTS produtos (
+    produto TEXT PRIMARY KEY,
+    soma INTEGER NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+_COLUNAS = "datetime, produto, tempo_producao, tempo_pausa, tempo_total, quantidade"
+
+# colunas acrescentadas depois da primeira versão (ALTER TABLE em bancos antigos)
+_COLUNAS_NOVAS = {
+    "tempo_producao_ms": "INTEGER",
+    "tempo_pausa_ms": "INTEGER",
+    "tempo_total_ms": "INTEGER",
+    "device": "TEXT",
+    "seq": "INTEGER",
+    "epoch": "INTEGER",
+}
+
+# linhas por transação no importador
+_IMPORT_CHUNK = 5000
+
+
+def _row_to_dict(row: tuple) -> dict:
+    dt, produto, tp, pausa, total, qtd = row
+    return {
+        "data": dt,
+        "datetime": dt.replace(" ", "T"),
+        "produto": produto,
+        "tempo_producao": tp,
+        "tempo_pausa": pausa,
+        "tempo_total": total,
+        "quantidade": qtd,
+    }
+
+
+class CycleStore:
+    def __init__(
+        self,
+        db_path: str | os.PathLike,
+        parse_line: Callable[[str], CycleRecord | None],
+        synchronous_full: bool = False,
+    ):
+        self.db_path = str(db_path)
+        self.parse_line = parse_line
+        self.synchronous = "FULL" if synchronous_full else "NORMAL"
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        existentes = {row[1] for row in conn.execute("PRAGMA table_info(ciclos)")}
+        for coluna, tipo in _COLUNAS_NOVAS.items():
+            if coluna not in existentes:
+                conn.execute(f"ALTER TABLE ciclos ADD COLUMN {coluna} {tipo}")
+        conn.commit()
+
+    # -------------------------------------------------------
+    # conexões (uma por thread: escritora, workers do Flask...)
+    # -------------------------------------------------------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Conexão da thread atual (outros stores no mesmo arquivo podem compartilhá-la)."""
+        return self._conn()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transação da thread atual. Chamadas aninhadas entram na mais externa:
+        o commit (ou rollback) acontece só quando ela termina, então a thread
+        escritora grava ciclos e rollups de um lote de forma atômica.
+        """
+        conn = self._conn()
+        if getattr(self._local, "em_transacao", False):
+            yield conn
+            return
+        self._local.em_transacao = True
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.em_transacao = False
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # -------------------------------------------------------
+    # escrita
+    # -------------------------------------------------------
+
+    def insert_records(self, registros: Iterable[CycleRecord]) -> int:
+        """Insere registros já parseados numa única transação (com ms e device/seq, se vieram)."""
+        rows = []
+        somas: dict[str, list[int]] = {}
+        for r in registros:
+            rows.append(
+                (r.data, r.produto, r.tempo_producao, r.tempo_pausa, r.tempo_total, r.quantidade)
+                + (r.tempos_ms or (None, None, None))
+                + (r.device, r.seq, r.epoch)
+            )
+            acc = somas.setdefault(r.produto, [0, 0])
+            acc[0] += r.tempo_total
+            acc[1] += 1
+
+        if not rows:
+            return 0
+
+        with self.transaction() as conn:
+            conn.executemany(
+                f"INSERT INTO ciclos ({_COLUNAS}, tempo_producao_ms, tempo_pausa_ms, tempo_total_ms, "
+                "device, seq, epoch) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "INSERT INTO produtos (produto, soma, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(produto) DO UPDATE SET soma = soma + excluded.soma, count = count + excluded.count",
+                [(prod, soma, count) for prod, (soma, count) in somas.items()],
+            )
+        return len(rows)
+
+    def insert_lines(self, lines: Iterable[str]) -> int:
+        """Parseia linhas 'TIMESTAMP | payload' e insere as válidas."""
+        return self.insert_records(p for p in map(self.parse_line, lines) if p)
+
+    def import_log_file(self, path: str | os.PathLike, archive=None) -> int:
+        """
+        Importa o histórico em texto uma única vez (marcado na tabela meta):
+        os segmentos arquivados do `archive` (SegmentArchive), se houver, e o
+        logs.txt. Registros e marca entram numa transação só, então uma queda
+        no meio não deixa metade importada para ser duplicada no próximo start.
+        Retorna quantos registros foram importados (0 se já importado).
+        """
+        chave = f"importado:{os.path.abspath(path)}"
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE chave = ?", (chave,)).fetchone():
+            return 0
+        tem_arquivados = archive is not None and bool(archive.segments())
+        if not os.path.exists(path) and not tem_arquivados:
+            return 0
+
+        total = 0
+        with self.transaction():
+            if tem_arquivados:
+                for chunk in itertools.batched(archive.iter_records(), _IMPORT_CHUNK):
+                    total += self.insert_records(chunk)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    for chunk in itertools.batched((line.strip() for line in f), _IMPORT_CHUNK):
+                        total += self.insert_lines(chunk)
+            conn.execute("INSERT INTO meta (chave, valor) VALUES (?, ?)", (chave, str(total)))
+        print(f"[DB] {total} registros importados de {path}" + (" e dos segmentos arquivados" if tem_arquivados else ""))
+        return total
+
+    # -------------------------------------------------------
+    # consulta
+    # -------------------------------------------------------
+
+    def logs_snapshot(self, limit: int = 50) -> dict[str, Any]:
+        """Mesmo formato do /logs: {produto: {"media", "logs"}} via índices."""
+        conn = self._conn()
+        produtos: dict[str, Any] = {}
+        for prod, soma, count in conn.execute("SELECT produto, soma, count FROM produtos"):
+            rows = conn.execute(
+                f"SELECT {_COLUNAS} FROM ciclos WHERE produto = ? "
+                "ORDER BY datetime DESC, id ASC LIMIT ?",
+                (prod, limit),
+            ).fetchall()
+            produtos[prod] = {
+                "media": soma / count if count else 0,
+                "logs": [_row_to_dict(r) for r in rows],
+            }
+        return produtos
+
+    def medias(self, produtos) -> dict[str, float]:
+        """Média de tempo_total dos produtos pedidos (lookup pela chave primária)."""
+        conn = self._conn()
+        medias = {}
+        for prod in produtos:
+            row = conn.execute("SELECT soma, count FROM produtos WHERE produto = ?", (prod,)).fetchone()
+            medias[prod] = row[0] / row[1] if row and row[1] else 0
+        return medias
+
+    def iter_origens(self, ultimos: int) -> Iterator[tuple[str, int, int | None]]:
+        """
+        (device, seq, epoch) entre os `ultimos` ciclos gravados, em ordem de
+        gravação (para recarregar a deduplicação no start).
+        """
+        sql = (
+            "SELECT device, seq, epoch FROM ciclos "
+            "WHERE id > (SELECT COALESCE(MAX(id), 0) FROM ciclos) - ? AND device IS NOT NULL ORDER BY id"
+        )
+        yield from self._conn().execute(sql, (ultimos,))
+
+    def iter_rows(
+        self,
+        produto: str | None = None,
+        inicio: str | None = None,
+        fim: str | None = None,
+        epoch: bool = False,
+        chunk: int = 10_000,
+    ) -> Iterator[tuple]:
+        """
+        Tuplas (datetime, produto, tp, pausa, total, qtd) filtradas por produto e
+        intervalo ['inicio', 'fim'), em ordem cronológica, lidas em blocos.
+        Com epoch=True o datetime vem como segundos desde 1970 (horário gravado, sem fuso).
+        """
+        coluna_dt = "CAST(strftime('%s', datetime) AS INTEGER)" if epoch else "datetime"
+        sql = (
+            f"SELECT {coluna_dt}, produto, tempo_producao, tempo_pausa, tempo_total, quantidade "
+            "FROM ciclos WHERE 1 = 1"
+        )
+        params: list[Any] = []
+        if produto:
+            sql += " AND produto = ?"
+            params.append(produto)
+        if inicio:
+            sql += " AND datetime >= ?"
+            params.append(inicio)
+        if fim:
+            sql += " AND datetime < ?"
+            params.append(fim)
+        sql += " ORDER BY datetime, id"
+
+        cur = self._conn().execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            yield from rows
+
+    def iter_numeric_chunks(
+        self,
+        produto: str | None = None,
+        inicio: str | None = None,
+        fim: str | None = None,
+        chunk: int = 100_000,
+    ) -> tuple[dict[int, str], Iterator[list[tuple[int, int, int, int, int]]]]:
+        """
+        Para montar colunas NumPy sem loop por registro: ({id: produto}, blocos
+        de tuplas só de inteiros (epoch, id do produto, tp, pausa, total)), onde
+        o id é o rowid do produto na tabela `produtos`. Mesmo filtro de iter_rows.
+        """
+        conn = self._conn()
+        nomes = dict(conn.execute("SELECT rowid, produto FROM produtos"))
+        sql = (
+            "SELECT CAST(strftime('%s', c.datetime) AS INTEGER), p.rowid, "
+            "c.tempo_producao, c.tempo_pausa, c.tempo_total "
+            "FROM ciclos c JOIN produtos p ON p.produto = c.produto WHERE 1 = 1"
+        )
+        params: list[Any] = []
+        if produto:
+            sql += " AND c.produto = ?"
+            params.append(produto)
+        if inicio:
+            sql += " AND c.datetime >= ?"
+            params.append(inicio)
+        if fim:
+            sql += " AND c.datetime < ?"
+            params.append(fim)
+
+        def blocos() -> Iterator[list[tuple[int, int, int, int, int]]]:
+            cur = conn.execute(sql, params)
+            while rows := cur.fetchmany(chunk):
+                yield rows
+
+        return nomes, blocos()
+
+    def iter_records(self, produto: str | None = None, inicio: str | None = None, fim: str | None = None):
+        """Mesmo que iter_rows, mas devolvendo CycleRecord."""
+        for dt, prod, tp, pausa, total, qtd in self.iter_rows(produto, inicio, fim):
+            yield CycleRecord(dt, parse_timestamp(dt), prod, tp, pausa, total, qtd)
+
+    def query(
+        self,
+        produto: str | None = None,
+        inicio: str | None = None,
+        fim: str | None = None,
+    ) -> list[dict]:
+        """Ciclos filtrados por produto e intervalo ['inicio', 'fim'), em ordem cronológica."""
+        return [_row_to_dict(r) for r in self.iter_rows(produto, inicio, fim)]
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) not in (3, 4):
+        print("uso: python -m core.cycle_store <logs.txt> <ciclos.db> [pasta dos segmentos]")
+        sys.exit(1)
+
+    from core.segments import SegmentArchive
+
+    store = CycleStore(sys.argv[2], parse_log_line)
+    store.import_log_file(sys.argv[1], SegmentArchive(sys.argv[3]) if len(sys.argv) == 4 else None)
+    store.close()
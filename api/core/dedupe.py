@@ -0,0 +1,124 @@
+"""
+dedupe.py — Descarte de registros reenviados pelo outbox das estações
+
+Cada estação numera seus ciclos (seq crescente por dispositivo) e reenvia
+do outbox tudo que ainda não recebeu ACK. Depois de uma queda de conexão
+no meio de um lote, parte do que chega já foi gravado; o rastreador
+guarda, por dispositivo, o maior seq aceito e os seqs vistos numa janela
+abaixo dele, e só deixa passar o que é novo.
+
+A estação pode perder a memória e recomeçar a contagem (outbox/NVS
+reformatados). Isso é detectado de dois jeitos, e aí o estado do
+dispositivo é reiniciado em vez de o registro ser descartado:
+ - seq abaixo da janela: mais antigo que qualquer reenvio possível, já que
+   um reenvio sai do outbox, que é menor que a janela
+ - seq já visto com outro epoch: um reenvio leva a mesma hora de captura
+   do original; outro epoch é outro ciclo (só vale quando os dois epochs
+   são conhecidos, com o relógio da estação sincronizado)
+"""
+
+from collections.abc import Iterable
+
+# o dobro da capacidade do outbox do firmware (OUTBOX_CAPACITY = 1024)
+JANELA_PADRAO = 2048
+
+
+class _Dispositivo:
+    __slots__ = ("max_seq", "vistos")
+
+    def __init__(self):
+        self.max_seq = -1
+        # seq -> epoch da captura (None se a estação não mandou)
+        self.vistos: dict[int, int | None] = {}
+
+
+class DeviceSeqTracker:
+    def __init__(self, janela: int = JANELA_PADRAO):
+        self.janela = janela
+        self._dispositivos: dict[str, _Dispositivo] = {}
+        self.aceitos = 0
+        self.duplicados = 0
+        self.reinicios = 0
+        self._carregando = False
+
+    def aceitar(self, device: str, seq: int, epoch: int | None = None) -> bool:
+        """True se (device, seq) ainda não foi aceito; já registra como visto."""
+        d = self._dispositivos.get(device)
+        if d is None:
+            d = self._dispositivos[device] = _Dispositivo()
+
+        if seq < d.max_seq - self.janela:
+            # contagem reiniciada na estação
+            self._reiniciar(device, d)
+
+        if seq in d.vistos:
+            anterior = d.vistos[seq]
+            if epoch is None or anterior is None or anterior == epoch:
+                self.duplicados += 1
+                return False
+            # mesmo seq, outra captura: contagem reiniciada na estação
+            self._reiniciar(device, d)
+
+        d.vistos[seq] = epoch
+        if seq > d.max_seq:
+            d.max_seq = seq
+            if len(d.vistos) > 2 * self.janela:
+                limite = d.max_seq - self.janela
+                d.vistos = {s: e for s, e in d.vistos.items() if s >= limite}
+        self.aceitos += 1
+        return True
+
+    def _reiniciar(self, device: str, d: _Dispositivo) -> None:
+        if not self._carregando:
+            print(f"[TCP] {device} recomeçou a contagem (seq máximo era {d.max_seq})")
+            self.reinicios += 1
+        d.max_seq = -1
+        d.vistos.clear()
+
+    def esquecer(self, device: str, seq: int) -> None:
+        """Desfaz aceitar() de um registro que não chegou a ser gravado (o reenvio deve passar)."""
+        d = self._dispositivos.get(device)
+        if d is not None:
+            d.vistos.pop(seq, None)
+
+    def carregar(self, origens: Iterable[tuple[str, int, int | None]]) -> int:
+        """Marca como vistos os (device, seq, epoch) já gravados, em ordem de gravação; devolve quantos."""
+        n = 0
+        self._carregando = True
+        try:
+            for device, seq, epoch in origens:
+                self.aceitar(device, seq, epoch)
+                n += 1
+        finally:
+            self._carregando = False
+        self.aceitos -= n
+        return n
+
+    def carregar_linhas(self, linhas: Iterable[str]) -> int:
+        """Mesmo que carregar(), a partir de linhas já gravadas no logs.txt."""
+        return self.carregar(c for c in map(parse_device_seq, linhas) if c is not None)
+
+    def stats(self) -> dict[str, int | dict[str, int]]:
+        return {
+            "aceitos": self.aceitos,
+            "duplicados": self.duplicados,
+            "reinicios": self.reinicios,
+            "dispositivos": {dev: d.max_seq for dev, d in self._dispositivos.items()},
+        }
+
+
+def parse_device_seq(msg: str) -> tuple[str, int, int | None] | None:
+    """
+    (device, seq, epoch) de "produto;tp;pausa;total;qtd;device;seq[;epoch]"
+    (com ou sem o prefixo "TIMESTAMP | "); None para o formato antigo de
+    5 campos. epoch é a hora da captura na estação (None se não veio ou é 0,
+    quando o relógio dela ainda não estava sincronizado).
+    """
+    partes = msg.strip().split(";")
+    if len(partes) < 7:
+        return None
+    device, seq = partes[5].strip(), partes[6].strip()
+    if not device or not seq.isdigit():
+        return None
+    epoch = partes[7].strip() if len(partes) > 7 else ""
+    return device, int(seq), int(epoch) if epoch.isdigit() and int(epoch) > 0 else None
@@ -0,0 +1,63 @@
+"""
+events.py — Pub/sub em memória para o stream SSE do dashboard
+
+Cada cliente do /logs/stream tem sua própria fila limitada. O publish
+serializa o evento uma única vez e entrega a mesma string a todas as filas,
+como (id, mensagem): o id (campo `id:` do SSE) é a posição do evento no
+fluxo, para o consumidor pular o que já estava no snapshot que enviou.
+Um cliente lento que enche a fila é desconectado (recebe None) e o
+EventSource do navegador reconecta, recebendo um snapshot novo.
+"""
+
+import json
+import queue
+import threading
+
+
+def format_sse(event: str, data, id: int | None = None) -> str:
+    """Formata um evento no padrão text/event-stream."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    campo_id = f"id: {id}\n" if id is not None else ""
+    return f"{campo_id}event: {event}\ndata: {payload}\n\n"
+
+
+class EventBroker:
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscribers: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data, id: int | None = None) -> None:
+        with self._lock:
+            if not self._subscribers:
+                return
+            subscribers = list(self._subscribers)
+
+        item = (id, format_sse(event, data, id))
+        for q in subscribers:
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                # cliente não acompanha: encerra o stream dele
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
@@ -0,0 +1,127 @@
+"""
+Fast extraction of the first <table> of an ERP export page.
+
+The export pages carry a large <head> (scripts, styles, menus) around a
+single results table. Instead of building a full BeautifulSoup tree, the
+raw bytes are sliced at the first "<table" and fed to the stdlib
+HTMLParser, which only collects cell text and stops at the matching
+"</table>". Everything here is synchronous and CPU-bound: callers on the
+async loop should run it in a worker thread (asyncio.to_thread).
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+
+# text the ERP renders instead of the table when the filter matches nothing
+EMPTY_RESULT_SENTINEL = "Nenhuma ordem de produção encontrada."
+
+_TABLE_START = re.compile(rb"<table[\s>]|<script[\s>]", re.IGNORECASE)
+_SCRIPT_END = re.compile(rb"</script\s*>", re.IGNORECASE)
+
+# input is fed in chunks so parsing stops soon after the table closes
+_FEED_CHUNK = 64 * 1024
+
+
+def is_empty_result(raw: bytes, encoding: str = "utf-8") -> bool:
+    """True if the page says no orders were found (checked on the raw bytes)."""
+    try:
+        sentinel = EMPTY_RESULT_SENTINEL.encode(encoding)
+    except (LookupError, UnicodeEncodeError):
+        sentinel = EMPTY_RESULT_SENTINEL.encode("utf-8")
+    return sentinel in raw
+
+
+class _TableDone(Exception):
+    pass
+
+
+class _FirstTableParser(HTMLParser):
+    """Collects the <td> texts of each <tr> of the first table (nested tables included as text)."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: list[list[str]] = []
+        self._depth = 0
+        self._row: list[str] | None = None
+        self._cell: list[str] | None = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._depth += 1
+        elif self._depth != 1:
+            return
+        elif tag == "tr":
+            self._close_row()
+            self._row = []
+        elif tag == "td":
+            self._close_cell()
+            if self._row is None:
+                self._row = []
+            self._cell = []
+        elif tag == "th":
+            # header cells are not data: close any open cell and ignore the text
+            self._close_cell()
+
+    def handle_endtag(self, tag):
+        if tag == "table":
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_row()
+                raise _TableDone
+        elif self._depth != 1:
+            return
+        elif tag == "td":
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _close_cell(self):
+        if self._cell is not None and self._row is not None:
+            self._row.append("".join(self._cell).strip())
+        self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+        self._row = None
+
+
+def extract_first_table(raw: bytes, encoding: str = "utf-8") -> list[list[str]] | None:
+    """
+    Rows of the first <table> as lists of stripped <td> texts, in document
+    order (header rows made of <th> come back as empty lists). None if the
+    page has no table.
+    """
+    # first "<table" outside <script> blocks (inline JS may contain the string)
+    pos = 0
+    while True:
+        match = _TABLE_START.search(raw, pos)
+        if match is None:
+            return None
+        if match.group()[1:].lower().startswith(b"table"):
+            break
+        end = _SCRIPT_END.search(raw, match.end())
+        if end is None:
+            return None
+        pos = end.end()
+
+    parser = _FirstTableParser()
+    # incremental: a multi-byte character may be split between two chunks
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    body = memoryview(raw)[match.start() :]
+    try:
+        for start in range(0, len(body), _FEED_CHUNK):
+            parser.feed(decoder.decode(body[start : start + _FEED_CHUNK]))
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+    except _TableDone:
+        pass
+    # unterminated table: keep what was read
+    parser._close_row()
+    return parser.rows
@@ -0,0 +1,40 @@
+"""
+http_cache.py — Cache da resposta serializada por versão dos dados
+
+Guarda os bytes já serializados da última versão calculada. Enquanto a
+versão não muda (nenhum registro novo), todas as requisições reaproveitam
+os mesmos bytes; quando muda, só uma thread recalcula e as demais esperam
+o resultado em vez de repetir o trabalho.
+"""
+
+import threading
+from collections.abc import Callable
+
+
+class VersionedCache:
+    def __init__(self, build: Callable[[], bytes]):
+        self.build = build
+        self._lock = threading.Lock()
+        self._version: str | None = None
+        self._body = b""
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag_for(version: str) -> str:
+        return f"v{version}"
+
+    def get(self, version: str) -> tuple[str, bytes]:
+        """Retorna (etag, corpo) para a versão pedida, recalculando se necessário."""
+        with self._lock:
+            if self._version == version:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._body = self.build()
+                self._version = version
+            return self.etag_for(version), self._body
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
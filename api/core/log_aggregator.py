@@ -0,0 +1,198 @@
+"""
+log_aggregator.py — Agregação incremental do logs.txt para o endpoint /logs
+
+Em vez de reler o arquivo inteiro a cada requisição, o agregador lembra o
+offset (em bytes) até onde já leu, parseia apenas as linhas novas e mantém:
+ - soma/contagem de tempo_total por produto (para a média)
+ - os 50 registros mais novos (por data) de cada produto, em ordem
+   cronológica: um registro atrasado entra na posição dele e só sai
+   se for mais velho que todos os guardados
+
+Truncamento, rotação ou reescrita do arquivo são detectados por tamanho,
+inode e pelos primeiros bytes do arquivo; nesses casos o estado é
+reconstruído do zero. Com um SegmentArchive, a reconstrução parte dos
+índices dos segmentos arquivados (soma/contagem) e dos registros mais
+novos de cada produto, então a rotação diária não zera as médias.
+"""
+
+import bisect
+import os
+import threading
+from collections.abc import Callable
+from typing import Any
+
+# quantos registros por produto são devolvidos ao dashboard
+MAX_LOGS_POR_PRODUTO = 50
+
+# bytes iniciais usados para detectar reescrita do arquivo
+_HEAD_SIZE = 64
+
+
+def _data(registro: dict) -> str:
+    return registro["datetime"]
+
+
+class _ProdutoStats:
+    __slots__ = ("soma", "count", "logs", "max_logs")
+
+    def __init__(self, max_logs: int):
+        self.soma = 0
+        self.count = 0
+        self.max_logs = max_logs
+        # do mais antigo ao mais novo (datetime em iso ordena como texto)
+        self.logs: list[dict] = []
+
+    def guardar(self, registro: dict) -> None:
+        logs = self.logs
+        if not logs or logs[-1]["datetime"] <= registro["datetime"]:
+            logs.append(registro)
+        else:
+            bisect.insort_right(logs, registro, key=_data)
+        if len(logs) > self.max_logs:
+            del logs[0]
+
+
+class LogAggregator:
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        parse_line: Callable[[str], Any],
+        max_logs: int = MAX_LOGS_POR_PRODUTO,
+        archive=None,
+    ):
+        self.path = str(path)
+        self.parse_line = parse_line
+        self.max_logs = max_logs
+        self.archive = archive
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.offset = 0
+        self._ident: tuple[int, int] | None = None
+        self._head = b""
+        self.produtos: dict[str, _ProdutoStats] = {}
+        self._semeado = False
+
+    def _semear_do_arquivo(self) -> None:
+        """Carrega totais e registros recentes dos segmentos arquivados."""
+        self._semeado = True
+        if self.archive is None:
+            return
+        for prod, (soma, count) in self.archive.product_totals().items():
+            stats = self.produtos[prod] = _ProdutoStats(self.max_logs)
+            stats.soma = soma
+            stats.count = count
+            for r in self.archive.recent_records(prod, self.max_logs):
+                stats.guardar(r.to_dict())
+
+    # -------------------------------------------------------
+    # leitura incremental
+    # -------------------------------------------------------
+
+    def _precisa_reconstruir(self, f, st: os.stat_result) -> bool:
+        if self._ident is None:
+            return False
+        if (st.st_dev, st.st_ino) != self._ident:
+            return True  # arquivo rotacionado / substituído
+        if st.st_size < self.offset:
+            return True  # arquivo truncado
+        if self._head:
+            f.seek(0)
+            if f.read(len(self._head)) != self._head:
+                return True  # arquivo reescrito com outro conteúdo
+        return False
+
+    def refresh(self) -> list[dict]:
+        """
+        Lê apenas o que foi anexado desde a última chamada.
+        Retorna a lista de registros novos (já aplicados ao estado).
+        """
+        with self._lock:
+            try:
+                f = open(self.path, "rb")
+            except FileNotFoundError:
+                if self._ident is not None:
+                    self._reset()
+                if not self._semeado:
+                    self._semear_do_arquivo()
+                return []
+
+            with f:
+                st = os.fstat(f.fileno())
+                if self._precisa_reconstruir(f, st):
+                    print("[LOGS] logs.txt truncado ou rotacionado, reconstruindo agregados")
+                    self._reset()
+
+                if not self._semeado:
+                    self._semear_do_arquivo()
+
+                self._ident = (st.st_dev, st.st_ino)
+                if st.st_size == self.offset:
+                    return []
+
+                f.seek(self.offset)
+                chunk = f.read(st.st_size - self.offset)
+
+                # consome só até a última linha completa; o resto fica
+                # para a próxima leitura (escrita ainda em andamento)
+                fim = chunk.rfind(b"\n")
+                if fim < 0:
+                    return []
+                chunk = chunk[: fim + 1]
+
+                if self.offset < _HEAD_SIZE:
+                    f.seek(0)
+                    self._head = f.read(min(_HEAD_SIZE, self.offset + len(chunk)))
+                self.offset += len(chunk)
+
+            novos = []
+            for line in chunk.decode("utf-8", errors="replace").splitlines():
+                parsed = self.parse_line(line.strip())
+                if parsed:
+                    novos.append(self._aplicar(parsed))
+            return novos
+
+    def _aplicar(self, registro) -> dict:
+        # guarda a versão já serializável (datetime como iso string)
+        if hasattr(registro, "to_dict"):
+            registro = registro.to_dict()
+        else:
+            dt = registro.get("datetime")
+            if dt is not None and not isinstance(dt, str):
+                registro = dict(registro, datetime=dt.isoformat())
+
+        prod = registro["produto"]
+        stats = self.produtos.get(prod)
+        if stats is None:
+            stats = self.produtos[prod] = _ProdutoStats(self.max_logs)
+        stats.soma += registro["tempo_total"]
+        stats.count += 1
+        stats.guardar(registro)
+        return registro
+
+    # -------------------------------------------------------
+    # consulta
+    # -------------------------------------------------------
+
+    def media(self, produto: str) -> float:
+        with self._lock:
+            stats = self.produtos.get(produto)
+            return stats.soma / stats.count if stats and stats.count else 0
+
+    def medias(self, produtos) -> dict[str, float]:
+        return {prod: self.media(prod) for prod in produtos}
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Retorna o mesmo formato que o /logs sempre devolveu:
+        {produto: {"media": float, "logs": [registros do mais novo ao mais antigo]}}
+        """
+        with self._lock:
+            produtos: dict[str, Any] = {}
+            for prod, stats in self.produtos.items():
+                produtos[prod] = {
+                    "media": stats.soma / stats.count if stats.count else 0,
+                    "logs": [dict(r) for r in reversed(stats.logs)],
+                }
+            return produtos
@@ -0,0 +1,217 @@
+"""
+log_parser.py — Parse das linhas do logs.txt
+
+Formato gravado pelo servidor TCP:
+    "YYYY-MM-DD HH:MM:SS | produto;tp;pausa;total;qtd"
+Registros com seq acrescentam ";device;seq[;epoch]" e os de quadros
+binários ainda ";loop_us;tp_ms;pausa_ms;total_ms" (tp/pausa/total continuam
+em segundos inteiros; os ms vão em tempos_ms).
+
+parse_log_line() é o caminho rápido: fatia o timestamp de 19 caracteres em
+posições fixas (com cache por segundo), faz um único split(';') e devolve um
+CycleRecord com __slots__. Linhas fora do formato exato caem no parser
+tolerante (parse_log_line_tolerant), que mantém o comportamento antigo.
+"""
+
+import datetime
+from collections.abc import Iterator
+
+# timestamps já convertidos (linhas do mesmo segundo repetem o prefixo)
+_TS_CACHE: dict[str, datetime.datetime] = {}
+_TS_CACHE_MAX = 4096
+
+
+class CycleRecord:
+    """Um ciclo parseado. Aceita r["campo"] para compatibilidade com o antigo dict."""
+
+    __slots__ = (
+        "data",
+        "datetime",
+        "produto",
+        "tempo_producao",
+        "tempo_pausa",
+        "tempo_total",
+        "quantidade",
+        "tempos_ms",
+        "device",
+        "seq",
+        "epoch",
+    )
+
+    def __init__(
+        self, data, dt, produto, tempo_producao, tempo_pausa, tempo_total, quantidade, tempos_ms=None
+    ):
+        self.data = data
+        self.datetime = dt
+        self.produto = produto
+        self.tempo_producao = tempo_producao
+        self.tempo_pausa = tempo_pausa
+        self.tempo_total = tempo_total
+        self.quantidade = quantidade
+        # (tp, pausa, total) em ms, quando a estação mandou (quadro binário); senão None
+        self.tempos_ms = tempos_ms
+        # estação de origem (registros com seq); epoch None se não veio ou é 0
+        self.device: str | None = None
+        self.seq: int | None = None
+        self.epoch: int | None = None
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"CycleRecord({self.data!r}, {self.produto!r}, {self.tempo_total})"
+
+    def to_dict(self) -> dict:
+        """Formato do JSON do /logs (datetime em iso, derivado da string sem strftime)."""
+        return {
+            "data": self.data,
+            "datetime": f"{self.data[:10]}T{self.data[11:]}",
+            "produto": self.produto,
+            "tempo_producao": self.tempo_producao,
+            "tempo_pausa": self.tempo_pausa,
+            "tempo_total": self.tempo_total,
+            "quantidade": self.quantidade,
+        }
+
+
+def parse_timestamp(ts: str) -> datetime.datetime:
+    """'YYYY-MM-DD HH:MM:SS' por posições fixas; ValueError se fora do formato."""
+    dt = _TS_CACHE.get(ts)
+    if dt is not None:
+        return dt
+    if ts[4] != "-" or ts[7] != "-" or ts[10] != " " or ts[13] != ":" or ts[16] != ":":
+        raise ValueError(ts)
+    dt = datetime.datetime(
+        int(ts[0:4]), int(ts[5:7]), int(ts[8:10]), int(ts[11:13]), int(ts[14:16]), int(ts[17:19])
+    )
+    if len(_TS_CACHE) >= _TS_CACHE_MAX:
+        _TS_CACHE.clear()
+    _TS_CACHE[ts] = dt
+    return dt
+
+
+def parse_log_line(line: str) -> CycleRecord | None:
+    """
+    Caminho rápido para "YYYY-MM-DD HH:MM:SS | produto;tp;pausa;total;qtd".
+    Qualquer desvio do formato exato vai para o parser tolerante.
+    """
+    if len(line) > 22 and line[19:22] == " | ":
+        ts = line[:19]
+        parts = line[22:].split(";")
+        if len(parts) >= 5:
+            try:
+                r = CycleRecord(
+                    ts,
+                    parse_timestamp(ts),
+                    parts[0].strip(),
+                    int(parts[1]),
+                    int(parts[2]),
+                    int(parts[3]),
+                    int(parts[4]),
+                )
+            except ValueError:
+                pass
+            else:
+                if len(parts) >= 7:
+                    _extras(r, parts)
+                return r
+
+    d = parse_log_line_tolerant(line)
+    if d is None:
+        return None
+    return CycleRecord(
+        d["data"],
+        d["datetime"],
+        d["produto"],
+        d["tempo_producao"],
+        d["tempo_pausa"],
+        d["tempo_total"],
+        d["quantidade"],
+    )
+
+
+def _extras(r: CycleRecord, parts: list[str]) -> None:
+    """device/seq/epoch (campos 6-8) e tp/pausa/total em ms (10-12), quando presentes e válidos."""
+    device, seq = parts[5].strip(), parts[6].strip()
+    if device and seq.isdigit():
+        r.device = device
+        r.seq = int(seq)
+        epoch = parts[7].strip() if len(parts) > 7 else ""
+        r.epoch = int(epoch) if epoch.isdigit() and int(epoch) > 0 else None
+    if len(parts) >= 12:
+        try:
+            r.tempos_ms = int(parts[9]), int(parts[10]), int(parts[11])
+        except ValueError:
+            pass
+
+
+def iter_log_records(path) -> Iterator[CycleRecord]:
+    """Percorre um arquivo de log devolvendo só as linhas válidas."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            r = parse_log_line(line.strip())
+            if r is not None:
+                yield r
+
+
+def parse_log_line_tolerant(line: str):
+    """
+    Tenta parsear uma linha de log no formato:
+    "YYYY-MM-DD HH:MM:SS | produto;tp;pausa;total;qtd"
+
+    Retorna um dict com os campos ou None se não for possível.
+    A função é tolerante: aceita espaços variados e tenta preencher valores faltantes.
+    """
+    if not line:
+        return None
+
+    # Tentativa simples: encontrar ' | ' (com espaço) ou '|' sem espaços
+    if " | " in line:
+        ts_part, rest = line.split(" | ", 1)
+    elif "|" in line:
+        ts_part, rest = line.split("|", 1)
+        ts_part = ts_part.strip()
+        rest = rest.strip()
+    else:
+        # sem separador reconhecível -> não conseguimos parsear
+        return None
+
+    # tenta converter timestamp
+    try:
+        dt = datetime.datetime.strptime(ts_part.strip(), "%Y-%m-%d %H:%M:%S")
+    except Exception:
+        # se falhar, rejeita
+        return None
+
+    # separa o resto por ';' e normaliza quantidade de itens
+    parts = [p.strip() for p in rest.split(";")]
+    # esperamos 5 campos: produto, tp, pausa, total, qtd
+    while len(parts) < 5:
+        parts.append("0")
+    produto = parts[0]
+    try:
+        tp = int(parts[1]) if parts[1] else 0
+    except Exception:
+        tp = 0
+    try:
+        pausa = int(parts[2]) if parts[2] else 0
+    except Exception:
+        pausa = 0
+    try:
+        total = int(parts[3]) if parts[3] else 0
+    except Exception:
+        total = tp + pausa
+    try:
+        qtd = int(parts[4]) if parts[4] else 0
+    except Exception:
+        qtd = 0
+
+    return {
+        "data": dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "datetime": dt,
+        "produto": produto,
+        "tempo_producao": tp,
+        "tempo_pausa": pausa,
+        "tempo_total": total,
+        "quantidade": qtd,
+    }
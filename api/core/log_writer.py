@@ -0,0 +1,251 @@
+"""
+log_writer.py — Escritor em lote (group commit) do logs.txt
+
+Todas as conexões entregam suas linhas a uma fila única; uma thread
+escritora junta o que chegou e grava o lote com um único write():
+ - flush quando o lote atinge `max_batch` registros ou quando passam
+   `max_delay` segundos desde o primeiro registro do lote
+ - fsync opcional por lote (modo durável)
+ - cada linha recebe um Future que só resolve depois que o lote dela
+   foi gravado, então o ACK para a estação sai só após a gravação
+ - `sinks` são o armazenamento durável do lote (ex.: ciclos e rollups no
+   SQLite): rodam juntos dentro de `transaction()`, se informada, e uma
+   falha em qualquer um desfaz o lote inteiro e falha os Futures
+ - sem sinks o arquivo texto é o armazenamento durável; com sinks ele é só
+   um espelho: gravado depois do commit e, se falhar, só registra o erro
+   (a estação não reenvia o que já está no banco). `path=None` desliga
+ - `mirrors` recebem o lote depois do durável e antes dos Futures
+   (ex.: histórico em memória); falhas neles também não afetam o ACK
+ - `listeners` são avisados depois que o lote foi gravado e confirmado
+   (ex.: eventos para o dashboard); falhas neles não afetam o ACK
+ - `snapshot(fn)` roda fn() entre dois lotes e devolve junto o `seq` que
+   ela reflete (gravação, mirrors e seq de um lote acontecem sob o mesmo
+   lock), para um leitor saber quais eventos já estão no que leu
+ - com `parse_line`, o lote é parseado uma única vez e sinks/listeners
+   recebem os registros válidos em vez das linhas
+ - com `rotate`, na virada do dia o arquivo é fechado e entregue ao
+   callback (ex.: SegmentArchive.rotate) antes de abrir um novo
+
+O arquivo fica aberto entre lotes e é reaberto se for removido/rotacionado.
+"""
+
+import datetime
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class BatchLogWriter:
+    def __init__(
+        self,
+        path: str | os.PathLike | None,
+        max_batch: int = 500,
+        max_delay: float = 0.05,
+        fsync: bool = False,
+        sinks: list[Callable[[list], object]] | None = None,
+        transaction: Callable[[], AbstractContextManager] | None = None,
+        mirrors: list[Callable[[list], object]] | None = None,
+        listeners: list[Callable[[list], object]] | None = None,
+        parse_line: Callable[[str], object] | None = None,
+        rotate: Callable[[str, datetime.date], object] | None = None,
+    ):
+        self.path = str(path) if path is not None else None
+        self.parse_line = parse_line
+        self.rotate = rotate
+        # dia do segmento ativo (última gravação); None até a primeira abertura
+        self._dia: datetime.date | None = None
+        self.sinks = list(sinks or [])
+        self.transaction = transaction
+        self.mirrors = list(mirrors or [])
+        self.listeners = list(listeners or [])
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        # total de registros já gravados (cresce a cada lote)
+        self.seq = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._file = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # gravação de um lote até o seq avançar (ver snapshot())
+        self._lote_lock = threading.Lock()
+
+    # -------------------------------------------------------
+    # ciclo de vida
+    # -------------------------------------------------------
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Grava o que estiver pendente e encerra a thread escritora."""
+        if not self._thread:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def pending(self) -> int:
+        """Linhas na fila esperando o próximo lote."""
+        return self._queue.qsize()
+
+    def snapshot(self, fn: Callable[[], object]) -> tuple[int, object]:
+        """(seq, fn()) com fn() rodando entre dois lotes: o resultado reflete exatamente os `seq` primeiros."""
+        with self._lote_lock:
+            return self.seq, fn()
+
+    def submit(self, line: str) -> Future:
+        """Enfileira uma linha (sem '\\n'); o Future resolve quando estiver gravada."""
+        if not self._thread:
+            self.start()
+        fut: Future = Future()
+        self._queue.put((line, fut))
+        return fut
+
+    # -------------------------------------------------------
+    # thread escritora
+    # -------------------------------------------------------
+
+    def _run(self) -> None:
+        parar = False
+        while not parar:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                restante = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=restante) if restante > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    parar = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+        self._fechar()
+
+    def _abrir(self):
+        if self._file is not None:
+            try:
+                st = os.stat(self.path)
+                atual = os.fstat(self._file.fileno())
+                if (st.st_dev, st.st_ino) == (atual.st_dev, atual.st_ino):
+                    return self._file
+            except OSError:
+                pass
+            # arquivo sumiu ou foi rotacionado: reabre no path configurado
+            self._fechar()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _dia_do_arquivo(self) -> datetime.date | None:
+        """Arquivo existente herda o dia da última modificação."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return datetime.date.fromtimestamp(st.st_mtime) if st.st_size else None
+
+    def _rotacionar_se_necessario(self) -> None:
+        hoje = datetime.date.today()
+        if self.rotate is None or self._dia is None or self._dia == hoje:
+            return
+        self._fechar()
+        try:
+            self.rotate(self.path, self._dia)
+        except Exception as e:
+            # segue gravando no mesmo arquivo; tenta de novo no próximo lote
+            print("[LOGS] Falha ao rotacionar segmento:", e)
+            return
+        self._dia = hoje
+
+    def _fechar(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _gravar_texto(self, lines: list[str]) -> None:
+        if self._dia is None:
+            self._dia = self._dia_do_arquivo()
+        self._rotacionar_se_necessario()
+        f = self._abrir()
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self._dia = datetime.date.today()
+
+    def _flush(self, batch: list[tuple[str, Future]]) -> None:
+        with self._lote_lock:
+            registros = self._gravar(batch)
+        if registros is None:
+            return
+
+        for _, fut in batch:
+            fut.set_result(None)
+
+        for listener in self.listeners:
+            try:
+                listener(registros)
+            except Exception as e:
+                print("[LOGS] Falha no listener do lote:", e)
+
+    def _gravar(self, batch: list[tuple[str, Future]]) -> list | None:
+        """Grava o lote e avança o seq; None se falhou (Futures já com a exceção)."""
+        lines = [line for line, _ in batch]
+        try:
+            if self.parse_line is not None:
+                registros = [r for r in map(self.parse_line, lines) if r is not None]
+            else:
+                registros = lines
+            if self.sinks:
+                with self.transaction() if self.transaction is not None else nullcontext():
+                    for sink in self.sinks:
+                        sink(registros)
+            elif self.path is not None:
+                self._gravar_texto(lines)
+        except Exception as e:
+            print("[LOGS] Falha ao gravar lote:", e)
+            self._fechar()
+            for _, fut in batch:
+                fut.set_exception(e)
+            return None
+
+        # daqui em diante o lote já está gravado: nada aqui falha os Futures
+        if self.sinks and self.path is not None:
+            try:
+                self._gravar_texto(lines)
+            except Exception as e:
+                print("[LOGS] Falha ao espelhar lote no texto:", e)
+                self._fechar()
+
+        for mirror in self.mirrors:
+            try:
+                mirror(registros)
+            except Exception as e:
+                print("[LOGS] Falha ao espelhar lote:", e)
+
+        self.seq += len(batch)
+        return registros
@@ -0,0 +1,307 @@
+"""
+metrics.py — Registro de métricas no formato texto do Prometheus
+
+Contadores, gauges e histogramas em memória, sem dependência externa,
+expostos pelo /metrics. Cada métrica tem o próprio lock e as séries são
+indexadas pela tupla de valores dos rótulos, então um inc()/observe() no
+caminho quente é um dict lookup e uma soma.
+
+Valores que já existem em outros objetos (tamanho de fila, hits do cache,
+logins do scraper) entram como funções lidas só na hora do scrape
+(gauge_func / counter_func), sem duplicar contagem.
+
+Também tem o monitor de atraso do event loop e um profiler por amostragem
+de pilhas (todas as threads) para o /debug/profile.
+"""
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Contagem
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager
+
+# latências (segundos): de 0,5 ms a 10 s
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# valor do rótulo que passou do limite de valores distintos (Counter.max_valores)
+OUTRO = "outro"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: tuple[str, ...], valores: tuple, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Iterable[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+
+    def _chave(self, valores: dict) -> tuple:
+        return tuple(str(valores.get(n, "")) for n in self.rotulos)
+
+    def _linhas(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        cabecalho = f"# HELP {self.nome} {self.ajuda}\n# TYPE {self.nome} {self.tipo}\n"
+        return cabecalho + "".join(line + "\n" for line in self._linhas())
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=(), max_valores: int = 0):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: dict[tuple, float] = {}
+        # rótulos que vêm do cliente (device, produto): até max_valores valores
+        # distintos por rótulo (0 = sem limite), os seguintes entram como OUTRO
+        self.max_valores = max_valores
+        self._vistos: list[set[str]] = [set() for _ in self.rotulos]
+
+    def _limitar(self, chave: tuple, registrar: bool) -> tuple:
+        if not self.max_valores:
+            return chave
+        saida = []
+        for vistos, v in zip(self._vistos, chave):
+            if v not in vistos:
+                if len(vistos) >= self.max_valores:
+                    v = OUTRO
+                elif registrar:
+                    vistos.add(v)
+            saida.append(v)
+        return tuple(saida)
+
+    def inc(self, valor: float = 1, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        with self._lock:
+            chave = self._limitar(chave, True)
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def value(self, **rotulos) -> float:
+        return self._valores.get(self._limitar(self._chave(rotulos), False), 0)
+
+    def _linhas(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f"{self.nome}{_rotulos(self.rotulos, k)} {_numero(v)}" for k, v in itens]
+
+
+class Gauge(Counter):
+    tipo = "gauge"
+
+    def set(self, valor: float, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = valor
+
+    def dec(self, valor: float = 1, **rotulos) -> None:
+        self.inc(-valor, **rotulos)
+
+
+class _MetricaFunc(_Metrica):
+    """Valor(es) lidos de uma função na hora do scrape: número ou {tupla de rótulos: número}."""
+
+    def __init__(self, nome, ajuda, func: Callable[[], float | dict], rotulos=()):
+        super().__init__(nome, ajuda, rotulos)
+        self.func = func
+
+    def _linhas(self):
+        valor = self.func()
+        if not isinstance(valor, dict):
+            valor = {(): valor}
+        return [
+            f"{self.nome}{_rotulos(self.rotulos, k if isinstance(k, tuple) else (k,))} {_numero(v)}"
+            for k, v in valor.items()
+            if v is not None
+        ]
+
+
+class GaugeFunc(_MetricaFunc):
+    tipo = "gauge"
+
+
+class CounterFunc(_MetricaFunc):
+    tipo = "counter"
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets: Iterable[float] = BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # chave -> [contagem por bucket (não cumulativa)..., soma]
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, valor: float, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        i = 0
+        while valor > self.buckets[i]:
+            i += 1
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * (len(self.buckets) + 1)
+            serie[i] += 1
+            serie[-1] += valor
+
+    @contextmanager
+    def time(self, **rotulos):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **rotulos)
+
+    def count(self, **rotulos) -> int:
+        serie = self._series.get(self._chave(rotulos))
+        return int(sum(serie[:-1])) if serie else 0
+
+    def _linhas(self):
+        with self._lock:
+            itens = [(k, list(s)) for k, s in self._series.items()]
+        linhas = []
+        for chave, serie in itens:
+            acumulado = 0
+            for limite, n in zip(self.buckets, serie):
+                acumulado += n
+                le = 'le="' + _numero(limite) + '"'
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}")
+            base = _rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{base} {_numero(serie[-1])}")
+            linhas.append(f"{self.nome}_count{base} {acumulado}")
+        return linhas
+
+
+class MetricsRegistry:
+    def __init__(self, prefixo: str = ""):
+        self.prefixo = prefixo
+        self._metricas: dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            if metrica.nome in self._metricas:
+                raise ValueError(f"métrica {metrica.nome} já registrada")
+            self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def counter(self, nome: str, ajuda: str, rotulos: Iterable[str] = (), max_valores: int = 0) -> Counter:
+        return self._registrar(Counter(self.prefixo + nome, ajuda, rotulos, max_valores))
+
+    def gauge(self, nome: str, ajuda: str, rotulos: Iterable[str] = ()) -> Gauge:
+        return self._registrar(Gauge(self.prefixo + nome, ajuda, rotulos))
+
+    def histogram(
+        self, nome: str, ajuda: str, rotulos: Iterable[str] = (), buckets: Iterable[float] = BUCKETS_LATENCIA
+    ) -> Histogram:
+        return self._registrar(Histogram(self.prefixo + nome, ajuda, rotulos, buckets))
+
+    def gauge_func(
+        self, nome: str, ajuda: str, func: Callable[[], float | dict], rotulos: Iterable[str] = ()
+    ) -> GaugeFunc:
+        return self._registrar(GaugeFunc(self.prefixo + nome, ajuda, func, rotulos))
+
+    def counter_func(
+        self, nome: str, ajuda: str, func: Callable[[], float | dict], rotulos: Iterable[str] = ()
+    ) -> CounterFunc:
+        return self._registrar(CounterFunc(self.prefixo + nome, ajuda, func, rotulos))
+
+    def render(self) -> str:
+        """Todas as métricas no formato texto do Prometheus (0.0.4)."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        partes = []
+        for m in metricas:
+            try:
+                partes.append(m.render())
+            except Exception as e:
+                # uma função de coleta com erro não derruba o scrape inteiro
+                partes.append(f"# erro ao coletar {m.nome}: {_escapar(e)}\n")
+        return "".join(partes)
+
+
+# -----------------------------------------------------------
+# event loop
+# -----------------------------------------------------------
+
+
+async def monitor_loop_lag(histograma: Histogram, ultimo: Gauge, intervalo: float = 0.5) -> None:
+    """
+    Dorme `intervalo` em loop e mede quanto a volta demorou além disso: é o
+    tempo que uma tarefa pronta esperou por callbacks bloqueando o loop.
+    """
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atraso = max(0.0, time.perf_counter() - t0 - intervalo)
+        histograma.observe(atraso)
+        ultimo.set(atraso)
+
+
+# -----------------------------------------------------------
+# profiler por amostragem
+# -----------------------------------------------------------
+
+# uma amostragem por vez (o resultado de duas sobrepostas não diria nada)
+_profiler_lock = threading.Lock()
+
+
+def sample_stacks(segundos: float, intervalo: float = 0.005, ignorar: Iterable[int] = ()) -> tuple[str, int]:
+    """
+    Amostra as pilhas de todas as threads a cada `intervalo` durante
+    `segundos` e devolve (pilhas agregadas, nº de amostras). Cada linha é
+    "thread;arquivo:função;...;arquivo:função contagem" (formato "collapsed"
+    do flamegraph.pl / speedscope). A thread que chama fica de fora, assim
+    como as de `ignorar`. Levanta RuntimeError se já houver uma amostragem
+    em andamento.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        raise RuntimeError("já existe uma amostragem em andamento")
+    try:
+        propria = threading.get_ident()
+        ignorar = set(ignorar) | {propria}
+        nomes = {}
+        pilhas: _Contagem[str] = _Contagem()
+        amostras = 0
+        fim = time.perf_counter() + segundos
+        while time.perf_counter() < fim:
+            nomes.update((t.ident, t.name) for t in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident in ignorar:
+                    continue
+                quadros = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    quadros.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                quadros.append(nomes.get(ident, str(ident)))
+                pilhas[";".join(reversed(quadros))] += 1
+            amostras += 1
+            time.sleep(intervalo)
+        texto = "".join(f"{pilha} {n}\n" for pilha, n in pilhas.most_common())
+        return texto, amostras
+    finally:
+        _profiler_lock.release()
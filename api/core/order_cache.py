@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from core.logger import logger
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class OrderCache:
+    """
+    Cache of order lookups keyed by OP code, meant to live on the async loop.
+
+    - entries expire after `ttl` seconds; at most `max_size` are kept (LRU)
+    - concurrent lookups of the same OP share a single in-flight fetch
+    - with `stale_while_revalidate`, an expired entry is returned at once
+      while a background refresh runs
+
+    `clock` is the time source for the TTL (time.monotonic by default).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Any]],
+        ttl: float = 300,
+        max_size: int = 256,
+        stale_while_revalidate: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetch = fetch
+        self.clock = clock
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_while_revalidate = stale_while_revalidate
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        # last fetch / lookup durations, in seconds
+        self._fetch_times: deque[float] = deque(maxlen=1000)
+        self._lookup_times: deque[float] = deque(maxlen=1000)
+
+    async def get(self, code: str) -> Any:
+        start = time.perf_counter()
+        try:
+            return await self._get(code)
+        finally:
+            self._lookup_times.append(time.perf_counter() - start)
+
+    async def _get(self, code: str) -> Any:
+        entry = self._entries.get(code)
+        if entry is not None:
+            self._entries.move_to_end(code)
+            if self.clock() - entry.fetched_at < self.ttl:
+                self.hits += 1
+                return entry.value
+            if self.stale_while_revalidate:
+                self.stale_hits += 1
+                self._start_fetch(code)
+                return entry.value
+
+        if code in self._inflight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        # shield: a cancelled caller must not cancel the fetch other callers wait on
+        return await asyncio.shield(self._start_fetch(code))
+
+    def _start_fetch(self, code: str) -> asyncio.Task:
+        task = self._inflight.get(code)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._do_fetch(code))
+            # background refreshes may have no awaiter: mark their errors as retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[code] = task
+        return task
+
+    async def _do_fetch(self, code: str) -> Any:
+        start = time.perf_counter()
+        try:
+            value = await self.fetch(code)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(code, None)
+            self._fetch_times.append(time.perf_counter() - start)
+
+        self._entries[code] = _Entry(value, self.clock())
+        self._entries.move_to_end(code)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.info(f"Order cache full, evicted OP {evicted}")
+        return value
+
+    def invalidate(self, code: str | None = None) -> None:
+        if code is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(code, None)
+
+    @staticmethod
+    def _percentiles_ms(samples) -> dict[str, float | None]:
+        values = sorted(samples)
+        if not values:
+            return {"p50": None, "p95": None, "max": None}
+
+        def pick(q: float) -> float:
+            return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+
+        return {"p50": pick(0.50), "p95": pick(0.95), "max": round(values[-1] * 1000, 3)}
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_rate": (self.hits + self.stale_hits + self.coalesced) / lookups if lookups else None,
+            "fetch_ms": self._percentiles_ms(list(self._fetch_times)),
+            "lookup_ms": self._percentiles_ms(list(self._lookup_times)),
+        }
@@ -0,0 +1,192 @@
+"""
+Local index of production orders, kept in sync with the ERP.
+
+Orders are held in memory keyed by code and by product (so a lookup is a
+dict access) and persisted to SQLite so the index survives restarts.
+A sync pass compares what the ERP returned with what is already indexed
+and only writes the differences.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import Any
+
+from core.logger import logger
+from core.orders import Order
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ordens (
+    code INTEGER PRIMARY KEY,
+    product TEXT NOT NULL,
+    deliver_date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ordens_product ON ordens (product, deliver_date);
+"""
+
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class OrderIndex:
+    def __init__(self, db_path: str | os.PathLike):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self._by_code: dict[int, Order] = {}
+        self._by_product: dict[str, dict[int, Order]] = {}
+        self.last_sync: dict[str, Any] | None = None
+        # called after each sync with the set of products whose orders changed
+        self.listeners: list[Callable[[set[str]], object]] = []
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if "status" not in {row[1] for row in conn.execute("PRAGMA table_info(ordens)")}:
+            # indexes created before the status column (synced with every status)
+            conn.execute("ALTER TABLE ordens ADD COLUMN status TEXT")
+        conn.commit()
+        self._load()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self) -> None:
+        rows = self._conn().execute("SELECT code, product, deliver_date, description, quantity, status FROM ordens")
+        for code, product, deliver_date, description, quantity, status in rows:
+            self._put(
+                Order(datetime.strptime(deliver_date, _DATE_FORMAT), code, product, description, quantity, status)
+            )
+
+    # -------------------------------------------------------
+    # in-memory indexes (callers hold self._lock)
+    # -------------------------------------------------------
+
+    def _put(self, order: Order) -> None:
+        old = self._by_code.get(order.code)
+        if old is not None and old.product != order.product:
+            self._drop(old.code)
+        self._by_code[order.code] = order
+        self._by_product.setdefault(order.product, {})[order.code] = order
+
+    def _drop(self, code: int) -> Order | None:
+        order = self._by_code.pop(code, None)
+        if order is not None:
+            orders = self._by_product.get(order.product)
+            if orders is not None:
+                orders.pop(code, None)
+                if not orders:
+                    del self._by_product[order.product]
+        return order
+
+    # -------------------------------------------------------
+    # lookups
+    # -------------------------------------------------------
+
+    def get(self, code: int) -> Order | None:
+        return self._by_code.get(code)
+
+    def by_product(self, product: str) -> list[Order]:
+        """Orders of a product, earliest delivery first."""
+        with self._lock:
+            orders = list(self._by_product.get(product, {}).values())
+        return sorted(orders, key=lambda o: (o.deliver_date, o.code))
+
+    def products(self) -> list[str]:
+        with self._lock:
+            return list(self._by_product)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    # -------------------------------------------------------
+    # sync
+    # -------------------------------------------------------
+
+    def apply_sync(self, orders: Iterable[Order], complete: bool = True) -> dict[str, int]:
+        """
+        Merges a sync pass into the index, writing only what changed. With
+        `complete` (every page was read), indexed orders the ERP no longer
+        returned are removed. A complete pass that returned no orders at all
+        is applied as partial: an error page parsed as "no orders" must not
+        wipe the index. An order returned more than once (e.g. by two status
+        listings) counts once, with its last version.
+        """
+        start = time.perf_counter()
+        latest: dict[int, Order] = {}
+        for order in orders:
+            latest[order.code] = order
+        seen = latest.keys()
+
+        with self._lock:
+            changed = [order for code, order in latest.items() if self._by_code.get(code) != order]
+
+            if complete and not seen and self._by_code:
+                logger.warning(f"Sync returned no orders; keeping the {len(self._by_code)} indexed ones.")
+                complete = False
+
+            added = sum(1 for o in changed if o.code not in self._by_code)
+            removed = [code for code in self._by_code if code not in seen] if complete else []
+            products = {o.product for o in changed} | {self._by_code[code].product for code in removed}
+            products |= {self._by_code[o.code].product for o in changed if o.code in self._by_code}
+
+            now = time.time()
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO ordens "
+                    "(code, product, deliver_date, description, quantity, synced_at, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            o.code, o.product, o.deliver_date.strftime(_DATE_FORMAT), o.description,
+                            o.quantity, now, o.status,
+                        )
+                        for o in changed
+                    ],
+                )
+                conn.executemany("DELETE FROM ordens WHERE code = ?", [(code,) for code in removed])
+
+            for order in changed:
+                self._put(order)
+            for code in removed:
+                self._drop(code)
+
+            self.last_sync = {
+                "at": datetime.now().strftime(_DATE_FORMAT),
+                "seen": len(seen),
+                "added": added,
+                "updated": len(changed) - added,
+                "removed": len(removed),
+                "complete": complete,
+                "apply_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+            result = dict(self.last_sync)
+
+        if products:
+            for listener in self.listeners:
+                try:
+                    listener(products)
+                except Exception as e:
+                    logger.error(f"Order index listener failed: {e}")
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "orders": len(self._by_code),
+            "products": len(self._by_product),
+            "last_sync": self.last_sync,
+        }
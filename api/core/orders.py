@@ -4,6 +4,11 @@ from datetime import datetime
 from typing import List, Dict
 
 
+# ERP status filter ids (OrdemProducao[status_op_id]) of orders still to be produced:
+# "1" Aberta, "2" Em produção ("3" is Finalizada)
+OPEN_STATUSES = ("1", "2")
+
+
 @dataclass
 class Order:
     deliver_date: datetime
@@ -11,6 +16,8 @@ class Order:
     product: str
     description: str
     quantity: int
+    # ERP status id, known when the order came from a status-filtered listing
+    status: str | None = None
 
     def to_dict(self):
         return {
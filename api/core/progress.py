@@ -0,0 +1,252 @@
+"""
+progress.py — Progresso das OPs a partir dos ciclos das estações
+
+Junta os ciclos (produto = `codigo` enviado pelo ESP32) com as OPs do
+índice local (core/order_index.py):
+
+ - peças produzidas por produto na janela [hoje - desde_dias, agora],
+   guardadas por dia para a janela poder andar sem reler o histórico
+ - média móvel do tempo por peça (últimos `janela_media` ciclos)
+ - ordens abertas por produto, ordenadas pela entrega, atualizadas a cada
+   sincronização do índice; OPs com outro status (ex.: finalizadas, ou sem
+   status conhecido) ficam fora da alocação
+
+As peças produzidas são alocadas às OPs do produto em ordem de entrega
+(FIFO). Quando uma OP sai das abertas (finalizada no ERP), as peças que ela
+tinha recebido ficam com ela: o crédito é guardado e descontado da produção
+da janela, para não passar para a próxima OP do produto. O crédito vale até
+o dia da saída deixar a janela (as peças dela são todas de antes) e, como a
+produção, fica só em memória. O ETA de cada OP é o tempo restante das OPs anteriores mais o dela,
+com produção contínua na média atual; o risco compara o ETA com a entrega.
+Tudo é mantido de forma incremental: uma consulta por produto não varre
+logs nem o banco.
+"""
+
+import datetime
+import threading
+from collections import deque
+from collections.abc import Collection, Iterable
+from typing import Any
+
+from core.log_parser import CycleRecord
+from core.order_index import OrderIndex
+from core.orders import OPEN_STATUSES, Order
+
+_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+class ProgressTracker:
+    def __init__(
+        self,
+        index: OrderIndex,
+        desde_dias: int = 30,
+        janela_media: int = 50,
+        margem: float = 0.1,
+        status_abertos: Collection[str] = OPEN_STATUSES,
+    ):
+        self.index = index
+        # só OPs com esses status recebem peças
+        self.status_abertos = frozenset(status_abertos)
+        self.desde_dias = desde_dias
+        self.janela_media = janela_media
+        # folga mínima (fração do tempo restante) abaixo da qual a OP fica "em_risco"
+        self.margem = margem
+        self._lock = threading.Lock()
+
+        self._inicio = self._inicio_janela()
+        # produto -> {dia: peças}, e o total corrente da janela
+        self._por_dia: dict[str, dict[datetime.date, int]] = {}
+        self._produzido: dict[str, int] = {}
+        # produto -> últimos (tempo_total, peças) e somas correntes [tempo, peças]
+        self._recentes: dict[str, deque[tuple[int, int]]] = {}
+        self._somas: dict[str, list[int]] = {}
+        # produto -> OPs ordenadas por entrega
+        self._ordens: dict[str, list[Order]] = {}
+        # produto -> {OP que saiu das abertas: (peças creditadas, dia da saída)}
+        self._consumido: dict[str, dict[int, tuple[int, datetime.date]]] = {}
+
+        self.update_orders()
+        index.listeners.append(self.update_orders)
+
+    def _inicio_janela(self) -> datetime.date:
+        return datetime.date.today() - datetime.timedelta(days=self.desde_dias)
+
+    # -------------------------------------------------------
+    # atualização
+    # -------------------------------------------------------
+
+    def add_records(self, registros: Iterable[CycleRecord]) -> None:
+        """Listener do escritor (e carga inicial): soma os ciclos ao produto."""
+        with self._lock:
+            for r in registros:
+                dia = r.datetime.date()
+                pecas = r.quantidade
+                if dia >= self._inicio:
+                    dias = self._por_dia.setdefault(r.produto, {})
+                    dias[dia] = dias.get(dia, 0) + pecas
+                    self._produzido[r.produto] = self._produzido.get(r.produto, 0) + pecas
+
+                recentes = self._recentes.get(r.produto)
+                if recentes is None:
+                    recentes = self._recentes[r.produto] = deque()
+                    self._somas[r.produto] = [0, 0]
+                somas = self._somas[r.produto]
+                recentes.append((r.tempo_total, pecas))
+                somas[0] += r.tempo_total
+                somas[1] += pecas
+                if len(recentes) > self.janela_media:
+                    total, p = recentes.popleft()
+                    somas[0] -= total
+                    somas[1] -= p
+
+    def update_orders(self, produtos: Iterable[str] | None = None) -> None:
+        """Listener do índice de OPs: recarrega as OPs dos produtos alterados (todos se None)."""
+        if produtos is None:
+            produtos = set(self.index.products())
+            with self._lock:
+                produtos |= self._ordens.keys()
+        for produto in produtos:
+            ordens = [o for o in self.index.by_product(produto) if o.status in self.status_abertos]
+            with self._lock:
+                self._creditar_saidas(produto, ordens)
+                if ordens:
+                    self._ordens[produto] = ordens
+                else:
+                    self._ordens.pop(produto, None)
+
+    def _creditar_saidas(self, produto: str, abertas: list[Order]) -> None:
+        """Guarda o que as OPs que deixaram as abertas já tinham recebido (chamado com o lock)."""
+        self._rolar_janela()
+        codigos = {o.code for o in abertas}
+        consumido = self._consumido.setdefault(produto, {})
+        for code in codigos & consumido.keys():
+            # reaberta: volta para a fila e recebe peças pela alocação normal
+            del consumido[code]
+
+        antigas = self._ordens.get(produto, [])
+        if any(o.code not in codigos for o in antigas):
+            hoje = datetime.date.today()
+            for o, feito in zip(antigas, self._alocar(produto, antigas)):
+                if o.code not in codigos and feito:
+                    consumido[o.code] = (feito, hoje)
+        if not consumido:
+            del self._consumido[produto]
+
+    def _disponivel(self, produto: str) -> int:
+        """Peças da janela ainda não creditadas a OPs que saíram (chamado com o lock)."""
+        consumido = sum(pecas for pecas, _ in self._consumido.get(produto, {}).values())
+        return max(self._produzido.get(produto, 0) - consumido, 0)
+
+    def _alocar(self, produto: str, ordens: list[Order]) -> list[int]:
+        """Peças de cada OP, em ordem de entrega (chamado com o lock)."""
+        disponivel = self._disponivel(produto)
+        feitos = []
+        for o in ordens:
+            feito = min(disponivel, o.quantity)
+            disponivel -= feito
+            feitos.append(feito)
+        return feitos
+
+    def _rolar_janela(self) -> None:
+        """Descarta os dias que saíram da janela (chamado com o lock)."""
+        inicio = self._inicio_janela()
+        if inicio == self._inicio:
+            return
+        self._inicio = inicio
+        for produto, dias in self._por_dia.items():
+            for dia in [d for d in dias if d < inicio]:
+                self._produzido[produto] -= dias.pop(dia)
+        for produto, consumido in list(self._consumido.items()):
+            for code in [c for c, (_, dia) in consumido.items() if dia < inicio]:
+                del consumido[code]
+            if not consumido:
+                del self._consumido[produto]
+
+    # -------------------------------------------------------
+    # consulta
+    # -------------------------------------------------------
+
+    def _tempo_por_peca(self, produto: str) -> float | None:
+        somas = self._somas.get(produto)
+        if not somas or somas[1] <= 0:
+            return None
+        return somas[0] / somas[1]
+
+    def _risco(self, restante: int, eta: datetime.datetime | None, entrega: datetime.datetime, agora) -> str:
+        if restante <= 0:
+            return "concluida"
+        if eta is None:
+            return "sem_dados"
+        if eta > entrega:
+            return "atrasada"
+        if (entrega - eta).total_seconds() < self.margem * (eta - agora).total_seconds():
+            return "em_risco"
+        return "ok"
+
+    def product_progress(self, produto: str) -> dict[str, Any] | None:
+        """Progresso das OPs de um produto (None se o produto não tem OPs)."""
+        with self._lock:
+            self._rolar_janela()
+            ordens = self._ordens.get(produto)
+            if not ordens:
+                return None
+            produzido = self._produzido.get(produto, 0)
+            disponivel = self._disponivel(produto)
+            feitos = self._alocar(produto, ordens)
+            por_peca = self._tempo_por_peca(produto)
+
+        agora = datetime.datetime.now()
+        disponivel -= sum(feitos)
+        acumulado = 0.0
+        itens = []
+        for o, feito in zip(ordens, feitos):
+            restante = o.quantity - feito
+
+            eta = None
+            if por_peca is not None and restante:
+                acumulado += restante * por_peca
+                eta = agora + datetime.timedelta(seconds=acumulado)
+            itens.append(
+                {
+                    "op": o.code,
+                    "entrega": o.deliver_date.strftime(_FMT),
+                    "quantidade": o.quantity,
+                    "produzido": feito,
+                    "restante": restante,
+                    "percentual": round(100 * feito / o.quantity, 1) if o.quantity else 100.0,
+                    "eta": eta.strftime(_FMT) if eta is not None else None,
+                    "folga_horas": round((o.deliver_date - eta).total_seconds() / 3600, 2) if eta else None,
+                    "risco": self._risco(restante, eta, o.deliver_date, agora),
+                }
+            )
+
+        return {
+            "produzido": produzido,
+            # produção além do total das OPs abertas (e do já creditado às que saíram)
+            "excedente": disponivel,
+            "tempo_por_peca": por_peca,
+            "ordens": itens,
+        }
+
+    def order_progress(self, code: int) -> dict[str, Any] | None:
+        order = self.index.get(code)
+        if order is None:
+            return None
+        produto = self.product_progress(order.product)
+        if produto is None:
+            return None
+        item = next((i for i in produto["ordens"] if i["op"] == code), None)
+        return dict(item, produto=order.product, tempo_por_peca=produto["tempo_por_peca"]) if item else None
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            produtos = list(self._ordens)
+        resultado = {}
+        for produto in produtos:
+            p = self.product_progress(produto)
+            if p is not None:
+                resultado[produto] = p
+        return {
+            "desde": self._inicio.isoformat(),
+            "produtos": resultado,
+        }
@@ -0,0 +1,210 @@
+"""
+protocol.py — Quadro binário das estações (versão 1)
+
+Substitui a linha "codigo;tp;pausa;total;qtd\\n" por um quadro com
+tamanho prefixado, que leva vários ciclos de uma vez:
+
+    cabeçalho  (6 bytes)  magic b"\\xc5\\x7e" | versão u8 | nº de registros u8 | tamanho do corpo u16
+    corpo                 tamanho do device u8 | device (ascii)
+                          registros: seq u32 | epoch u32 | tp_ms u32 | pausa_ms u32 | total_ms u32
+                                     | qtd u16 | loop_us u32 | tamanho do código u8 | código (utf-8)
+    crc32      (4 bytes)  zlib.crc32 do cabeçalho + corpo
+
+Tudo little-endian (ordem nativa do ESP32). Uma mensagem só é tratada como
+quadro se começa pelos dois bytes do magic e pela versão (C5 7E não é UTF-8
+válido) e se o crc confere; senão os bytes são lidos como uma linha de
+texto do formato antigo (que pode começar com C5, ex.: um código "Š...").
+
+O parse usa struct.unpack_from direto sobre um memoryview do quadro, sem
+fatiar cópias do buffer; só o código do produto vira str.
+
+Device e código vão para o logs.txt como campos separados por ';' (depois
+do "TIMESTAMP | "), e dali para o banco, /stats, /export e as métricas: um
+device com caractere de controle (ex.: '\n'), ';' ou '|', ou com bytes que
+não decodificam, faz o quadro ser recusado inteiro com FrameError. Um código
+assim recusa só o registro: o parse vai até o fim e levanta
+FrameContentError com todos os registros e os índices dos recusados, para
+quem recebe confirmar (ACK) os recusados sem gravá-los e o outbox da estação
+não ficar preso reenviando o mesmo quadro.
+"""
+
+import re
+import struct
+import zlib
+from collections.abc import Iterable
+from typing import NamedTuple
+
+MAGIC = b"\xc5\x7e"
+VERSAO = 1
+# bytes que abrem um quadro v1
+INICIO_QUADRO = MAGIC + bytes([VERSAO])
+
+CABECALHO = struct.Struct("<2sBBH")
+REGISTRO = struct.Struct("<IIIIIHIB")
+CRC = struct.Struct("<I")
+
+# corpo máximo (u16) e registros por quadro (u8)
+MAX_CORPO = 0xFFFF
+MAX_REGISTROS = 0xFF
+
+# caracteres por campo (o firmware manda device até 19 e código até 23)
+MAX_DEVICE = 32
+MAX_CODIGO = 64
+
+# controle (C0, DEL, C1: quebram a linha do logs.txt) e os separadores do formato texto
+_CONTROLE = re.compile(r"[\x00-\x1f\x7f-\x9f]")
+_PROIBIDOS = re.compile(r"[\x00-\x1f\x7f-\x9f;|]")
+# device: ascii visível, sem espaço
+_DEVICE = re.compile(r"[!-~]+")
+
+
+class FrameError(ValueError):
+    pass
+
+
+class FrameChecksumError(FrameError):
+    """Quadro com tamanho válido mas crc errado (corrompido no caminho)."""
+
+
+class FrameContentError(FrameError):
+    """
+    Quadro íntegro (crc e estrutura ok) com registros de código inválido.
+    `registros` tem todos os registros na ordem do quadro (o código dos
+    recusados decodificado com substituição, só para log) e `recusados` os
+    índices dos inválidos.
+    """
+
+    def __init__(self, mensagem: str, device: str, registros: list["FrameRecord"], recusados: set[int]):
+        super().__init__(mensagem)
+        self.device = device
+        self.registros = registros
+        self.recusados = recusados
+
+
+class FrameRecord(NamedTuple):
+    seq: int
+    epoch: int
+    tempo_producao_ms: int
+    tempo_pausa_ms: int
+    tempo_total_ms: int
+    quantidade: int
+    loop_us: int
+    produto: str
+
+
+def _campo(dados: memoryview, nome: str, maximo: int) -> str:
+    """Campo de texto do corpo: utf-8 estrito, não vazio, até `maximo` caracteres, sem _PROIBIDOS."""
+    try:
+        texto = str(dados, "utf-8")
+    except UnicodeDecodeError:
+        raise FrameError(f"{nome} com bytes inválidos") from None
+    if not texto.strip() or len(texto) > maximo or _PROIBIDOS.search(texto):
+        raise FrameError(f"{nome} inválido: {texto!r}")
+    return texto
+
+
+def has_control_chars(texto: str) -> bool:
+    """True se o texto tem caractere de controle (o mesmo critério vale para as linhas de texto)."""
+    return _CONTROLE.search(texto) is not None
+
+
+def is_frame_start(inicio: bytes) -> bool:
+    """True se os primeiros bytes da mensagem são o magic + versão de um quadro v1."""
+    return inicio[: len(INICIO_QUADRO)] == INICIO_QUADRO
+
+
+def parse_header(cabecalho: bytes) -> tuple[int, int]:
+    """(nº de registros, tamanho do corpo) do cabeçalho; FrameError se não for um quadro v1."""
+    magic, versao, n, tamanho = CABECALHO.unpack(cabecalho)
+    if magic != MAGIC:
+        raise FrameError("magic inválido")
+    if versao != VERSAO:
+        raise FrameError(f"versão {versao} não suportada")
+    return n, tamanho
+
+
+def parse_frame(quadro: bytes | bytearray | memoryview) -> tuple[str, list[FrameRecord]]:
+    """
+    (device, registros) de um quadro completo (cabeçalho + corpo + crc).
+    FrameError se o quadro não se sustenta; FrameContentError se só algum
+    código é inválido.
+    """
+    mv = memoryview(quadro)
+    if len(mv) < CABECALHO.size + 1 + CRC.size:
+        raise FrameError("quadro curto")
+    n, tamanho = parse_header(mv[: CABECALHO.size])
+    fim = CABECALHO.size + tamanho
+    if len(mv) != fim + CRC.size:
+        raise FrameError("tamanho não confere com o cabeçalho")
+    (crc,) = CRC.unpack_from(mv, fim)
+    if zlib.crc32(mv[:fim]) != crc:
+        raise FrameChecksumError("crc inválido")
+
+    pos = CABECALHO.size
+    tam_device = mv[pos]
+    pos += 1
+    device = _campo(mv[pos : pos + tam_device], "device", MAX_DEVICE)
+    if not _DEVICE.fullmatch(device):
+        raise FrameError(f"device inválido: {device!r}")
+    pos += tam_device
+
+    registros = []
+    recusados = set()
+    erro = None
+    unpack = REGISTRO.unpack_from
+    for _ in range(n):
+        if pos + REGISTRO.size > fim:
+            raise FrameError("registro truncado")
+        seq, epoch, tp, pausa, total, qtd, loop_us, tam_codigo = unpack(mv, pos)
+        pos += REGISTRO.size
+        if pos + tam_codigo > fim:
+            raise FrameError("código truncado")
+        try:
+            produto = _campo(mv[pos : pos + tam_codigo], "código", MAX_CODIGO)
+        except FrameError as e:
+            recusados.add(len(registros))
+            erro = erro or e
+            produto = str(mv[pos : pos + tam_codigo], "utf-8", "replace")
+        pos += tam_codigo
+        registros.append(FrameRecord(seq, epoch, tp, pausa, total, qtd, loop_us, produto))
+
+    if pos != fim:
+        raise FrameError("sobra no corpo")
+    if recusados:
+        raise FrameContentError(f"{len(recusados)} de {n} registros recusados: {erro}", device, registros, recusados)
+    return device, registros
+
+
+def encode_frame(device: str, registros: Iterable[FrameRecord]) -> bytes:
+    """Monta um quadro v1 (mesmo layout do firmware)."""
+    dev = device.encode("ascii")
+    corpo = bytearray([len(dev)])
+    corpo += dev
+    n = 0
+    for r in registros:
+        codigo = r.produto.encode("utf-8")
+        corpo += REGISTRO.pack(
+            r.seq, r.epoch, r.tempo_producao_ms, r.tempo_pausa_ms, r.tempo_total_ms,
+            r.quantidade, r.loop_us, len(codigo),
+        )
+        corpo += codigo
+        n += 1
+    if n > MAX_REGISTROS or len(corpo) > MAX_CORPO:
+        raise FrameError("quadro grande demais")
+    quadro = CABECALHO.pack(MAGIC, VERSAO, n, len(corpo)) + corpo
+    return quadro + CRC.pack(zlib.crc32(quadro))
+
+
+def to_log_fields(device: str, r: FrameRecord) -> str:
+    """
+    Registro no formato de texto gravado no logs.txt
+    ("produto;tp;pausa;total;qtd;device;seq;epoch;loop_us;tp_ms;pausa_ms;total_ms"):
+    tp/pausa/total em segundos inteiros (truncados, como o firmware fazia),
+    que é o que os parsers antigos esperam, e as durações exatas em ms no
+    fim, que o banco guarda.
+    """
+    return (
+        f"{r.produto};{r.tempo_producao_ms // 1000};{r.tempo_pausa_ms // 1000};"
+        f"{r.tempo_total_ms // 1000};{r.quantidade};{device};{r.seq};{r.epoch};{r.loop_us};"
+        f"{r.tempo_producao_ms};{r.tempo_pausa_ms};{r.tempo_total_ms}"
+    )
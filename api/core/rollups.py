@@ -0,0 +1,184 @@
+"""
+rollups.py — Agregados por produto em baldes de minuto, hora e dia
+
+Mantidos de forma incremental a cada lote gravado pela thread escritora:
+para cada (granularidade, produto, início do balde) guarda contagem, somas
+de tempo_producao / tempo_pausa / tempo_total e min/max de tempo_total.
+
+A tabela fica em SQLite com chave primária (granularidade, produto, balde),
+então uma consulta por intervalo lê só os baldes pedidos; os ciclos brutos
+só são necessários para drill-down.
+
+Com o backend sqlite a tabela fica no mesmo arquivo dos ciclos e o store
+usa as conexões e transações do CycleStore: os baldes de um lote entram na
+mesma transação que os ciclos brutos.
+"""
+
+import contextlib
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any
+
+from core.log_parser import CycleRecord
+from core.utils.time_utils import epoch_seconds, from_epoch
+
+if TYPE_CHECKING:
+    from core.cycle_store import CycleStore
+
+GRANULARIDADES = {"minute": 60, "hour": 3600, "day": 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    granularidade TEXT NOT NULL,
+    produto TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    soma_producao INTEGER NOT NULL,
+    soma_pausa INTEGER NOT NULL,
+    soma_total INTEGER NOT NULL,
+    min_total INTEGER NOT NULL,
+    max_total INTEGER NOT NULL,
+    PRIMARY KEY (granularidade, produto, bucket)
+) WITHOUT ROWID;
+"""
+
+_UPSERT = """
+INSERT INTO rollups
+    (granularidade, produto, bucket, count, soma_producao, soma_pausa, soma_total, min_total, max_total)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularidade, produto, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    soma_producao = soma_producao + excluded.soma_producao,
+    soma_pausa = soma_pausa + excluded.soma_pausa,
+    soma_total = soma_total + excluded.soma_total,
+    min_total = MIN(min_total, excluded.min_total),
+    max_total = MAX(max_total, excluded.max_total)
+"""
+
+# registros por transação na reconstrução
+_REBUILD_CHUNK = 10_000
+
+
+class RollupStore:
+    def __init__(self, db_path: str | os.PathLike, store: "CycleStore | None" = None):
+        self.db_path = str(store.db_path if store is not None else db_path)
+        self.store = store
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self.store is not None:
+            return self.store.connection()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self) -> contextlib.AbstractContextManager[sqlite3.Connection]:
+        """Transação do CycleStore compartilhado (aninhável) ou da conexão própria."""
+        if self.store is not None:
+            return self.store.transaction()
+        return self._conn()
+
+    # -------------------------------------------------------
+    # escrita
+    # -------------------------------------------------------
+
+    def add_records(self, registros: Iterable[CycleRecord]) -> None:
+        """Soma o lote aos baldes (agrupado em memória, um upsert por balde)."""
+        acc: dict[tuple[str, str, int], list[int]] = {}
+        for r in registros:
+            epoch = epoch_seconds(r.datetime)
+            for gran, passo in GRANULARIDADES.items():
+                chave = (gran, r.produto, epoch - epoch % passo)
+                b = acc.get(chave)
+                if b is None:
+                    acc[chave] = [1, r.tempo_producao, r.tempo_pausa, r.tempo_total, r.tempo_total, r.tempo_total]
+                else:
+                    b[0] += 1
+                    b[1] += r.tempo_producao
+                    b[2] += r.tempo_pausa
+                    b[3] += r.tempo_total
+                    b[4] = min(b[4], r.tempo_total)
+                    b[5] = max(b[5], r.tempo_total)
+
+        if not acc:
+            return
+        with self.transaction() as conn:
+            conn.executemany(_UPSERT, [(*chave, *valores) for chave, valores in acc.items()])
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None
+
+    def rebuild(self, registros: Iterable[CycleRecord]) -> int:
+        """Recria todos os baldes a partir do histórico completo."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM rollups")
+        total = 0
+        bloco: list[CycleRecord] = []
+        for r in registros:
+            bloco.append(r)
+            if len(bloco) >= _REBUILD_CHUNK:
+                self.add_records(bloco)
+                total += len(bloco)
+                bloco = []
+        self.add_records(bloco)
+        total += len(bloco)
+        print(f"[ROLLUPS] {total} registros agregados")
+        return total
+
+    # -------------------------------------------------------
+    # consulta
+    # -------------------------------------------------------
+
+    def query(
+        self,
+        granularidade: str,
+        produto: str | None = None,
+        inicio: int | None = None,
+        fim: int | None = None,
+    ) -> dict[str, list[dict[str, Any]]]:
+        """Baldes [inicio, fim) (epoch) por produto, em ordem cronológica."""
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"granularidade inválida: {granularidade}")
+
+        sql = (
+            "SELECT produto, bucket, count, soma_producao, soma_pausa, soma_total, min_total, max_total "
+            "FROM rollups WHERE granularidade = ?"
+        )
+        params: list[Any] = [granularidade]
+        if produto:
+            sql += " AND produto = ?"
+            params.append(produto)
+        if inicio is not None:
+            sql += " AND bucket >= ?"
+            params.append(inicio - inicio % GRANULARIDADES[granularidade])
+        if fim is not None:
+            sql += " AND bucket < ?"
+            params.append(fim)
+        sql += " ORDER BY produto, bucket"
+
+        produtos: dict[str, list[dict[str, Any]]] = {}
+        for prod, bucket, count, tp, pausa, total, mn, mx in self._conn().execute(sql, params):
+            produtos.setdefault(prod, []).append(
+                {
+                    "inicio": from_epoch(bucket),
+                    "ciclos": count,
+                    "tempo_producao": tp,
+                    "tempo_pausa": pausa,
+                    "tempo_total": total,
+                    "media": total / count,
+                    "min_total": mn,
+                    "max_total": mx,
+                }
+            )
+        return produtos
@@ -0,0 +1,257 @@
+"""
+segments.py — Segmentos diários do log de ciclos, comprimidos e indexados
+
+O logs.txt passa a ser só o segmento ativo (dia corrente). Na virada do dia
+a thread escritora chama rotate(): o arquivo é movido para
+tmp/segments/logs-YYYY-MM-DD.txt e, em segundo plano, compactado em:
+
+ - logs-YYYY-MM-DD.txt.gz  : um membro gzip por produto (registros em ordem
+                             cronológica); membros concatenados continuam
+                             sendo um .gz válido para `gzip -d`
+ - logs-YYYY-MM-DD.idx.json: índice lateral com, por produto, offset/tamanho
+                             do membro, contagem, soma de tempo_total e
+                             min/max de timestamp; mais o min/max do segmento
+
+A leitura usa o índice para pular segmentos fora da janela pedida e, dentro
+de um segmento, descomprime só os membros dos produtos pedidos. Segmentos
+ainda não compactados (.txt) são lidos diretamente.
+"""
+
+import datetime
+import gzip
+import heapq
+import json
+import os
+import threading
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from core.log_parser import CycleRecord, parse_log_line
+
+_PREFIXO = "logs-"
+
+
+class SegmentArchive:
+    def __init__(self, directory: str | os.PathLike, parse_line: Callable[[str], CycleRecord | None] = parse_log_line):
+        self.directory = str(directory)
+        self.parse_line = parse_line
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    # -------------------------------------------------------
+    # rotação e compactação
+    # -------------------------------------------------------
+
+    def rotate(self, active_path: str, dia: datetime.date) -> str | None:
+        """
+        Move o segmento ativo para o arquivo e agenda a compactação.
+        Chamado pela thread escritora com o arquivo já fechado.
+        """
+        if not os.path.exists(active_path) or os.path.getsize(active_path) == 0:
+            return None
+
+        base = os.path.join(self.directory, f"{_PREFIXO}{dia.isoformat()}")
+        destino, n = base, 1
+        while any(os.path.exists(destino + ext) for ext in (".txt", ".idx.json")):
+            destino = f"{base}-{n}"
+            n += 1
+
+        os.replace(active_path, destino + ".txt")
+        print(f"[SEGMENTS] Segmento fechado: {destino}.txt")
+        threading.Thread(target=self._compactar_seguro, args=(destino,), daemon=True).start()
+        return destino + ".txt"
+
+    def compact_pending(self) -> None:
+        """Compacta segmentos .txt que ficaram pendentes (ex.: app encerrado no meio)."""
+        for base in self._bases():
+            if not os.path.exists(base + ".txt"):
+                continue
+            if not os.path.exists(base + ".idx.json"):
+                self._compactar_seguro(base)
+            else:
+                # compactado, mas o .txt não pôde ser removido (arquivo aberto no Windows)
+                try:
+                    os.remove(base + ".txt")
+                except OSError:
+                    pass
+
+    def _compactar_seguro(self, base: str) -> None:
+        try:
+            with self._lock:
+                self._compactar(base)
+        except Exception as e:
+            print(f"[SEGMENTS] Falha ao compactar {base}: {e}")
+
+    def _compactar(self, base: str) -> None:
+        por_produto: dict[str, list[tuple[str, str]]] = {}
+        stats: dict[str, dict[str, Any]] = {}
+        invalidas: list[str] = []
+
+        with open(base + ".txt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                r = self.parse_line(line)
+                if r is None:
+                    invalidas.append(line)
+                    continue
+                por_produto.setdefault(r.produto, []).append((r.data, line))
+                s = stats.setdefault(r.produto, {"ciclos": 0, "soma_total": 0, "inicio": r.data, "fim": r.data})
+                s["ciclos"] += 1
+                s["soma_total"] += r.tempo_total
+                s["inicio"] = min(s["inicio"], r.data)
+                s["fim"] = max(s["fim"], r.data)
+
+        indice: dict[str, Any] = {"produtos": {}}
+        offset = 0
+        with open(base + ".txt.gz.tmp", "wb") as out:
+            for prod, linhas in por_produto.items():
+                linhas.sort(key=lambda x: x[0])
+                membro = gzip.compress("".join(line + "\n" for _, line in linhas).encode("utf-8"), mtime=0)
+                out.write(membro)
+                indice["produtos"][prod] = dict(stats[prod], offset=offset, tamanho=len(membro))
+                offset += len(membro)
+            if invalidas:
+                membro = gzip.compress("".join(line + "\n" for line in invalidas).encode("utf-8"), mtime=0)
+                out.write(membro)
+                indice["invalidas"] = {"linhas": len(invalidas), "offset": offset, "tamanho": len(membro)}
+            out.flush()
+            os.fsync(out.fileno())
+
+        produtos = indice["produtos"].values()
+        indice["ciclos"] = sum(p["ciclos"] for p in produtos)
+        indice["inicio"] = min((p["inicio"] for p in produtos), default=None)
+        indice["fim"] = max((p["fim"] for p in produtos), default=None)
+
+        with open(base + ".idx.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(indice, f, ensure_ascii=False)
+
+        # .gz antes do índice: um índice presente sempre aponta para um .gz completo
+        os.replace(base + ".txt.gz.tmp", base + ".txt.gz")
+        os.replace(base + ".idx.json.tmp", base + ".idx.json")
+        os.remove(base + ".txt")
+        print(f"[SEGMENTS] Segmento compactado: {base}.txt.gz ({indice['ciclos']} ciclos)")
+
+    # -------------------------------------------------------
+    # leitura
+    # -------------------------------------------------------
+
+    def _bases(self) -> list[str]:
+        bases = set()
+        for nome in os.listdir(self.directory):
+            if not nome.startswith(_PREFIXO) or nome.endswith(".tmp"):
+                continue
+            for ext in (".txt.gz", ".idx.json", ".txt"):
+                if nome.endswith(ext):
+                    bases.add(os.path.join(self.directory, nome[: -len(ext)]))
+                    break
+        return sorted(bases)
+
+    def segments(self) -> list[tuple[str, dict | None]]:
+        """(base, índice) de cada segmento; índice None se ainda não compactado."""
+        resultado = []
+        for base in self._bases():
+            if os.path.exists(base + ".idx.json"):
+                try:
+                    with open(base + ".idx.json", encoding="utf-8") as f:
+                        resultado.append((base, json.load(f)))
+                    continue
+                except (OSError, ValueError):
+                    pass
+            if os.path.exists(base + ".txt"):
+                resultado.append((base, None))
+        # ordem cronológica pelo início do segmento (pendentes pelo nome)
+        resultado.sort(key=lambda x: (x[1] or {}).get("inicio") or os.path.basename(x[0])[len(_PREFIXO) :])
+        return resultado
+
+    def _ler_membro(self, base: str, info: dict) -> Iterator[CycleRecord]:
+        with open(base + ".txt.gz", "rb") as f:
+            f.seek(info["offset"])
+            raw = f.read(info["tamanho"])
+        for line in gzip.decompress(raw).decode("utf-8", errors="replace").splitlines():
+            r = self.parse_line(line)
+            if r is not None:
+                yield r
+
+    def _ler_pendente(self, base: str) -> Iterator[CycleRecord]:
+        try:
+            with open(base + ".txt", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    r = self.parse_line(line.strip())
+                    if r is not None:
+                        yield r
+        except FileNotFoundError:
+            # compactado entre a listagem e a leitura: lê a versão compactada
+            with open(base + ".idx.json", encoding="utf-8") as f:
+                indice = json.load(f)
+            yield from heapq.merge(
+                *(self._ler_membro(base, info) for info in indice["produtos"].values()),
+                key=lambda r: r.data,
+            )
+
+    def iter_records(
+        self,
+        produto: str | None = None,
+        inicio: str | None = None,
+        fim: str | None = None,
+    ) -> Iterator[CycleRecord]:
+        """
+        Registros arquivados filtrados por produto e intervalo ['inicio', 'fim')
+        (strings 'YYYY-MM-DD HH:MM:SS'), segmento a segmento em ordem cronológica.
+        """
+        for base, indice in self.segments():
+            if indice is None:
+                fonte: Iterator[CycleRecord] = self._ler_pendente(base)
+            else:
+                if indice["ciclos"] == 0:
+                    continue
+                if (inicio and indice["fim"] < inicio) or (fim and indice["inicio"] >= fim):
+                    continue  # segmento inteiro fora da janela
+                membros = []
+                for prod, info in indice["produtos"].items():
+                    if produto and prod != produto:
+                        continue
+                    if (inicio and info["fim"] < inicio) or (fim and info["inicio"] >= fim):
+                        continue
+                    membros.append(self._ler_membro(base, info))
+                fonte = heapq.merge(*membros, key=lambda r: r.data)
+
+            for r in fonte:
+                if produto and r.produto != produto:
+                    continue
+                if (inicio and r.data < inicio) or (fim and r.data >= fim):
+                    continue
+                yield r
+
+    def product_totals(self) -> dict[str, list[int]]:
+        """{produto: [soma_total, ciclos]} de todo o arquivo (índices + pendentes)."""
+        totais: dict[str, list[int]] = {}
+        for base, indice in self.segments():
+            if indice is not None:
+                for prod, info in indice["produtos"].items():
+                    acc = totais.setdefault(prod, [0, 0])
+                    acc[0] += info["soma_total"]
+                    acc[1] += info["ciclos"]
+            else:
+                for r in self._ler_pendente(base):
+                    acc = totais.setdefault(r.produto, [0, 0])
+                    acc[0] += r.tempo_total
+                    acc[1] += 1
+        return totais
+
+    def recent_records(self, produto: str, limite: int) -> list[CycleRecord]:
+        """Os `limite` registros mais novos do produto, lendo do segmento mais novo para trás."""
+        coletados: list[CycleRecord] = []
+        for base, indice in reversed(self.segments()):
+            if indice is not None:
+                info = indice["produtos"].get(produto)
+                if info is None:
+                    continue
+                registros = list(self._ler_membro(base, info))
+            else:
+                registros = [r for r in self._ler_pendente(base) if r.produto == produto]
+            coletados = registros[-limite:] + coletados
+            if len(coletados) >= limite:
+                break
+        return coletados[-limite:]
@@ -1,22 +1,70 @@
 import os
 import ssl
+import time
 import asyncio
 import aiohttp
 import certifi
-from datetime import datetime as dt
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from datetime import datetime as dt, timedelta
+from typing import Any
+from urllib.parse import urlsplit
 from bs4 import BeautifulSoup
 from core.utils.path_utils import resource_path
 from core.logger import logger
 from core.configs import Configs
-from core.orders import OrderList
+from core.orders import Order, OrderList
+from core.html_table import extract_first_table, is_empty_result
 
 ORDER_PATH = "tmp/reports/"
 
+# markers of a page served because the ERP session is gone
+LOGIN_PAGE_MARKERS = ("LoginForm[username]", "YII_CSRF_TOKEN")
+
+
+class SessionExpired(Exception):
+    pass
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1 / `rate` seconds apart (rate <= 0: no limit)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
 
 class AuthOnCM:
-    def __init__(self, base_tmp):
+    def __init__(
+        self,
+        base_tmp,
+        rate_per_host: float = 5.0,
+        window_past_days: int = 30,
+        window_future_days: int = 90,
+    ):
         self.session: aiohttp.ClientSession | None = None
+        # rolling delivery-date window used for order queries
+        self.window_past_days = window_past_days
+        self.window_future_days = window_future_days
+        self.rate_limiter = HostRateLimiter(rate_per_host)
+        # concurrent callers (batch scraping) share a single re-login
+        self._login_lock = asyncio.Lock()
         self.csrf_token: str | None = None
+        self.authenticated = False
+        # timestamps of successful logins, to report logins per hour
+        self.login_times: deque[float] = deque()
+        self.logins_total = 0
+        # called after each ERP request with (path, seconds, ok)
+        self.request_listeners: list[Callable[[str, float, bool], object]] = []
         self.configs = Configs()
         self.base_url = ""
         self.login_code_url = ""
@@ -26,16 +74,32 @@ class AuthOnCM:
         self.reports_dir = os.path.join(base_tmp, "reports")
         os.makedirs(self.reports_dir, exist_ok=True)
 
-    async def login(self):
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """Long-lived pooled session; kept open across logins and queries."""
+        if self.session and not self.session.closed:
+            return self.session
+
         logger.info("Starting aiohttp session...")
         ssl_context = ssl.create_default_context(cafile=certifi.where())
         self.session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=ssl_context),
+            connector=aiohttp.TCPConnector(
+                ssl=ssl_context,
+                limit=20,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            ),
             cookie_jar=aiohttp.CookieJar(unsafe=True),
             headers={
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; aiohttp-client)"
             },
         )
+        return self.session
+
+    async def login(self):
+        self.authenticated = False
+        self._ensure_session()
+        # drop the expired session cookie, keep the pooled connections
+        self.session.cookie_jar.clear()
         try:
             logger.info(f"Getting CSRF from https://lanx.cargamaquina.com.br/ ...")
 
@@ -75,7 +139,10 @@ class AuthOnCM:
             ) as r:
                 r.raise_for_status()
 
-            logger.info("✅ Login successful!")
+            self.authenticated = True
+            self.logins_total += 1
+            self.login_times.append(time.monotonic())
+            logger.info(f"✅ Login successful! ({self.logins_last_hour()} in the last hour)")
             return True
 
         except Exception as e:
@@ -84,91 +151,230 @@ class AuthOnCM:
             return False
 
     async def get_client(self) -> aiohttp.ClientSession:
-        self.configs.load()
-        if self.session and not self.session.closed:
+        if self.configs.reload_if_changed():
+            logger.info("configs.json changed, reloading credentials.")
+            if (self.configs.username, self.configs.password) != (self.username, self.password):
+                self.username = self.configs.username
+                self.password = self.configs.password
+                self.authenticated = False
+
+        if self.authenticated and self.session and not self.session.closed:
             return self.session
-        logger.warning("Session invalid or closed — re-authenticating...")
-        ok = await self.login()
-        if not ok:
-            raise RuntimeError("Unable to create authenticated session.")
+        async with self._login_lock:
+            if self.authenticated and self.session and not self.session.closed:
+                return self.session
+            logger.warning("Session invalid or closed — re-authenticating...")
+            ok = await self.login()
+            if not ok:
+                raise RuntimeError("Unable to create authenticated session.")
 
         return self.session
 
     async def close(self):
+        self.authenticated = False
         if self.session and not self.session.closed:
             await self.session.close()
             logger.info("Session closed.")
 
-    async def get_orders_by_code(self, code: str):
-        now = dt.now().strftime("%d-%m-%Y")
-        order_list: OrderList = OrderList()
-        async with await self.get_client() as session:
-            params = {
-                "OrdemProducao[codigo]": f"{code}",
-                "OrdemProducao[_nomeCliente]": "",
-                "OrdemProducao[_nomeMaterial]": "",
-                "OrdemProducao[status_op_id]": "Todos",
-                "OrdemProducao[_etapasPlanejadas]": "",
-                "OrdemProducao[forecast]": "0",
-                "OrdemProducao[_inicioCriacao]": "",
-                "OrdemProducao[_fimCriacao]": "",
-                "OrdemProducao[_inicioEntrega]": "03/12/2025",
-                "OrdemProducao[_fimEntrega]": "25/01/2026",
-                "OrdemProducao[_limparFiltro]": "0",
-                "pageSize": "20",
-            }
-            async with session.get(
-                f"{self.base_url}/ordemProducao/exportarOrdens", params=params
-            ) as r:
-                r.raise_for_status()
-
-                soup = BeautifulSoup(await r.text(), "html.parser")
-                if "Nenhuma ordem de produção encontrada." in soup.text:
-                    logger.info("No orders found.")
-                    return
-
-                table = soup.find("table")
-                if not table:
-                    logger.warning("No table found.")
-                    return
-
-                trs = table.find_all("tr")[1:]
-                if not trs:
-                    logger.warning("No rows found.")
-                    return
-
-                for tr in trs:
-                    tds = tr.find_all("td")
-                    if not tds:
-                        continue
-
-                    deliver_date = dt.fromisoformat(tds[1].text.strip())
-                    code = int(tds[2].text.strip().split("-")[-1])
-                    product = str(tds[4].text.strip())
-                    description = str(tds[5].text.strip())
-                    quantity = int(tds[6].text.strip())
-
-                    order_list.create_order(
-                        deliver_date=deliver_date,
-                        code=code,
-                        product=product,
-                        description=description,
-                        quantity=quantity,
-                    )
-
-                logger.info("✅ Orders fetched successfully!")
-
-                file_path = os.path.join(self.reports_dir, f"{now}_orders.json")
+    def logins_last_hour(self) -> int:
+        limit = time.monotonic() - 3600
+        while self.login_times and self.login_times[0] < limit:
+            self.login_times.popleft()
+        return len(self.login_times)
+
+    def stats(self) -> dict:
+        return {
+            "authenticated": self.authenticated,
+            "session_open": bool(self.session and not self.session.closed),
+            "logins_total": self.logins_total,
+            "logins_last_hour": self.logins_last_hour(),
+        }
+
+    def _notify_request(self, path: str, seconds: float, ok: bool) -> None:
+        for listener in self.request_listeners:
+            try:
+                listener(path, seconds, ok)
+            except Exception as e:
+                logger.error(f"Request listener failed: {e}")
+
+    @staticmethod
+    def _is_login_page(response: aiohttp.ClientResponse, raw: bytes) -> bool:
+        if response.status in (401, 403) or "/site/login" in str(response.url):
+            return True
+        return all(marker.encode() in raw for marker in LOGIN_PAGE_MARKERS)
+
+    async def fetch_page(self, path: str, params: dict | None = None) -> tuple[bytes, str]:
+        """
+        GET on the authenticated session, returning (raw body, encoding). If the
+        ERP answers with its login page (session expired), log in again and
+        retry once.
+        """
+        for attempt in range(2):
+            session = await self.get_client()
+            url = f"{self.base_url}{path}"
+            await self.rate_limiter.wait(urlsplit(url).netloc)
+            start = time.perf_counter()
+            ok = False
+            try:
+                async with session.get(url, params=params) as r:
+                    raw = await r.read()
+                    if not self._is_login_page(r, raw):
+                        r.raise_for_status()
+                        ok = True
+                        return raw, r.charset or "utf-8"
+            finally:
+                self._notify_request(path, time.perf_counter() - start, ok)
+            logger.warning("ERP session expired — logging in again...")
+            self.authenticated = False
+        raise SessionExpired("ERP kept answering with the login page.")
+
+    def _parse_orders_page(self, raw: bytes, encoding: str) -> OrderList | None:
+        """CPU-bound part of get_orders_by_code; runs in a worker thread."""
+        if is_empty_result(raw, encoding):
+            logger.info("No orders found.")
+            return None
+
+        rows = extract_first_table(raw, encoding)
+        if rows is None:
+            logger.warning("No table found.")
+            return None
+
+        # first row is the header
+        rows = [tds for tds in rows[1:] if tds]
+        if not rows:
+            logger.warning("No rows found.")
+            return None
 
-                json_data = order_list.to_json()
+        order_list: OrderList = OrderList()
+        for tds in rows:
+            order_list.create_order(
+                deliver_date=dt.fromisoformat(tds[1]),
+                code=int(tds[2].split("-")[-1]),
+                product=tds[4],
+                description=tds[5],
+                quantity=int(tds[6]),
+            )
+        return order_list
 
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(json_data)
+    def _save_report(self, order_list: OrderList) -> str:
+        now = dt.now().strftime("%d-%m-%Y")
+        file_path = os.path.join(self.reports_dir, f"{now}_orders.json")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(order_list.to_json())
+        return file_path
+
+    def delivery_window(self) -> tuple[str, str]:
+        """(start, end) delivery dates around today, in the ERP's dd/mm/YYYY format."""
+        today = dt.now()
+        start = today - timedelta(days=self.window_past_days)
+        end = today + timedelta(days=self.window_future_days)
+        return start.strftime("%d/%m/%Y"), end.strftime("%d/%m/%Y")
+
+    def _order_params(self, code: str = "", status: str = "Todos", page_size: int = 20, page: int = 1) -> dict:
+        start, end = self.delivery_window()
+        return {
+            "OrdemProducao[codigo]": f"{code}",
+            "OrdemProducao[_nomeCliente]": "",
+            "OrdemProducao[_nomeMaterial]": "",
+            "OrdemProducao[status_op_id]": status,
+            "OrdemProducao[_etapasPlanejadas]": "",
+            "OrdemProducao[forecast]": "0",
+            "OrdemProducao[_inicioCriacao]": "",
+            "OrdemProducao[_fimCriacao]": "",
+            "OrdemProducao[_inicioEntrega]": start,
+            "OrdemProducao[_fimEntrega]": end,
+            "OrdemProducao[_limparFiltro]": "0",
+            "pageSize": str(page_size),
+            "OrdemProducao_page": str(page),
+        }
 
-                logger.info(f"💾 JSON file saved: {file_path}")
+    async def get_orders_by_code(self, code: str):
+        params = self._order_params(code=code)
+        raw, encoding = await self.fetch_page("/ordemProducao/exportarOrdens", params=params)
+
+        # parsing large exports would block every other coroutine on the loop
+        order_list = await asyncio.to_thread(self._parse_orders_page, raw, encoding)
+        if order_list is None:
+            return
+
+        logger.info("✅ Orders fetched successfully!")
+
+        file_path = await asyncio.to_thread(self._save_report, order_list)
+        logger.info(f"💾 JSON file saved: {file_path}")
+
+        logger.info("✅ Orders fetched!")
+        return order_list.to_dict()
+
+    async def iter_order_pages(
+        self, status: str = "Todos", page_size: int = 100, max_pages: int = 1000
+    ) -> AsyncIterator[list[Order]]:
+        """
+        Pages through every order in the delivery window, yielding one list
+        of orders per page (tagged with `status` unless it is "Todos"). Stops
+        at the first short page, or at a page that brings no new code (guards
+        against a server ignoring the page number). A page without orders that
+        is not the ERP's explicit "no orders found" page raises, so the caller
+        does not take an error page for an empty listing.
+        """
+        seen: set[int] = set()
+        for page in range(1, max_pages + 1):
+            params = self._order_params(status=status, page_size=page_size, page=page)
+            raw, encoding = await self.fetch_page("/ordemProducao/exportarOrdens", params=params)
+            order_list = await asyncio.to_thread(self._parse_orders_page, raw, encoding)
+            if order_list is None and not is_empty_result(raw, encoding):
+                raise RuntimeError(f"Order page {page} has no order table.")
+            orders = order_list.orders if order_list is not None else []
+            if status != "Todos":
+                for order in orders:
+                    order.status = status
+
+            new = [o for o in orders if o.code not in seen]
+            if not new:
+                return
+            seen.update(o.code for o in new)
+            yield new
+            if len(orders) < page_size:
+                return
+        raise RuntimeError(f"Order sync stopped after {max_pages} pages.")
+
+    async def get_orders_batch(
+        self,
+        codes: Iterable[str],
+        concurrency: int = 4,
+        fetch: Callable[[str], Awaitable[Any]] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Looks up several OPs over the shared session, at most `concurrency` at a
+        time, yielding {"op", "ok", "data" | "error"} in completion order.
+        `fetch` defaults to get_orders_by_code (e.g. pass a cache's get).
+        """
+        fetch = fetch or self.get_orders_by_code
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(code: str) -> dict[str, Any]:
+            async with semaphore:
+                try:
+                    return {"op": code, "ok": True, "data": await fetch(code)}
+                except Exception as e:
+                    logger.warning(f"Batch lookup of OP {code} failed: {e}")
+                    return {"op": code, "ok": False, "error": str(e)}
+
+        codes = list(dict.fromkeys(codes))
+        # log in once up front instead of letting every task race for it
+        try:
+            await self.get_client()
+        except Exception as e:
+            for code in codes:
+                yield {"op": code, "ok": False, "error": f"login failed: {e}"}
+            return
 
-                logger.info("✅ Orders fetched!")
-                return order_list.to_dict()
+        tasks = [asyncio.create_task(one(code)) for code in codes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
 
 
 async def main():
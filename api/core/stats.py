@@ -0,0 +1,244 @@
+"""
+stats.py — Estatísticas vetorizadas (NumPy) sobre o histórico de ciclos
+
+O histórico de uma janela é carregado em colunas NumPy (epoch, código do
+produto, tempos) e as métricas são calculadas por produto sem loops por
+registro:
+ - p50/p90/p99 e média de tempo_total
+ - razão produção/pausa e disponibilidade (produção / total, estilo OEE)
+ - throughput por hora e série opcional por hora/dia
+ - outliers de tempo_total pelo critério IQR (1.5 x IQR)
+
+Os resultados ficam em cache por janela + versão dos dados.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+
+from core.utils.time_utils import from_epoch
+
+# tamanho dos blocos usados para montar as colunas
+_CHUNK = 100_000
+
+BUCKETS = {"hour": 3600, "day": 86400}
+
+
+class CycleColumns:
+    """Colunas de uma janela do histórico; produto é um código em `produtos`."""
+
+    __slots__ = ("epoch", "produto", "tempo_producao", "tempo_pausa", "tempo_total", "produtos")
+
+    def __init__(self, epoch, produto, tempo_producao, tempo_pausa, tempo_total, produtos):
+        self.epoch = epoch
+        self.produto = produto
+        self.tempo_producao = tempo_producao
+        self.tempo_pausa = tempo_pausa
+        self.tempo_total = tempo_total
+        self.produtos = produtos
+
+    def __len__(self) -> int:
+        return len(self.epoch)
+
+
+def columns_from_rows(rows: Iterable[tuple]) -> CycleColumns:
+    """
+    Monta as colunas a partir de tuplas (epoch, produto, tp, pausa, total, ...)
+    lidas em blocos, sem guardar a lista inteira de tuplas em memória.
+    """
+    codigos: dict[str, int] = {}
+    partes: list[list[np.ndarray]] = [[], [], [], [], []]
+    bloco: list[tuple] = []
+
+    def descarregar():
+        if not bloco:
+            return
+        cols = list(zip(*bloco))
+        partes[0].append(np.fromiter(cols[0], dtype=np.int64, count=len(bloco)))
+        partes[1].append(
+            np.fromiter((codigos.setdefault(p, len(codigos)) for p in cols[1]), dtype=np.int32, count=len(bloco))
+        )
+        for i in (2, 3, 4):
+            partes[i].append(np.fromiter(cols[i], dtype=np.int64, count=len(bloco)))
+        bloco.clear()
+
+    for row in rows:
+        bloco.append(row)
+        if len(bloco) >= _CHUNK:
+            descarregar()
+    descarregar()
+
+    def juntar(i, dtype):
+        return np.concatenate(partes[i]) if partes[i] else np.empty(0, dtype=dtype)
+
+    return CycleColumns(
+        juntar(0, np.int64),
+        juntar(1, np.int32),
+        juntar(2, np.int64),
+        juntar(3, np.int64),
+        juntar(4, np.int64),
+        list(codigos),
+    )
+
+
+def columns_from_chunks(nomes: dict[int, str], blocos: Iterable[list[tuple]]) -> CycleColumns:
+    """
+    Colunas a partir de blocos de tuplas só de inteiros (epoch, id do produto,
+    tp, pausa, total), como os de CycleStore.iter_numeric_chunks: cada bloco
+    vira uma matriz com um único np.array e os ids são compactados com np.unique.
+    """
+    partes = [np.array(bloco, dtype=np.int64) for bloco in blocos]
+    if not partes:
+        vazio = np.empty(0, dtype=np.int64)
+        return CycleColumns(vazio, np.empty(0, dtype=np.int32), vazio, vazio, vazio, [])
+
+    m = np.concatenate(partes)
+    ids, codigos = np.unique(m[:, 1], return_inverse=True)
+    return CycleColumns(
+        m[:, 0],
+        codigos.astype(np.int32),
+        m[:, 2],
+        m[:, 3],
+        m[:, 4],
+        [nomes[int(i)] for i in ids],
+    )
+
+
+def columns_from_history(history, produto: str | None = None, inicio: int | None = None, fim: int | None = None) -> CycleColumns:
+    """
+    Colunas da janela a partir de um CycleHistory: np.frombuffer sobre as
+    views de cada produto (sem cópia) e uma única concatenação.
+    """
+    with history.window(produto, inicio, fim) as views:
+        produtos = [v.produto for v in views]
+        if not views:
+            vazio = np.empty(0, dtype=np.int64)
+            return CycleColumns(vazio, np.empty(0, dtype=np.int32), vazio, vazio, vazio, [])
+
+        def juntar(nome: str, dtype) -> np.ndarray:
+            return np.concatenate([np.frombuffer(getattr(v, nome), dtype=getattr(v, nome).format) for v in views]).astype(
+                dtype, copy=False
+            )
+
+        return CycleColumns(
+            juntar("epoch", np.int64),
+            np.repeat(np.arange(len(views), dtype=np.int32), [len(v) for v in views]),
+            juntar("tempo_producao", np.int64),
+            juntar("tempo_pausa", np.int64),
+            juntar("tempo_total", np.int64),
+            produtos,
+        )
+
+
+def _metricas(total: np.ndarray, tp: np.ndarray, pausa: np.ndarray, horas: float) -> dict[str, Any]:
+    n = int(total.size)
+    if n == 0:
+        return {"ciclos": 0}
+
+    p25, p50, p75, p90, p99 = np.percentile(total, [25, 50, 75, 90, 99])
+    iqr = p75 - p25
+    outliers = int(np.count_nonzero((total > p75 + 1.5 * iqr) | (total < p25 - 1.5 * iqr)))
+
+    soma_tp = int(tp.sum())
+    soma_pausa = int(pausa.sum())
+    soma_total = int(total.sum())
+    return {
+        "ciclos": n,
+        "media": soma_total / n,
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "tempo_producao": soma_tp,
+        "tempo_pausa": soma_pausa,
+        "razao_producao_pausa": soma_tp / soma_pausa if soma_pausa else None,
+        "disponibilidade": soma_tp / soma_total if soma_total else None,
+        "throughput_hora": n / horas,
+        "outliers": outliers,
+    }
+
+
+def compute_stats(
+    cols: CycleColumns,
+    inicio: int | None = None,
+    fim: int | None = None,
+    bucket: str | None = None,
+) -> dict[str, Any]:
+    """
+    Métricas gerais e por produto da janela [inicio, fim) (epoch, opcionais).
+    Com bucket ('hour'/'day') inclui a série de ciclos por período.
+    """
+    n = len(cols)
+    passo = BUCKETS.get(bucket or "")
+    if n:
+        if inicio is None:
+            inicio = int(cols.epoch.min())
+            if passo:
+                # sem 'from', a série começa na virada da hora/dia do primeiro registro
+                inicio -= inicio % passo
+        fim = int(cols.epoch.max()) + 1 if fim is None else fim
+    else:
+        inicio = inicio or 0
+        fim = fim or inicio
+    # janelas menores que uma hora contam como uma hora no throughput
+    horas = max(fim - inicio, 3600) / 3600
+
+    resultado: dict[str, Any] = {
+        "janela": {"inicio": from_epoch(inicio), "fim": from_epoch(fim), "ciclos": n},
+        "geral": _metricas(cols.tempo_total, cols.tempo_producao, cols.tempo_pausa, horas),
+        "produtos": {},
+    }
+    if not n:
+        return resultado
+
+    # agrupa por produto com um único argsort; cada grupo vira uma fatia contígua
+    ordem = np.argsort(cols.produto, kind="stable")
+    codigos = cols.produto[ordem]
+    limites = np.searchsorted(codigos, np.arange(len(cols.produtos) + 1))
+    total = cols.tempo_total[ordem]
+    tp = cols.tempo_producao[ordem]
+    pausa = cols.tempo_pausa[ordem]
+    epoch = cols.epoch[ordem]
+
+    nbuckets = (fim - inicio + passo - 1) // passo if passo else 0
+
+    for codigo, prod in enumerate(cols.produtos):
+        a, b = limites[codigo], limites[codigo + 1]
+        if a == b:
+            continue
+        m = _metricas(total[a:b], tp[a:b], pausa[a:b], horas)
+        if passo:
+            idx = (epoch[a:b] - inicio) // passo
+            idx = idx[(idx >= 0) & (idx < nbuckets)]
+            m["serie"] = np.bincount(idx, minlength=nbuckets).tolist()
+        resultado["produtos"][prod] = m
+
+    if passo:
+        resultado["janela"]["bucket"] = bucket
+        resultado["janela"]["buckets"] = [from_epoch(inicio + i * passo) for i in range(nbuckets)]
+    return resultado
+
+
+class WindowCache:
+    """LRU pequeno de resultados por (janela, versão dos dados)."""
+
+    def __init__(self, max_items: int = 32):
+        self.max_items = max_items
+        self._items: OrderedDict[tuple, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+            return None
+
+    def put(self, key: tuple, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
@@ -0,0 +1,16 @@
+import datetime
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def epoch_seconds(dt: datetime.datetime) -> int:
+    """
+    Segundos desde 1970 do horário gravado (sem fuso), igual ao
+    strftime('%s') do SQLite sobre a mesma string.
+    """
+    return int((dt - EPOCH).total_seconds())
+
+
+def from_epoch(segundos: float) -> str:
+    """Inverso de epoch_seconds, em iso ('YYYY-MM-DDTHH:MM:SS')."""
+    return (EPOCH + datetime.timedelta(seconds=int(segundos))).isoformat()
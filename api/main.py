@@ -14,19 +14,62 @@ Mudanças aplicadas (seguras e retro-compatíveis):
 
 import os
 import sys
-import socket
 import datetime
 import threading
 import pathlib
 import time
 import asyncio
-from typing import Any
-from flask import Flask, render_template, jsonify
+import queue
+import csv
+import io
+import json
+import socket
+
+# início do processo (o /ready informa quanto cada etapa levou a partir daqui)
+_INICIO = time.perf_counter()
+
+from flask import Flask, Response, render_template, jsonify, request
 
 # Módulos do projeto
-from core.session_manager import AuthOnCM
+# (core.session_manager não é importado aqui: aiohttp/bs4/certifi e o
+# configs.json só são carregados quando o scraper é usado, ver get_scraper())
+from core.order_cache import OrderCache
+from core.order_index import OrderIndex
+from core.orders import OPEN_STATUSES
+from core.progress import ProgressTracker
+from core.log_aggregator import LogAggregator
+from core.log_writer import BatchLogWriter
+from core.log_parser import parse_log_line as _parse_log_line, iter_log_records
+from core.cycle_store import CycleStore
+from core.cycle_history import CycleHistory
+from core.acks import NACK, enviar_acks
+from core.dedupe import DeviceSeqTracker, parse_device_seq
+from core.protocol import (
+    CABECALHO,
+    CRC,
+    FrameChecksumError,
+    INICIO_QUADRO,
+    FrameContentError,
+    FrameError,
+    has_control_chars,
+    is_frame_start,
+    parse_frame,
+    parse_header,
+    to_log_fields,
+)
+from core.rollups import GRANULARIDADES, RollupStore
+from core.segments import SegmentArchive
+from core.events import EventBroker, format_sse
+from core.http_cache import VersionedCache
+from core.metrics import MetricsRegistry, monitor_loop_lag, sample_stacks
+from core.utils.time_utils import epoch_seconds
 from core.utils.path_utils import resource_path
 from collections.abc import Coroutine
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core.session_manager import AuthOnCM
 
 # -----------------------------------------------------------
 # PASTAS E PATHS (BASE_DIR fixo e persistente)
@@ -51,13 +94,17 @@ else:
 TMP_DIR = BASE_DIR / "tmp"
 REPORTS_DIR = TMP_DIR / "reports"
 LOGS_PATH = TMP_DIR / "logs.txt"
+# segmentos diários fechados (logs-YYYY-MM-DD.txt.gz + índice)
+SEGMENTS_DIR = TMP_DIR / "segments"
 
 # garante existência das pastas e do arquivo de log
 TMP_DIR.mkdir(parents=True, exist_ok=True)
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 # touch logs file so it exists and permissions are correct
+# (só se não existir: o mtime de um arquivo existente indica o dia do segmento ativo)
 try:
-    LOGS_PATH.touch(exist_ok=True)
+    if not LOGS_PATH.exists():
+        LOGS_PATH.touch()
 except Exception:
     # em casos restritos de permissão, tentamos criar via open
     with open(str(LOGS_PATH), "a", encoding="utf-8"):
@@ -76,80 +123,240 @@ HOST = "0.0.0.0"
 TCP_PORT = 5050
 FLASK_PORT = 8080
 
+# limites do ingest TCP (cada vez que um é atingido conta em timesensor_limites_tcp_total)
+# conexões abertas no total: acima disso a nova conexão é recusada (fechada na hora)
+TCP_MAX_CONEXOES = 500
+# por IP: acima disso a conexão MAIS ANTIGA do IP é derrubada (a estação que
+# trocou de AP deixa a anterior meio-aberta e abre outra); 0 = sem limite
+TCP_MAX_CONEXOES_POR_IP = 2
+# sem nenhum byte recebido nesse tempo (s) a conexão é encerrada; 0 = sem limite
+TCP_IDLE_TIMEOUT = 300
+# keepalive do TCP: o kernel detecta o link morto mesmo sem tráfego da aplicação
+TCP_KEEPALIVE_IDLE = 60
+TCP_KEEPALIVE_INTERVAL = 10
+TCP_KEEPALIVE_COUNT = 5
+# maior linha de texto aceita (bytes); linhas maiores são descartadas
+TCP_MAX_LINHA = 1024
+# registros esperando o escritor: acima disso o ingest está sobrecarregado e
+#  - "atrasar": para de ler os sockets (o TCP segura as estações e o ACK atrasa)
+#  - "nack": responde NACK (registros com seq: "NACK <device> <seq>\n" e fecha a
+#    conexão; a estação espera e reenvia a partir do seq) sem gravar; linhas
+#    de texto sem seq (cliente antigo, que não reenviaria) atrasam como no "atrasar"
+INGEST_MAX_PENDENTES = 20_000
+INGEST_SOBRECARGA = "atrasar"
+# intervalo entre verificações da fila enquanto o ingest está atrasando (s)
+INGEST_ESPERA = 0.05
+
 # -----------------------------------------------------------
-# FUNÇÕES AUXILIARES DE LOG (escrita/parse robusto)
+# ESCRITA DOS LOGS (group commit)
+# -----------------------------------------------------------
+
+# lote é gravado ao atingir LOG_BATCH_SIZE registros ou LOG_BATCH_DELAY segundos
+LOG_BATCH_SIZE = 500
+LOG_BATCH_DELAY = 0.05
+# True -> fsync a cada lote (ACK só depois do dado estar no disco)
+LOG_FSYNC = False
+
+# "sqlite" -> ciclos em DB_PATH, consultas indexadas; "text" -> só o logs.txt
+CYCLE_BACKEND = "sqlite"
+# com backend sqlite, continua espelhando os registros no logs.txt
+LOGS_TEXT_MIRROR = True
+DB_PATH = TMP_DIR / "ciclos.db"
+# backend "text": histórico inteiro em colunas na memória (/logs e /stats sem reler os arquivos)
+CYCLE_HISTORY_IN_MEMORY = True
+
+# logs.txt é o segmento do dia; na virada ele é arquivado e compactado
+segment_archive = SegmentArchive(SEGMENTS_DIR, _parse_log_line)
+
+cycle_store = (
+    CycleStore(DB_PATH, _parse_log_line, synchronous_full=LOG_FSYNC) if CYCLE_BACKEND == "sqlite" else None
+)
+
+cycle_history = CycleHistory() if cycle_store is None and CYCLE_HISTORY_IN_MEMORY else None
+
+# baldes minuto/hora/dia por produto, atualizados a cada lote gravado
+# (no banco dos ciclos, os baldes entram na mesma transação do lote)
+rollup_store = RollupStore(TMP_DIR / "rollups.db", store=cycle_store)
+
+# sqlite: ciclos + rollups numa transação; o logs.txt é só espelho.
+# text: o logs.txt é o durável e o resto é derivado dele (reconstruível)
+log_writer = BatchLogWriter(
+    LOGS_PATH if cycle_store is None or LOGS_TEXT_MIRROR else None,
+    max_batch=LOG_BATCH_SIZE,
+    max_delay=LOG_BATCH_DELAY,
+    fsync=LOG_FSYNC,
+    sinks=[cycle_store.insert_records, rollup_store.add_records] if cycle_store is not None else [],
+    transaction=cycle_store.transaction if cycle_store is not None else None,
+    mirrors=([cycle_history.add_records] if cycle_history is not None else [])
+    + ([rollup_store.add_records] if cycle_store is None else []),
+    parse_line=_parse_log_line,
+    rotate=segment_archive.rotate,
+)
+
+# (device, seq) já gravados: reenvios do outbox das estações são confirmados sem regravar
+seq_tracker = DeviceSeqTracker()
+# ciclos mais recentes do banco relidos no start para preencher o seq_tracker
+SEQ_CARREGAR_ULTIMOS = 200_000
+# hora de captura enviada pela estação só é usada se estiver nessa faixa (senão vale a chegada)
+EPOCH_ESTACAO_MAX_ATRASO = 90 * 86400
+EPOCH_ESTACAO_MAX_ADIANTO = 60
+
+# -----------------------------------------------------------
+# PRONTIDÃO (/ready)
 # -----------------------------------------------------------
 
+# o TCP começa a escutar logo no start; as conexões ficam esperando aqui
+# (o kernel e o StreamReader seguram os bytes) até o escritor estar ativo
+# e os seqs gravados carregados
+ingest_pronto = asyncio.Event()
 
-def salvar_log(texto: str) -> None:
-    """Append seguro ao arquivo de logs (cria pasta se necessário)."""
-    TMP_DIR.mkdir(parents=True, exist_ok=True)
-    # usa modo append e encoding sempre
-    with open(str(LOGS_PATH), "a", encoding="utf-8") as f:
-        f.write(texto + "\n")
+# segundos desde _INICIO em que cada etapa terminou (None = ainda não)
+prontidao: dict[str, float | None] = {"tcp": None, "ingest": None, "scraper": None}
+# "parado" (login ainda não pedido), "conectando", "ok" ou "falhou"
+scraper_estado = {"estado": "parado", "erro": None}
 
 
-def _parse_log_line(line: str):
-    """
-    Tenta parsear uma linha de log no formato:
-    "YYYY-MM-DD HH:MM:SS | produto;tp;pausa;total;qtd"
+def _marcar_pronto(etapa: str) -> None:
+    prontidao[etapa] = round(time.perf_counter() - _INICIO, 3)
+    print(f"[START] {etapa} pronto em {prontidao[etapa] * 1000:.0f} ms")
 
-    Retorna um dict com os campos ou None se não for possível.
-    A função é tolerante: aceita espaços variados e tenta preencher valores faltantes.
-    """
-    if not line:
-        return None
 
-    # Tentativa simples: encontrar ' | ' (com espaço) ou '|' sem espaços
-    if " | " in line:
-        ts_part, rest = line.split(" | ", 1)
-    elif "|" in line:
-        ts_part, rest = line.split("|", 1)
-        ts_part = ts_part.strip()
-        rest = rest.strip()
+# eventos para o /logs/stream (SSE)
+event_broker = EventBroker()
+# intervalo do comentário keep-alive enviado aos clientes SSE
+SSE_KEEPALIVE = 15
+
+# -----------------------------------------------------------
+# MÉTRICAS (/metrics, formato Prometheus)
+# -----------------------------------------------------------
+
+metrics = MetricsRegistry("timesensor_")
+# intervalo do monitor de atraso do event loop (segundos)
+LOOP_LAG_INTERVAL = 0.5
+# /debug/profile: amostragem das pilhas de todas as threads por até N segundos
+# (desligado; liga com TIMESENSOR_DEBUG_PROFILE=1 no ambiente só para diagnosticar)
+DEBUG_PROFILE = os.environ.get("TIMESENSOR_DEBUG_PROFILE") == "1"
+DEBUG_PROFILE_MAX_SECONDS = 60
+# device e produto vêm do texto das estações: valores distintos além disso viram "outro"
+METRICS_MAX_VALORES_ROTULO = 200
+
+m_recebidos = metrics.counter(
+    "registros_recebidos_total",
+    "Registros recebidos pelo TCP (inclui repetidos).",
+    ("device", "produto"),
+    max_valores=METRICS_MAX_VALORES_ROTULO,
+)
+m_quadros_invalidos = metrics.counter("quadros_invalidos_total", "Quadros binários descartados.", ("motivo",))
+m_registros_recusados = metrics.counter(
+    "registros_recusados_total", "Registros de quadro com código inválido, confirmados (ACK) sem gravar."
+)
+m_conexoes = metrics.gauge("conexoes_tcp_abertas", "Conexões TCP de estações abertas.")
+m_limites = metrics.counter(
+    "limites_tcp_total",
+    "Limites do ingest TCP atingidos (conexoes, por_ip, ocioso, linha, fila_atraso, fila_nack).",
+    ("limite",),
+)
+m_gravacao = metrics.histogram(
+    "gravacao_segundos", "Do salvar_log() até o lote do registro estar gravado (e sincronizado, se LOG_FSYNC)."
+)
+metrics.counter_func("registros_gravados_total", "Registros gravados pelo escritor em lote.", lambda: log_writer.seq)
+metrics.gauge_func("escritor_fila", "Linhas esperando o próximo lote do escritor.", log_writer.pending)
+metrics.counter_func(
+    "registros_repetidos_total", "Reenvios (device, seq) já gravados, só confirmados.", lambda: seq_tracker.duplicados
+)
+metrics.counter_func(
+    "estacao_reinicios_seq_total", "Estações que recomeçaram a contagem de seq.", lambda: seq_tracker.reinicios
+)
+metrics.gauge_func(
+    "estacao_ultimo_seq",
+    "Maior seq aceito por estação.",
+    lambda: {(dev,): seq for dev, seq in seq_tracker.stats()["dispositivos"].items()},
+    ("device",),
+)
+metrics.gauge_func("sse_clientes", "Clientes conectados no /logs/stream.", event_broker.subscriber_count)
+m_logs_build = metrics.histogram("logs_build_segundos", "Tempo para montar o JSON do /logs (cache invalidado).")
+m_logs_bytes = metrics.gauge("logs_bytes", "Tamanho do último JSON do /logs.")
+m_loop_lag = metrics.histogram("loop_lag_segundos", "Atraso do event loop assíncrono além do intervalo do monitor.")
+m_loop_lag_ultimo = metrics.gauge("loop_lag_ultimo_segundos", "Último atraso medido do event loop.")
+
+# -----------------------------------------------------------
+# FUNÇÕES AUXILIARES DE LOG (escrita/parse robusto)
+# -----------------------------------------------------------
+
+
+def salvar_log(texto: str) -> Future:
+    """
+    Enfileira a linha para o escritor em lote (uma única thread grava o arquivo).
+    O Future resolve quando o lote da linha foi gravado (e sincronizado, se LOG_FSYNC).
+    """
+    inicio = time.perf_counter()
+    fut = log_writer.submit(texto)
+    fut.add_done_callback(lambda _: m_gravacao.observe(time.perf_counter() - inicio))
+    return fut
+
+
+# agregados do /logs mantidos em memória (lê só o que foi anexado)
+log_aggregator = LogAggregator(LOGS_PATH, _parse_log_line, archive=segment_archive)
+
+
+def _iter_registros_texto(
+    produto: str | None = None,
+    inicio: datetime.datetime | None = None,
+    fim: datetime.datetime | None = None,
+):
+    """CycleRecords dos segmentos arquivados (só os da janela) seguidos do logs.txt ativo."""
+    fmt = "%Y-%m-%d %H:%M:%S"
+    ini_s = inicio.strftime(fmt) if inicio else None
+    fim_s = fim.strftime(fmt) if fim else None
+    yield from segment_archive.iter_records(produto, ini_s, fim_s)
+    for r in iter_log_records(LOGS_PATH):
+        if produto and r.produto != produto:
+            continue
+        if (ini_s and r.data < ini_s) or (fim_s and r.data >= fim_s):
+            continue
+        yield r
+
+
+def _logs_snapshot() -> dict:
+    """Estado completo do dashboard: {produto: {"media", "logs"}}."""
+    if cycle_store is not None:
+        return cycle_store.logs_snapshot()
+    if cycle_history is not None:
+        return json.loads(cycle_history.logs_json())
+    log_aggregator.refresh()
+    return log_aggregator.snapshot()
+
+
+def _logs_json() -> bytes:
+    """Corpo do /logs; com o histórico em memória sai direto das colunas."""
+    if cycle_history is not None:
+        return cycle_history.logs_json()
+    return app.json.dumps(_logs_snapshot()).encode("utf-8")
+
+
+def _publicar_ciclos(registros: list) -> None:
+    """Listener do escritor: publica um evento 'ciclo' por registro gravado."""
+    if cycle_store is None and cycle_history is None:
+        # mantém o agregador em dia mesmo sem clientes conectados
+        registros = log_aggregator.refresh()
+
+    if not registros or not event_broker.has_subscribers():
+        return
+
+    if cycle_store is not None:
+        fonte = cycle_store
     else:
-        # sem separador reconhecível -> não conseguimos parsear
-        return None
+        fonte = cycle_history if cycle_history is not None else log_aggregator
+    medias = fonte.medias({r["produto"] for r in registros})
+    # listeners rodam na thread escritora antes do próximo lote: seq é o fim deste lote
+    seq = log_writer.seq
+    for r in registros:
+        if not isinstance(r, dict):
+            r = r.to_dict()
+        event_broker.publish("ciclo", {"produto": r["produto"], "media": medias[r["produto"]], "log": r}, id=seq)
 
-    # tenta converter timestamp
-    try:
-        dt = datetime.datetime.strptime(ts_part.strip(), "%Y-%m-%d %H:%M:%S")
-    except Exception:
-        # se falhar, rejeita
-        return None
 
-    # separa o resto por ';' e normaliza quantidade de itens
-    parts = [p.strip() for p in rest.split(";")]
-    # esperamos 5 campos: produto, tp, pausa, total, qtd
-    while len(parts) < 5:
-        parts.append("0")
-    produto = parts[0]
-    try:
-        tp = int(parts[1]) if parts[1] else 0
-    except Exception:
-        tp = 0
-    try:
-        pausa = int(parts[2]) if parts[2] else 0
-    except Exception:
-        pausa = 0
-    try:
-        total = int(parts[3]) if parts[3] else 0
-    except Exception:
-        total = tp + pausa
-    try:
-        qtd = int(parts[4]) if parts[4] else 0
-    except Exception:
-        qtd = 0
-
-    return {
-        "data": dt.strftime("%Y-%m-%d %H:%M:%S"),
-        "datetime": dt,
-        "produto": produto,
-        "tempo_producao": tp,
-        "tempo_pausa": pausa,
-        "tempo_total": total,
-        "quantidade": qtd,
-    }
+log_writer.listeners.append(_publicar_ciclos)
 
 
 # -----------------------------------------------------------
@@ -157,62 +364,335 @@ def _parse_log_line(line: str):
 # -----------------------------------------------------------
 
 
-def handle_client(conn: socket.socket, addr: Any) -> None:
+def _timestamp_registro(epoch: int | None) -> str:
+    """Hora do ciclo: a da captura na estação (outbox), se plausível; senão a da chegada."""
+    agora = time.time()
+    if epoch is not None and agora - EPOCH_ESTACAO_MAX_ATRASO <= epoch <= agora + EPOCH_ESTACAO_MAX_ADIANTO:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(epoch))
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _esquecer_se_falhar(device: str, seq: int):
+    def callback(fut) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            # não gravado: o reenvio da estação precisa passar pela deduplicação
+            seq_tracker.esquecer(device, seq)
+
+    return callback
+
+
+def _receber(
+    pendentes: asyncio.Queue,
+    msg: str,
+    device: str | None = None,
+    seq: int | None = None,
+    epoch: int | None = None,
+) -> None:
+    """Enfileira um registro para gravação (ou só para ACK, se o (device, seq) já foi gravado)."""
+    m_recebidos.inc(device=device or "", produto=msg.split(";", 1)[0])
+    if seq is None:
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] RECEBIDO: {msg}")
+
+        # salva no formato já usado pelo frontend: "TIMESTAMP | RESTO"
+        pendentes.put_nowait((asyncio.wrap_future(salvar_log(f"{timestamp} | {msg}")), None, None))
+        return
+
+    if not seq_tracker.aceitar(device, seq, epoch):
+        print(f"[TCP] Repetido de {device} (seq {seq}), só ACK")
+        pendentes.put_nowait((None, device, seq))
+        return
+
+    timestamp = _timestamp_registro(epoch)
+    print(f"[{timestamp}] RECEBIDO: {msg}")
+    fut = asyncio.wrap_future(salvar_log(f"{timestamp} | {msg}"))
+    fut.add_done_callback(_esquecer_se_falhar(device, seq))
+    pendentes.put_nowait((fut, device, seq))
+
+
+async def _ler_inicio(reader: asyncio.StreamReader) -> bytes:
+    """
+    Primeiros bytes da próxima mensagem: lê byte a byte enquanto eles
+    conferem com o início de um quadro (magic + versão). Para no primeiro que
+    não confere, que fica como começo de uma linha de texto.
+    """
+    inicio = await reader.readexactly(1)
+    while len(inicio) < len(INICIO_QUADRO) and INICIO_QUADRO.startswith(inicio):
+        try:
+            inicio += await reader.readexactly(1)
+        except asyncio.IncompleteReadError:
+            break
+    return inicio
+
+
+async def _ler_quadro(reader: asyncio.StreamReader, inicio: bytes) -> bytes:
+    """Bytes de um quadro binário (core/protocol.py) cujo início (magic + versão) já foi lido."""
+    cabecalho = inicio + await reader.readexactly(CABECALHO.size - len(inicio))
+    _, tamanho = parse_header(cabecalho)
+    return cabecalho + await reader.readexactly(tamanho + CRC.size)
+
+
+async def _ler_linha(reader: asyncio.StreamReader, primeiro: bytes) -> bytes | None:
+    """
+    Resto de uma linha de texto (até '\\n' ou o fim da conexão). None se ela
+    passou de TCP_MAX_LINHA: é descartada inteira, até o '\\n', para o resto
+    não ser lido como um registro.
+    """
+    try:
+        return primeiro + await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return primeiro + e.partial
+    except asyncio.LimitOverrunError as e:
+        consumido = e.consumed
+    while True:
+        await reader.readexactly(consumido)
+        try:
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.LimitOverrunError as e:
+            consumido = e.consumed
+
+
+def _sobrecarregado() -> bool:
+    return INGEST_MAX_PENDENTES > 0 and log_writer.pending() >= INGEST_MAX_PENDENTES
+
+
+async def _esperar_fila(sempre: bool = False) -> None:
+    """
+    Modo "atrasar" (ou `sempre`): não lê mais nada do socket enquanto a fila
+    do escritor estiver cheia.
+    """
+    if (INGEST_SOBRECARGA != "atrasar" and not sempre) or not _sobrecarregado():
+        return
+    m_limites.inc(limite="fila_atraso")
+    while _sobrecarregado():
+        await asyncio.sleep(INGEST_ESPERA)
+
+
+def _configurar_keepalive(writer: asyncio.StreamWriter) -> None:
+    """Liga o keepalive do TCP (e os tempos, onde o sistema permite) no socket da conexão."""
+    sock = writer.get_extra_info("socket")
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for nome, valor in (
+            ("TCP_KEEPIDLE", TCP_KEEPALIVE_IDLE),
+            ("TCP_KEEPINTVL", TCP_KEEPALIVE_INTERVAL),
+            ("TCP_KEEPCNT", TCP_KEEPALIVE_COUNT),
+        ):
+            if hasattr(socket, nome):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, nome), valor)
+    except OSError as e:
+        print("[TCP] Falha ao configurar keepalive:", e)
+
+
+# conexões abertas por IP, da mais antiga para a mais nova
+_conexoes_por_ip: dict[str, list[asyncio.StreamWriter]] = {}
+
+
+def _admitir(ip: str, writer: asyncio.StreamWriter) -> bool:
+    """
+    Aplica os limites de conexões. Por IP: derruba a mais antiga (a estação
+    reconectou e a anterior ficou meio-aberta). No total: recusa a nova.
+    """
+    lista = _conexoes_por_ip.setdefault(ip, [])
+    while TCP_MAX_CONEXOES_POR_IP and len(lista) >= TCP_MAX_CONEXOES_POR_IP:
+        antiga = lista.pop(0)
+        m_limites.inc(limite="por_ip")
+        print(f"[TCP] Limite de conexões de {ip}: derrubando a mais antiga")
+        antiga.transport.abort()
+
+    if TCP_MAX_CONEXOES and sum(map(len, _conexoes_por_ip.values())) >= TCP_MAX_CONEXOES:
+        m_limites.inc(limite="conexoes")
+        print(f"[TCP] Limite de {TCP_MAX_CONEXOES} conexões: recusando {ip}")
+        if not lista:
+            del _conexoes_por_ip[ip]
+        return False
+
+    lista.append(writer)
+    return True
+
+
+def _liberar(ip: str, writer: asyncio.StreamWriter) -> None:
+    lista = _conexoes_por_ip.get(ip)
+    if lista is None:
+        return
+    if writer in lista:
+        lista.remove(writer)
+    if not lista:
+        del _conexoes_por_ip[ip]
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Atende uma estação no event loop. O início de cada mensagem decide o
+    formato:
+
+     - quadro binário (magic + versão de core/protocol.py, e crc válido):
+       tamanho prefixado, vários ciclos por quadro, com device e seq
+     - texto: cada registro termina em '\\n' (formato do sendData() antigo),
+       então o stream é fatiado por linha: registros colados pelo Nagle ou
+       quebrados entre leituras chegam inteiros
+
+    Registros com (device, seq) que já foram gravados (reenvio do outbox
+    depois de uma queda no meio do lote) são confirmados sem serem
+    gravados de novo; registros de quadro com código inválido são
+    confirmados sem serem gravados.
+
+    Limites: conexões no total e por IP, TCP_IDLE_TIMEOUT sem dados (mais o
+    keepalive do TCP para o link morto), TCP_MAX_LINHA e a fila do escritor
+    (INGEST_SOBRECARGA).
+    """
+    addr = writer.get_extra_info("peername")
+    ip = addr[0] if addr else "?"
+    if not _admitir(ip, writer):
+        writer.transport.abort()
+        return
+
     print(f"[TCP] Conexão de {addr}")
+    m_conexoes.inc()
+    _configurar_keepalive(writer)
+
+    pendentes: asyncio.Queue = asyncio.Queue()
+    acks = asyncio.create_task(enviar_acks(writer, pendentes))
+
+    # bytes já lidos que voltam a ser texto (quadro com crc errado)
+    resto = bytearray()
 
     try:
+        # conexão aceita durante o start: só lê depois do escritor estar ativo
+        await ingest_pronto.wait()
+
         while True:
-            data = conn.recv(4096)
-            if not data:
-                break
+            await _esperar_fila()
 
-            # decodifica ignorando bytes errados
+            quadro = linha = None
             try:
-                msg = data.decode("utf-8", errors="ignore").strip()
-            except Exception:
-                msg = str(data)
+                async with asyncio.timeout(TCP_IDLE_TIMEOUT or None):
+                    if b"\n" in resto:
+                        fim = resto.index(b"\n") + 1
+                        linha = bytes(resto[:fim])
+                        del resto[:fim]
+                    elif resto:
+                        linha = await _ler_linha(reader, bytes(resto))
+                        resto.clear()
+                    else:
+                        inicio = await _ler_inicio(reader)
+                        if is_frame_start(inicio):
+                            bruto = await _ler_quadro(reader, inicio)
+                            try:
+                                quadro = (*parse_frame(bruto), ())
+                            except FrameContentError as e:
+                                # código inválido em algum registro: os outros são
+                                # gravados e os recusados só confirmados (senão a
+                                # estação reenviaria o quadro para sempre)
+                                print(f"[TCP] Quadro de {addr} com registros recusados: {e}")
+                                m_quadros_invalidos.inc(motivo="registro")
+                                quadro = (e.device, e.registros, e.recusados)
+                            except FrameChecksumError as e:
+                                # magic e versão batem mas o crc não: não é um quadro
+                                # (ou veio corrompido); os bytes seguem como texto
+                                print(f"[TCP] Quadro com crc inválido de {addr}, lido como texto: {e}")
+                                m_quadros_invalidos.inc(motivo="crc")
+                                resto += bruto
+                                continue
+                        elif inicio.endswith(b"\n"):
+                            linha = inicio
+                        else:
+                            linha = await _ler_linha(reader, inicio)
+            except asyncio.IncompleteReadError:
+                break
+            except TimeoutError:
+                m_limites.inc(limite="ocioso")
+                print(f"[TCP] Cliente {addr} sem dados há {TCP_IDLE_TIMEOUT} s, encerrando")
+                break
+            except FrameError as e:
+                # crc ok mas estrutura ou device inválidos: não há a quem confirmar
+                # (o firmware só aceita ACK com o próprio device), descarta
+                print(f"[TCP] Quadro inválido de {addr}: {e}")
+                m_quadros_invalidos.inc(motivo="formato")
+                continue
 
-            if msg == "":
+            nack = INGEST_SOBRECARGA == "nack" and _sobrecarregado()
+
+            if quadro is not None:
+                device, registros, recusados = quadro
+                if nack and registros:
+                    m_limites.inc(limite="fila_nack")
+                    pendentes.put_nowait((NACK, device, registros[0].seq))
+                    break
+                for i, r in enumerate(registros):
+                    if i in recusados:
+                        print(f"[TCP] Registro de {device} (seq {r.seq}) com código inválido {r.produto!r}, só ACK")
+                        m_registros_recusados.inc()
+                        pendentes.put_nowait((None, device, r.seq))
+                        continue
+                    _receber(pendentes, to_log_fields(device, r), device, r.seq, r.epoch or None)
                 continue
 
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] RECEBIDO: {msg}")
+            if linha is None or len(linha) > TCP_MAX_LINHA:
+                m_limites.inc(limite="linha")
+                print(f"[TCP] Linha maior que {TCP_MAX_LINHA} bytes de {addr}, descartada")
+                continue
 
-            # salva no formato já usado pelo frontend: "TIMESTAMP | RESTO"
-            salvar_log(f"{timestamp} | {msg}")
-            try:
-                conn.sendall(b"OK")
-            except Exception:
-                pass
+            # decodifica ignorando bytes errados
+            msg = linha.decode("utf-8", errors="ignore").strip()
+            if msg == "":
+                continue
+            if has_control_chars(msg):
+                # '\r' e afins quebrariam a linha no logs.txt
+                print(f"[TCP] Linha com caractere de controle de {addr}, descartada: {msg!r}")
+                continue
+
+            campos = parse_device_seq(msg)
+            if nack and campos is None:
+                # cliente antigo (sem seq) não reenvia depois de um NACK: atrasa como no "atrasar"
+                await _esperar_fila(sempre=True)
+            elif nack:
+                m_limites.inc(limite="fila_nack")
+                pendentes.put_nowait((NACK, campos[0], campos[1]))
+                break
+            if campos is None:
+                _receber(pendentes, msg)
+            else:
+                _receber(pendentes, msg, *campos)
 
+    except ConnectionError:
+        pass
     except Exception as e:
         print("[TCP] Erro no handle_client:", e)
     finally:
+        # espera os ACKs pendentes antes de fechar
+        pendentes.put_nowait(None)
         try:
-            conn.close()
+            await acks
         except Exception:
             pass
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+        _liberar(ip, writer)
+        m_conexoes.dec()
         print(f"[TCP] Cliente {addr} desconectado")
 
 
-def tcp_server() -> None:
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server.bind((HOST, TCP_PORT))
-    server.listen()
+async def tcp_server() -> None:
+    """Servidor TCP assíncrono: todas as conexões no mesmo async_loop."""
+    # limit: tamanho máximo de uma linha no StreamReader (os quadros usam readexactly)
+    server = await asyncio.start_server(handle_client, HOST, TCP_PORT, reuse_address=True, limit=TCP_MAX_LINHA)
     print(f"[TCP] Servidor TCP iniciado em {HOST}:{TCP_PORT}")
+    _marcar_pronto("tcp")
 
     try:
-        while True:
-            conn, addr = server.accept()
-            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
     except Exception as e:
         print("[TCP] Encerrando servidor TCP:", e)
-    finally:
-        try:
-            server.close()
-        except Exception:
-            pass
 
 
 # -----------------------------------------------------------
@@ -232,61 +712,445 @@ def index():
         )
 
 
+# identifica esta execução: a sequência do escritor recomeça do zero a cada start
+_BOOT_ID = f"{time.time_ns():x}"
+
+
+def _logs_version() -> str:
+    """
+    Versão barata dos dados do /logs: sequência de registros gravados pelo
+    escritor (backend sqlite ou histórico em memória) ou tamanho+mtime do
+    logs.txt (backend texto, que também pode ser alterado por fora).
+    """
+    if cycle_store is not None or cycle_history is not None:
+        return f"{_BOOT_ID}-{log_writer.seq}"
+    st = LOGS_PATH.stat()
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _logs_json_medido() -> bytes:
+    with m_logs_build.time():
+        body = _logs_json()
+    m_logs_bytes.set(len(body))
+    return body
+
+
+# JSON do /logs já serializado, compartilhado entre os pollers até a próxima gravação
+logs_cache = VersionedCache(_logs_json_medido)
+metrics.counter_func(
+    "logs_cache_total",
+    "Requisições do /logs servidas do cache (hit) ou que remontaram o JSON (miss).",
+    lambda: {("hit",): logs_cache.hits, ("miss",): logs_cache.misses},
+    ("resultado",),
+)
+
+
 @app.route("/logs")
 def get_logs():
     """
-    Lê o arquivo logs.txt sempre do TMP_DIR configurado e retorna o JSON esperado
+    Retorna o JSON esperado pelo dashboard. Com backend sqlite vem de consultas
+    indexadas; senão do agregador incremental, que só parseia as linhas
+    anexadas ao logs.txt desde a última chamada.
     A leitura é tolerante a linhas mal-formadas.
-    """
-    registros = []
 
-    # garante que o arquivo exista (touch)
+    Responde com ETag; clientes que mandam If-None-Match com a versão atual
+    recebem 304 sem corpo.
+    """
+    # garante que o arquivo exista (sem touch em arquivo existente: mudaria o mtime/versão)
     try:
-        LOGS_PATH.touch(exist_ok=True)
+        if not LOGS_PATH.exists():
+            LOGS_PATH.touch()
     except Exception:
         pass
 
     try:
-        with open(str(LOGS_PATH), encoding="utf-8") as f:
-            raw_lines = f.readlines()
+        # versão antes do snapshot: no pior caso o cache fica mais novo que a etag
+        etag, body = logs_cache.get(_logs_version())
     except Exception as e:
-        print("[LOGS] erro ao abrir arquivo:", e)
+        print("[LOGS] erro ao ler registros:", e)
         return jsonify({})
 
-    # percorre linhas do arquivo do mais antigo ao mais novo, mas depois ordena
-    for line in raw_lines:
-        line = line.strip()
-        parsed = _parse_log_line(line)
-        if parsed:
-            registros.append(parsed)
+    resp = app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
 
-    # ordena do mais novo → mais antigo
-    registros.sort(key=lambda x: x["datetime"], reverse=True)
 
-    # agrupa por produto e calcula médias
-    produtos: dict[str, Any] = {}
-    for r in registros:
-        prod = r["produto"]
-        if prod not in produtos:
-            produtos[prod] = {"media": 0, "logs": [], "_soma": 0, "_count": 0}
+@app.route("/logs/stream")
+def logs_stream():
+    """
+    Server-Sent Events: envia um 'snapshot' (mesmo JSON do /logs) e depois
+    só os eventos 'ciclo' ({produto, media, log}) conforme os registros chegam.
 
-        produtos[prod]["_soma"] += r["tempo_total"]
-        produtos[prod]["_count"] += 1
-        produtos[prod]["logs"].append(r)
+    A inscrição vem antes do snapshot (nada se perde entre os dois), e o
+    snapshot é montado entre dois lotes do escritor: os eventos com id
+    (seq do lote) até o seq do snapshot já estão nele e são pulados.
+    """
 
-    for prod in produtos:
-        produtos[prod]["media"] = produtos[prod]["_soma"] / produtos[prod]["_count"] if produtos[prod]["_count"] else 0
-        produtos[prod]["logs"] = produtos[prod]["logs"][:50]
-        del produtos[prod]["_soma"]
-        del produtos[prod]["_count"]
+    def gerar():
+        q = event_broker.subscribe()
+        try:
+            seq, snapshot = log_writer.snapshot(_logs_snapshot)
+            yield format_sse("snapshot", snapshot, id=seq)
+            while True:
+                try:
+                    item = q.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    # cliente ficou para trás; o navegador reconecta e recebe novo snapshot
+                    break
+                id_evento, msg = item
+                if id_evento is not None and id_evento <= seq:
+                    continue
+                yield msg
+        finally:
+            event_broker.unsubscribe(q)
+
+    return Response(
+        gerar(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -----------------------------------------------------------
+# ESTATÍSTICAS (/stats)
+# -----------------------------------------------------------
+
+# core.stats puxa o NumPy (~80 ms de import): carregado só no primeiro /stats
+stats_cache = None
+
+
+def _parse_data_param(nome: str) -> datetime.datetime | None:
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"parâmetro '{nome}' inválido: {valor} (use YYYY-MM-DD ou YYYY-MM-DDTHH:MM:SS)")
+
+
+def _iter_ciclos(produto: str | None, inicio: datetime.datetime | None, fim: datetime.datetime | None):
+    """Tuplas (epoch, produto, tp, pausa, total, qtd) da janela lidas dos segmentos e do logs.txt."""
+    for r in _iter_registros_texto(produto, inicio, fim):
+        yield (epoch_seconds(r.datetime), r.produto, r.tempo_producao, r.tempo_pausa, r.tempo_total, r.quantidade)
 
-    # converte datetime para iso string para serialização
-    for prod in produtos:
-        for log in produtos[prod]["logs"]:
-            if isinstance(log.get("datetime"), datetime.datetime):
-                log["datetime"] = log["datetime"].isoformat()
 
-    return jsonify(produtos)
+@app.route("/stats")
+def get_stats():
+    """
+    Estatísticas por produto numa janela:
+    /stats?from=2025-01-01&to=2025-04-01&product=TKC110 002 002&bucket=hour|day
+    """
+    try:
+        inicio = _parse_data_param("from")
+        fim = _parse_data_param("to")
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    produto = request.args.get("product") or None
+    bucket = request.args.get("bucket") or None
+    if bucket and bucket not in ("hour", "day"):
+        return jsonify({"erro": "bucket deve ser 'hour' ou 'day'"}), 400
+
+    global stats_cache
+    from core.stats import WindowCache, columns_from_chunks, columns_from_history, columns_from_rows, compute_stats
+
+    if stats_cache is None:
+        stats_cache = WindowCache()
+
+    # janela fechada no passado não muda mais; janela aberta depende da versão dos dados
+    chave: tuple = (produto, inicio, fim, bucket)
+    if fim is None or fim > datetime.datetime.now():
+        chave += (_logs_version(),)
+
+    resultado = stats_cache.get(chave)
+    if resultado is None:
+        try:
+            ini_epoch = epoch_seconds(inicio) if inicio else None
+            fim_epoch = epoch_seconds(fim) if fim else None
+            if cycle_history is not None:
+                cols = columns_from_history(cycle_history, produto, ini_epoch, fim_epoch)
+            elif cycle_store is not None:
+                fmt = "%Y-%m-%d %H:%M:%S"
+                cols = columns_from_chunks(
+                    *cycle_store.iter_numeric_chunks(
+                        produto, inicio.strftime(fmt) if inicio else None, fim.strftime(fmt) if fim else None
+                    )
+                )
+            else:
+                cols = columns_from_rows(_iter_ciclos(produto, inicio, fim))
+            resultado = compute_stats(cols, ini_epoch, fim_epoch, bucket)
+        except Exception as e:
+            print("[STATS] erro ao calcular estatísticas:", e)
+            return jsonify({"erro": str(e)}), 500
+        stats_cache.put(chave, resultado)
+
+    return jsonify(resultado)
+
+
+# -----------------------------------------------------------
+# ROLLUPS (/rollups)
+# -----------------------------------------------------------
+
+
+@app.route("/rollups")
+def get_rollups():
+    """
+    Baldes pré-agregados por produto:
+    /rollups?product=TKC110 002 002&granularity=minute|hour|day&from=2025-01-01&to=2025-01-08
+    """
+    granularidade = request.args.get("granularity") or "hour"
+    if granularidade not in GRANULARIDADES:
+        return jsonify({"erro": "granularity deve ser 'minute', 'hour' ou 'day'"}), 400
+    try:
+        inicio = _parse_data_param("from")
+        fim = _parse_data_param("to")
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    try:
+        produtos = rollup_store.query(
+            granularidade,
+            request.args.get("product") or None,
+            epoch_seconds(inicio) if inicio else None,
+            epoch_seconds(fim) if fim else None,
+        )
+    except Exception as e:
+        print("[ROLLUPS] erro ao consultar:", e)
+        return jsonify({"erro": str(e)}), 500
+
+    return jsonify({"granularidade": granularidade, "produtos": produtos})
+
+
+# -----------------------------------------------------------
+# EXPORTAÇÃO (/export)
+# -----------------------------------------------------------
+
+# linhas por bloco enviado (CSV/NDJSON) e por row group (Parquet)
+EXPORT_CHUNK = 5_000
+EXPORT_PARQUET_ROW_GROUP = 100_000
+EXPORT_FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+EXPORT_COLUNAS = ("data", "produto", "tempo_producao", "tempo_pausa", "tempo_total", "quantidade")
+
+m_export = metrics.counter("export_linhas_total", "Linhas enviadas pelo /export.", ("formato",))
+
+
+def _iter_export(produto: str | None, inicio: datetime.datetime | None, fim: datetime.datetime | None, epoch: bool):
+    """
+    Tuplas (data, produto, tp, pausa, total, qtd) da janela em ordem cronológica,
+    lidas em blocos do banco ou dos segmentos + logs.txt (nunca o histórico
+    inteiro na memória). data é a string gravada ou, com epoch=True, os segundos.
+    """
+    if cycle_store is not None:
+        fmt = "%Y-%m-%d %H:%M:%S"
+        yield from cycle_store.iter_rows(
+            produto, inicio.strftime(fmt) if inicio else None, fim.strftime(fmt) if fim else None, epoch=epoch
+        )
+        return
+    for r in _iter_registros_texto(produto, inicio, fim):
+        data = epoch_seconds(r.datetime) if epoch else r.data
+        yield (data, r.produto, r.tempo_producao, r.tempo_pausa, r.tempo_total, r.quantidade)
+
+
+def _blocos(linhas, tamanho: int):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _export_csv(linhas, sep: str):
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=sep, lineterminator="\r\n")
+    escritor.writerow(EXPORT_COLUNAS)
+    for bloco in _blocos(linhas, EXPORT_CHUNK):
+        escritor.writerows(bloco)
+        yield saida.getvalue().encode("utf-8")
+        saida.seek(0)
+        saida.truncate()
+        m_export.inc(len(bloco), formato="csv")
+    if saida.tell():
+        yield saida.getvalue().encode("utf-8")
+
+
+def _export_ndjson(linhas):
+    nomes_json: dict[str, str] = {}
+    for bloco in _blocos(linhas, EXPORT_CHUNK):
+        partes = []
+        for data, produto, tp, pausa, total, qtd in bloco:
+            nome = nomes_json.get(produto)
+            if nome is None:
+                nome = nomes_json[produto] = json.dumps(produto, ensure_ascii=False)
+            partes.append(
+                f'{{"data": "{data}", "produto": {nome}, "tempo_producao": {tp}, '
+                f'"tempo_pausa": {pausa}, "tempo_total": {total}, "quantidade": {qtd}}}\n'
+            )
+        yield "".join(partes).encode("utf-8")
+        m_export.inc(len(bloco), formato="ndjson")
+
+
+class _SaidaParquet(io.RawIOBase):
+    """Arquivo só de escrita que guarda os bytes até o próximo drenar() (posição absoluta no tell())."""
+
+    def __init__(self):
+        super().__init__()
+        self._partes: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        self._pos += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _export_parquet(linhas, pa, pq):
+    """Um row group por bloco: o Flask só guarda um bloco de colunas por vez."""
+    schema = pa.schema(
+        [
+            ("data", pa.timestamp("s")),
+            ("produto", pa.dictionary(pa.int32(), pa.string())),
+            ("tempo_producao", pa.int32()),
+            ("tempo_pausa", pa.int32()),
+            ("tempo_total", pa.int32()),
+            ("quantidade", pa.int32()),
+        ]
+    )
+    saida = _SaidaParquet()
+    with pq.ParquetWriter(saida, schema, compression="zstd") as escritor:
+        for bloco in _blocos(linhas, EXPORT_PARQUET_ROW_GROUP):
+            colunas = list(zip(*bloco))
+            tabela = pa.Table.from_arrays(
+                [
+                    pa.array(colunas[0], pa.int64()).cast(pa.timestamp("s")),
+                    pa.array(colunas[1], pa.string()).dictionary_encode(),
+                    *(pa.array(c, pa.int32()) for c in colunas[2:]),
+                ],
+                schema=schema,
+            )
+            escritor.write_table(tabela)
+            m_export.inc(len(bloco), formato="parquet")
+            yield saida.drenar()
+    yield saida.drenar()
+
+
+@app.route("/export")
+def export():
+    """
+    Histórico de ciclos para download, em streaming:
+    /export?from=2025-01-01&to=2025-04-01&product=TKC110 002 002&format=csv|ndjson|parquet
+    CSV aceita sep=; (Excel em pt-BR). Parquet precisa do pyarrow instalado (501 sem ele).
+    """
+    try:
+        inicio = _parse_data_param("from")
+        fim = _parse_data_param("to")
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    produto = request.args.get("product") or None
+    formato = (request.args.get("format") or "csv").lower()
+    if formato not in EXPORT_FORMATOS:
+        return jsonify({"erro": f"format deve ser um de: {', '.join(EXPORT_FORMATOS)}"}), 400
+    sep = request.args.get("sep") or ","
+    if sep not in (",", ";", "\t"):
+        return jsonify({"erro": "sep deve ser ',', ';' ou tab"}), 400
+
+    if formato == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            return jsonify({"erro": "exportação em Parquet requer o pacote pyarrow"}), 501
+        corpo = _export_parquet(_iter_export(produto, inicio, fim, epoch=True), pa, pq)
+    elif formato == "ndjson":
+        corpo = _export_ndjson(_iter_export(produto, inicio, fim, epoch=False))
+    else:
+        corpo = _export_csv(_iter_export(produto, inicio, fim, epoch=False), sep)
+
+    mimetype, extensao = EXPORT_FORMATOS[formato]
+    nome = "ciclos"
+    if produto:
+        nome += "_" + "".join(c if c.isalnum() else "-" for c in produto)
+    if inicio:
+        nome += f"_{inicio:%Y%m%d}"
+    if fim:
+        nome += f"_{fim:%Y%m%d}"
+    return Response(
+        corpo,
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{nome}.{extensao}"', "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/ready")
+def ready():
+    """
+    Prontidão do servidor: 200 quando o ingest está aceitando registros,
+    503 durante o start. O scraper (login em segundo plano) aparece no
+    corpo mas não conta: o ERP fora do ar não impede o ingest.
+    """
+    pronto = ingest_pronto.is_set()
+    corpo = {
+        "pronto": pronto,
+        "segundos": prontidao,
+        "scraper": scraper_estado["estado"],
+        "scraper_erro": scraper_estado["erro"],
+    }
+    return jsonify(corpo), 200 if pronto else 503
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Métricas do ingest, do /logs, do scraper e do event loop no formato texto do Prometheus."""
+    return app.response_class(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route("/debug/profile")
+def debug_profile():
+    """
+    Amostra as pilhas de todas as threads pelos próximos ?seconds= (padrão 10)
+    e devolve as pilhas agregadas no formato "collapsed" (flamegraph.pl,
+    speedscope). Uma amostragem por vez.
+    """
+    if not DEBUG_PROFILE:
+        return jsonify({"erro": "profiler desabilitado"}), 404
+    try:
+        segundos = float(request.args.get("seconds", 10))
+        intervalo = float(request.args.get("interval", 0.005))
+    except ValueError:
+        return jsonify({"erro": "seconds/interval inválidos"}), 400
+    segundos = min(max(segundos, 0.1), DEBUG_PROFILE_MAX_SECONDS)
+    intervalo = min(max(intervalo, 0.001), 1.0)
+
+    try:
+        pilhas, amostras = sample_stacks(segundos, intervalo)
+    except RuntimeError as e:
+        return jsonify({"erro": str(e)}), 409
+    resp = app.response_class(pilhas, mimetype="text/plain")
+    resp.headers["X-Profile-Samples"] = str(amostras)
+    return resp
 
 
 def start_flask():
@@ -315,28 +1179,300 @@ def run_async(coro: Coroutine):
 # SCRAPER
 # -----------------------------------------------------------
 
-scraper = AuthOnCM(str(TMP_DIR))
-
-
-async def scrape_task(op: str) -> dict:
+# cache das consultas por OP (TTL em segundos, tamanho máximo LRU)
+ORDER_CACHE_TTL = 300
+ORDER_CACHE_SIZE = 256
+# True -> devolve a cópia expirada na hora e atualiza em segundo plano
+ORDER_CACHE_SWR = False
+
+# /scrape/batch: consultas simultâneas, requisições por segundo ao ERP e OPs por pedido
+SCRAPE_BATCH_CONCURRENCY = 4
+SCRAPE_RATE_PER_HOST = 5
+SCRAPE_BATCH_MAX = 100
+# tempo máximo de espera por uma OP (igual ao /scrape/<op>)
+SCRAPE_TIMEOUT = 90
+
+# sincronização periódica das OPs para o índice local (intervalo em segundos)
+ORDER_SYNC_INTERVAL = 600
+# janela móvel de entrega sincronizada: hoje - PAST_DAYS até hoje + FUTURE_DAYS
+ORDER_SYNC_PAST_DAYS = 30
+ORDER_SYNC_FUTURE_DAYS = 90
+ORDER_SYNC_PAGE_SIZE = 100
+# status do ERP sincronizados (um passe por status): só as OPs abertas / em produção
+ORDER_SYNC_STATUSES = OPEN_STATUSES
+ORDERS_DB_PATH = TMP_DIR / "ordens.db"
+
+m_erp_requisicoes = metrics.histogram(
+    "erp_requisicao_segundos", "Latência das requisições ao ERP (ok=false: erro ou página de login).", ("ok",)
+)
+
+# criado na primeira vez que é usado (login em segundo plano ou uma consulta):
+# o import do aiohttp/bs4/certifi e a leitura do configs.json saem do start
+_scraper: "AuthOnCM | None" = None
+_scraper_lock = threading.Lock()
+
+
+def get_scraper() -> "AuthOnCM":
+    """Scraper do ERP (único); a primeira chamada importa e cria. Pode bloquear: no loop, use via to_thread."""
+    global _scraper
+    if _scraper is not None:
+        return _scraper
+    with _scraper_lock:
+        if _scraper is None:
+            from core.session_manager import AuthOnCM
+
+            scraper = AuthOnCM(
+                str(TMP_DIR),
+                rate_per_host=SCRAPE_RATE_PER_HOST,
+                window_past_days=ORDER_SYNC_PAST_DAYS,
+                window_future_days=ORDER_SYNC_FUTURE_DAYS,
+            )
+            scraper.request_listeners.append(
+                lambda _path, segundos, ok: m_erp_requisicoes.observe(segundos, ok=str(ok).lower())
+            )
+            _scraper = scraper
+    return _scraper
+
+
+# OPs da janela, por código e por produto (consulta local do /scrape/<op>)
+order_index = OrderIndex(ORDERS_DB_PATH)
+
+# progresso das OPs: peças produzidas (mesma janela da sincronização) x quantidade
+progress_tracker = ProgressTracker(order_index, desde_dias=ORDER_SYNC_PAST_DAYS)
+log_writer.listeners.append(progress_tracker.add_records)
+
+
+class _LoginError(Exception):
+    pass
+
+
+async def _buscar_op(op: str):
     print(f"[SCRAPER] Iniciando scraping da OP {op}...")
+    scraper = await asyncio.to_thread(get_scraper)
     try:
         await scraper.get_client()
     except Exception as e:
-        return {"ok": False, "erro": f"login failed: {e}"}
+        raise _LoginError(e) from e
+    return await scraper.get_orders_by_code(op)
+
+
+order_cache = OrderCache(
+    _buscar_op,
+    ttl=ORDER_CACHE_TTL,
+    max_size=ORDER_CACHE_SIZE,
+    stale_while_revalidate=ORDER_CACHE_SWR,
+)
+
+metrics.counter_func(
+    "erp_logins_total", "Logins feitos no ERP.", lambda: _scraper.logins_total if _scraper is not None else 0
+)
+metrics.gauge_func(
+    "erp_sessao_autenticada",
+    "1 se a sessão do ERP está autenticada.",
+    lambda: int(_scraper is not None and _scraper.authenticated),
+)
+metrics.counter_func(
+    "op_cache_total",
+    "Consultas ao cache de OPs por resultado.",
+    lambda: {
+        ("hit",): order_cache.hits,
+        ("stale_hit",): order_cache.stale_hits,
+        ("miss",): order_cache.misses,
+        ("coalesced",): order_cache.coalesced,
+        ("error",): order_cache.errors,
+    },
+    ("resultado",),
+)
+metrics.gauge_func("op_cache_itens", "OPs no cache.", lambda: order_cache.stats()["size"])
+metrics.gauge_func("op_indice_itens", "OPs no índice local.", lambda: len(order_index))
+
+
+async def _iniciar_scraper() -> None:
+    """
+    Em segundo plano, depois do ingest: importa e cria o scraper, faz o
+    login inicial e segue com a sincronização periódica das OPs. Falha no
+    login não impede nada: as consultas tentam de novo (get_client()), e o
+    estado do /ready acompanha o resultado de cada sincronização.
+    """
+    scraper_estado["estado"] = "conectando"
+    try:
+        scraper = await asyncio.to_thread(get_scraper)
+        if not await asyncio.wait_for(scraper.login(), timeout=30):
+            # login() registra o motivo no log do scraper e devolve False
+            raise RuntimeError("login no ERP recusado ou ERP inacessível")
+        scraper_estado.update(estado="ok", erro=None)
+        print("[SCRAPER] Login inicial realizado com sucesso.")
+    except Exception as e:
+        scraper_estado.update(estado="falhou", erro=str(e) or type(e).__name__)
+        print(f"[SCRAPER] Falha no login inicial: {e}")
+    _marcar_pronto("scraper")
+    await _sincronizar_ordens()
+
+
+async def _sincronizar_ordens() -> None:
+    """Percorre todas as páginas de OPs da janela e aplica só as diferenças ao índice local."""
+    scraper = await asyncio.to_thread(get_scraper)
+    while True:
+        ordens = []
+        completo = False
+        try:
+            for status in ORDER_SYNC_STATUSES:
+                async for pagina in scraper.iter_order_pages(status, ORDER_SYNC_PAGE_SIZE):
+                    ordens.extend(pagina)
+            completo = True
+        except Exception as e:
+            print(f"[SYNC] Falha na sincronização das OPs: {e}")
+            if not scraper.authenticated:
+                scraper_estado.update(estado="falhou", erro=str(e) or type(e).__name__)
+
+        if completo:
+            # get_client() refez o login que tinha falhado
+            scraper_estado.update(estado="ok", erro=None)
+
+        if ordens or completo:
+            # parcial: atualiza o que veio, mas não remove nada do índice
+            resultado = await asyncio.to_thread(order_index.apply_sync, ordens, completo)
+            print(
+                f"[SYNC] {resultado['seen']} OPs: +{resultado['added']} "
+                f"~{resultado['updated']} -{resultado['removed']}"
+            )
+        await asyncio.sleep(ORDER_SYNC_INTERVAL)
+
+
+def _op_local(op: str) -> dict | None:
+    """OP do índice local, no mesmo formato de get_orders_by_code; None se não estiver nele."""
+    order = order_index.get(int(op)) if op.isdigit() else None
+    return {str(order.code): order.to_dict()} if order is not None else None
+
+
+async def _consultar_op(op: str):
+    """Índice local primeiro; OPs fora dele vão ao ERP (via cache)."""
+    local = _op_local(op)
+    if local is not None:
+        return local
+    return await order_cache.get(op)
+
 
+async def scrape_task(op: str) -> dict:
     try:
-        data = await scraper.get_orders_by_code(op)
+        data = await _consultar_op(op)
         return {"ok": True, "data": data}
+    except _LoginError as e:
+        return {"ok": False, "erro": f"login failed: {e}"}
     except Exception as e:
         return {"ok": False, "erro": str(e)}
 
 
+@app.route("/scrape/cache")
+def scrape_cache_stats():
+    """Taxa de acerto e latências do cache de OPs."""
+    return jsonify(order_cache.stats())
+
+
+@app.route("/scrape/session")
+def scrape_session_stats():
+    """Estado da sessão autenticada no ERP e logins na última hora."""
+    return jsonify(get_scraper().stats())
+
+
+@app.route("/scrape/sync")
+def scrape_sync_stats():
+    """Tamanho do índice local de OPs e resultado da última sincronização."""
+    return jsonify(order_index.stats())
+
+
+@app.route("/progress")
+def progress():
+    """
+    Progresso das OPs: produzido x quantidade, ETA pela média móvel do tempo
+    por peça e risco frente à entrega. Filtros opcionais: ?produto= ou ?op=.
+    """
+    op = request.args.get("op")
+    if op:
+        if not op.isdigit():
+            return jsonify({"erro": f"OP inválida: {op}"}), 400
+        item = progress_tracker.order_progress(int(op))
+        if item is None:
+            return jsonify({"erro": f"OP {op} não está no índice local"}), 404
+        return jsonify(item)
+
+    produto = request.args.get("produto")
+    if produto:
+        item = progress_tracker.product_progress(produto)
+        if item is None:
+            return jsonify({"erro": f"nenhuma OP para o produto {produto}"}), 404
+        return jsonify(item)
+
+    return jsonify(progress_tracker.snapshot())
+
+
+@app.route("/scrape/batch", methods=["GET", "POST"])
+def scrape_batch():
+    """
+    Várias OPs num pedido: ?ops=1,2,3 ou POST {"ops": [...]}.
+    Responde NDJSON, uma linha {"op", "ok", "data" | "error"} por OP, na ordem
+    em que as consultas terminam; a falha de uma OP não interrompe as outras.
+    """
+    if request.method == "POST":
+        ops = (request.get_json(silent=True) or {}).get("ops") or []
+    else:
+        ops = request.args.get("ops", "").split(",")
+    ops = [str(op).strip() for op in ops if str(op).strip()]
+    if not ops:
+        return jsonify({"erro": "informe as OPs em 'ops'"}), 400
+    if len(ops) > SCRAPE_BATCH_MAX:
+        return jsonify({"erro": f"no máximo {SCRAPE_BATCH_MAX} OPs por pedido"}), 400
+
+    # ponte entre o gerador async (async_loop) e a resposta em streaming (thread do Flask)
+    fila: queue.Queue = queue.Queue()
+
+    async def produzir():
+        try:
+            # OPs do índice local respondem na hora; só as demais vão ao ERP
+            remotas = []
+            for op in dict.fromkeys(ops):
+                local = _op_local(op)
+                if local is None:
+                    remotas.append(op)
+                else:
+                    fila.put({"op": op, "ok": True, "data": local})
+            if remotas:
+                scraper = await asyncio.to_thread(get_scraper)
+                async for item in scraper.get_orders_batch(remotas, SCRAPE_BATCH_CONCURRENCY, fetch=order_cache.get):
+                    fila.put(item)
+        except Exception as e:
+            fila.put({"ok": False, "error": str(e)})
+        finally:
+            fila.put(None)
+
+    def gerar():
+        future = run_async(produzir())
+        try:
+            while True:
+                try:
+                    item = fila.get(timeout=SCRAPE_TIMEOUT)
+                except queue.Empty:
+                    yield app.json.dumps({"ok": False, "error": "timeout"}) + "\n"
+                    break
+                if item is None:
+                    break
+                yield app.json.dumps(item) + "\n"
+        finally:
+            # cliente desconectou ou terminou: cancela as consultas restantes
+            future.cancel()
+
+    return Response(gerar(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
 @app.route("/scrape/<op>")
 def scrape_op(op: str):
+    # OP já sincronizada: responde direto na thread do Flask, sem passar pelo loop async
+    local = _op_local(op)
+    if local is not None:
+        return jsonify({"op": op, "status": "concluido", "resultado": {"ok": True, "data": local}})
     try:
         future = run_async(scrape_task(op))
-        result = future.result(timeout=90)
+        result = future.result(timeout=SCRAPE_TIMEOUT)
         return jsonify({"op": op, "status": "concluido", "resultado": result})
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
@@ -349,32 +1485,93 @@ def scrape_op(op: str):
 if __name__ == "__main__":
     print("\n=== MONITOR LOGS INICIADO ===")
 
-    # inicia loop async em thread antes de qualquer run_async()
+    # loop async em thread; o TCP e o Flask sobem antes de qualquer carga:
+    # as estações conectam na hora e esperam em handle_client() até o ingest
+    # estar pronto, e o /ready responde 503 enquanto isso
     threading.Thread(target=start_async_loop, daemon=True).start()
-    time.sleep(0.05)
+    run_async(tcp_server())
+    threading.Thread(target=start_flask, daemon=True).start()
 
-    # Login inicial (mantém sessão pronta)
+    # importa os segmentos arquivados e o logs.txt existentes para o banco (só na primeira execução)
+    if cycle_store is not None:
+        try:
+            cycle_store.import_log_file(LOGS_PATH, segment_archive)
+        except Exception as e:
+            print(f"[DB] Falha ao importar {LOGS_PATH}: {e}")
+
+    # backend texto: carrega o histórico (segmentos + logs.txt) nas colunas em memória
+    if cycle_history is not None:
+        try:
+            cycle_history.add_records(_iter_registros_texto())
+            print(f"[HISTORY] {len(cycle_history)} ciclos em memória ({cycle_history.nbytes() / 1e6:.1f} MB)")
+        except Exception as e:
+            print(f"[HISTORY] Falha ao carregar o histórico: {e}")
+
+    # rollups vazios (primeira execução): agrega o histórico existente uma vez
     try:
-        fut_login = run_async(scraper.login())
-        fut_login.result(timeout=30)
-        print("[SCRAPER] Login inicial realizado com sucesso.")
+        if rollup_store.is_empty():
+            rollup_store.rebuild(
+                cycle_store.iter_records() if cycle_store is not None else _iter_registros_texto()
+            )
     except Exception as e:
-        print(f"[SCRAPER] Falha no login inicial: {e}")
+        print(f"[ROLLUPS] Falha ao reconstruir: {e}")
 
-    # inicia servidores
-    threading.Thread(target=tcp_server, daemon=True).start()
-    threading.Thread(target=start_flask, daemon=True).start()
+    # peças já produzidas dentro da janela das OPs (o escritor soma as novas)
+    try:
+        desde = datetime.datetime.combine(
+            datetime.date.today() - datetime.timedelta(days=ORDER_SYNC_PAST_DAYS), datetime.time()
+        )
+        progress_tracker.add_records(
+            cycle_store.iter_records(inicio=desde.strftime("%Y-%m-%d %H:%M:%S"))
+            if cycle_store is not None
+            else _iter_registros_texto(inicio=desde)
+        )
+    except Exception as e:
+        print(f"[PROGRESS] Falha ao carregar a produção recente: {e}")
+
+    # compacta segmentos que ficaram pendentes numa execução anterior
+    threading.Thread(target=segment_archive.compact_pending, daemon=True).start()
+
+    # (device, seq) já gravados: reenvios feitos logo após um restart não duplicam.
+    # sqlite: dos últimos ciclos do banco; texto: dos segmentos desde ontem + logs.txt
+    try:
+        if cycle_store is not None:
+            n = seq_tracker.carregar(cycle_store.iter_origens(SEQ_CARREGAR_ULTIMOS))
+        else:
+            ontem = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=1), datetime.time())
+            n = seq_tracker.carregar(
+                (r.device, r.seq, r.epoch) for r in _iter_registros_texto(inicio=ontem) if r.device is not None
+            )
+        if not n and LOGS_PATH.exists():
+            # banco de antes das colunas device/seq
+            with open(LOGS_PATH, encoding="utf-8", errors="replace") as f:
+                n = seq_tracker.carregar_linhas(f)
+        if n:
+            print(f"[TCP] {n} registros com seq já gravados ({len(seq_tracker.stats()['dispositivos'])} estações)")
+    except Exception as e:
+        print(f"[TCP] Falha ao carregar os seqs gravados: {e}")
+
+    # escritor em lote precisa estar ativo antes de receber registros
+    log_writer.start()
+    async_loop.call_soon_threadsafe(ingest_pronto.set)
+    _marcar_pronto("ingest")
+
+    run_async(monitor_loop_lag(m_loop_lag, m_loop_lag_ultimo, LOOP_LAG_INTERVAL))
+    # login e sincronização das OPs em segundo plano (import do scraper incluso)
+    run_async(_iniciar_scraper())
 
     try:
         while True:
             time.sleep(0.5)
     except KeyboardInterrupt:
         print("\n[MAIN] Encerrando...\n")
-        try:
-            fut = run_async(scraper.close())
-            fut.result(timeout=5)
-        except Exception:
-            pass
+        if _scraper is not None:
+            try:
+                fut = run_async(_scraper.close())
+                fut.result(timeout=5)
+            except Exception:
+                pass
         async_loop.call_soon_threadsafe(async_loop.stop)
+        log_writer.stop()
 
     print("[MAIN] Encerrado.")
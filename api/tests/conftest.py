@@ -0,0 +1,37 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# core.logger cria tmp/logs (e abre o app.log) no diretório atual ao ser
+# importado: importa numa pasta temporária para os testes não sujarem a api/
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="time-sensor-tests-"))
+try:
+    import core.logger  # noqa: F401
+finally:
+    os.chdir(_cwd)
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    """
+    main.py carregado de uma cópia numa pasta temporária: o BASE_DIR (e
+    com ele tmp/, o banco e o logs.txt) fica fora da api/. O escritor em
+    lote roda como no start; o Flask só pelo test_client() e sem o scraper.
+    """
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(API_DIR / "main.py", tmp_path / "main.py")
+    spec = importlib.util.spec_from_file_location("main_teste", tmp_path / "main.py")
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    modulo.log_writer.start()
+    yield modulo
+    modulo.log_writer.stop()
+    if modulo.cycle_store is not None:
+        modulo.cycle_store.close()
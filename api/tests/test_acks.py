@@ -0,0 +1,81 @@
+"""ACK cumulativo por (device, seq)."""
+
+import asyncio
+
+from core.acks import NACK, enviar_acks
+
+
+class _Writer:
+    def __init__(self):
+        self.enviado = b""
+        self.fechado = False
+
+    def write(self, dados: bytes) -> None:
+        self.enviado += dados
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.fechado = True
+
+
+def _responder(itens) -> _Writer:
+    """Roda enviar_acks com a fila já montada (futures resolvidos antes)."""
+
+    async def rodar():
+        loop = asyncio.get_running_loop()
+        pendentes: asyncio.Queue = asyncio.Queue()
+        for item in itens:
+            if item is None:
+                pendentes.put_nowait(None)
+                continue
+            estado, device, seq = item
+            if estado == "ok":
+                fut = loop.create_future()
+                fut.set_result(None)
+            elif estado == "erro":
+                fut = loop.create_future()
+                fut.set_exception(OSError("disco cheio"))
+            else:
+                fut = estado
+            pendentes.put_nowait((fut, device, seq))
+        writer = _Writer()
+        await enviar_acks(writer, pendentes)
+        return writer
+
+    return asyncio.run(rodar())
+
+
+def test_ack_cumulativo_do_lote():
+    w = _responder([("ok", "esp-aa", 1), ("ok", "esp-aa", 2), ("ok", "esp-aa", 3), None])
+    assert w.enviado == b"ACK esp-aa 3\n"
+
+
+def test_seqs_fora_de_ordem_no_lote_nao_voltam_o_ack():
+    w = _responder([("ok", "esp-aa", 4), ("ok", "esp-aa", 2), None])
+    assert w.enviado == b"ACK esp-aa 4\n"
+
+
+def test_ack_nao_volta_entre_lotes():
+    # o duplicado (None) de seq menor depois de um lote já confirmado
+    w = _responder([("ok", "esp-aa", 5), ("ok", "esp-bb", 1), (None, "esp-aa", 3), None])
+    assert w.enviado == b"ACK esp-aa 5\nACK esp-bb 1\nACK esp-aa 5\n"
+
+
+def test_falha_na_gravacao_fecha_sem_ack():
+    w = _responder([("ok", "esp-aa", 1), ("erro", "esp-aa", 2), ("ok", "esp-aa", 3), None])
+    assert w.enviado == b"ACK esp-aa 1\n"
+    assert w.fechado
+
+
+def test_nack():
+    w = _responder([("ok", "esp-aa", 1), (NACK, "esp-aa", 2), None])
+    assert w.enviado == b"ACK esp-aa 1\nNACK esp-aa 2\n"
+    assert w.fechado
+
+
+def test_formato_antigo():
+    w = _responder([("ok", None, None), ("erro", None, None), (NACK, None, None), ("ok", None, None), None])
+    assert w.enviado == b"OKNACKOK"
+    assert not w.fechado
@@ -0,0 +1,40 @@
+"""Configs: o reload passa pela mesma normalização do primeiro load."""
+
+import json
+import os
+
+from core.configs import Configs
+
+
+def _escrever(path, data: dict, mtime_ns: int) -> None:
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reload_normaliza_operadores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    arquivo = tmp_path / "configs.json"
+    _escrever(arquivo, {"username": "a", "password": "b", "operators": ["Ana"]}, 1_000_000_000)
+
+    configs = Configs()
+    assert configs.operators == [{"name": "Ana"}]
+
+    # arquivo editado à mão, sem a chave operators
+    _escrever(arquivo, {"username": "c", "password": "d"}, 2_000_000_000)
+    assert configs.reload_if_changed()
+    assert configs.operators == []
+    assert configs.username == "c"
+
+    _escrever(arquivo, {"username": "c", "password": "d", "operators": ["Bia", {"name": "Caio"}]}, 3_000_000_000)
+    assert configs.reload_if_changed()
+    assert configs.operators == [{"name": "Bia"}, {"name": "Caio"}]
+    assert json.loads(arquivo.read_text(encoding="utf-8"))["operators"] == [{"name": "Bia"}, {"name": "Caio"}]
+    assert not configs.reload_if_changed()
+
+
+def test_arquivo_novo_tem_operadores_vazios(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    configs = Configs()
+    assert configs.operators == []
+    configs.add_operator("Ana")
+    assert Configs().operators == [{"name": "Ana"}]
@@ -0,0 +1,56 @@
+"""CycleHistory: colunas em ordem cronológica com registros atrasados."""
+
+import datetime
+import json
+
+from core.cycle_history import CycleHistory
+from core.log_parser import CycleRecord
+from core.utils.time_utils import epoch_seconds
+
+BASE = datetime.datetime(2025, 1, 2, 8, 0, 0)
+
+
+def _registro(segundos: int, total: int, produto: str = "TKC110") -> CycleRecord:
+    dt = BASE + datetime.timedelta(seconds=segundos)
+    return CycleRecord(dt.strftime("%Y-%m-%d %H:%M:%S"), dt, produto, total, 0, total, 1)
+
+
+def _totais(h: CycleHistory, produto: str = "TKC110", inicio=None, fim=None) -> list[int]:
+    with h.window(produto, inicio, fim) as views:
+        return [t for v in views for t in v.tempo_total]
+
+
+def test_registro_atrasado_entra_na_posicao():
+    h = CycleHistory()
+    h.add_records([_registro(0, 1), _registro(10, 2), _registro(20, 3)])
+    h.add_records([_registro(5, 10), _registro(30, 4), _registro(-5, 0)])
+    assert _totais(h) == [0, 1, 10, 2, 3, 4]
+    with h.window("TKC110") as views:
+        epochs = list(views[0].epoch)
+    assert epochs == sorted(epochs)
+
+
+def test_atrasado_do_mesmo_segundo_fica_depois():
+    h = CycleHistory()
+    h.add_records([_registro(0, 1), _registro(10, 2), _registro(20, 3)])
+    h.add_records([_registro(10, 9)])
+    assert _totais(h) == [1, 2, 9, 3]
+
+
+def test_janela_com_atrasados():
+    h = CycleHistory()
+    h.add_records([_registro(s, s) for s in range(0, 100, 10)])
+    h.add_records([_registro(45, 45)])
+    inicio = epoch_seconds(BASE + datetime.timedelta(seconds=40))
+    fim = epoch_seconds(BASE + datetime.timedelta(seconds=60))
+    assert _totais(h, inicio=inicio, fim=fim) == [40, 45, 50]
+
+
+def test_logs_json_do_mais_novo_ao_mais_antigo():
+    h = CycleHistory()
+    h.add_records([_registro(0, 1), _registro(20, 3), _registro(10, 2), _registro(0, 5, "XYZ")])
+    dados = json.loads(h.logs_json(limite=2))
+    assert [r["tempo_total"] for r in dados["TKC110"]["logs"]] == [3, 2]
+    assert dados["TKC110"]["media"] == 2
+    assert dados["XYZ"]["logs"][0]["data"] == "2025-01-02 08:00:00"
+    assert len(h) == 4
@@ -0,0 +1,57 @@
+"""CycleStore: importação única do histórico em texto."""
+
+import datetime
+
+import pytest
+
+from core.cycle_store import CycleStore
+from core.log_parser import parse_log_line
+from core.segments import SegmentArchive
+
+
+def _contar(store: CycleStore) -> int:
+    return store.connection().execute("SELECT COUNT(*) FROM ciclos").fetchone()[0]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CycleStore(tmp_path / "ciclos.db", parse_log_line)
+    yield store
+    store.close()
+
+
+def test_importa_segmentos_e_logs_uma_vez(tmp_path, store):
+    archive = SegmentArchive(tmp_path / "segments")
+    antigo = tmp_path / "antigo.txt"
+    antigo.write_text("2025-01-01 08:00:00 | TKC110;10;0;10;1\n", encoding="utf-8")
+    archive.rotate(str(antigo), datetime.date(2025, 1, 1))
+    logs = tmp_path / "logs.txt"
+    logs.write_text("2025-01-02 08:00:00 | TKC110;20;0;20;1\nlixo\n", encoding="utf-8")
+
+    assert store.import_log_file(logs, archive) == 2
+    assert store.import_log_file(logs, archive) == 0
+    assert [r["tempo_total"] for r in store.query()] == [10, 20]
+
+
+def test_falha_no_meio_nao_deixa_importacao_parcial(tmp_path, store, monkeypatch):
+    logs = tmp_path / "logs.txt"
+    logs.write_text("2025-01-02 08:00:00 | TKC110;20;0;20;1\n" * 3, encoding="utf-8")
+    monkeypatch.setattr("core.cycle_store._IMPORT_CHUNK", 1)
+
+    original = store.insert_lines
+    chamadas = []
+
+    def insert_lines(lines):
+        chamadas.append(lines)
+        if len(chamadas) == 2:
+            raise OSError("disco cheio")
+        return original(lines)
+
+    monkeypatch.setattr(store, "insert_lines", insert_lines)
+    with pytest.raises(OSError):
+        store.import_log_file(logs)
+    assert _contar(store) == 0
+
+    monkeypatch.setattr(store, "insert_lines", original)
+    assert store.import_log_file(logs) == 3
+    assert _contar(store) == 3
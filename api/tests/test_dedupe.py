@@ -0,0 +1,84 @@
+"""DeviceSeqTracker: reenvios, reinício da contagem e carga do que já foi gravado."""
+
+from core.cycle_store import CycleStore
+from core.dedupe import DeviceSeqTracker, parse_device_seq
+from core.log_parser import parse_log_line
+
+
+def test_reenvio_e_descartado():
+    t = DeviceSeqTracker()
+    assert [t.aceitar("esp-aa", s, 1000 + s) for s in (1, 2, 3)] == [True, True, True]
+    assert not t.aceitar("esp-aa", 2, 1002)
+    assert t.aceitar("esp-bb", 2, 1002)
+    assert (t.aceitos, t.duplicados) == (4, 1)
+
+
+def test_sem_epoch_vale_so_o_seq():
+    t = DeviceSeqTracker()
+    assert t.aceitar("esp-aa", 1)
+    assert not t.aceitar("esp-aa", 1, 5000)
+    assert t.aceitar("esp-aa", 2, 5000)
+    assert not t.aceitar("esp-aa", 2)
+
+
+def test_mesmo_seq_com_outro_epoch_reinicia_a_estacao():
+    t = DeviceSeqTracker()
+    for s in range(1, 501):
+        t.aceitar("esp-aa", s, 1000 + s)
+    # outbox reformatado: a contagem volta a 1 com capturas novas
+    assert t.aceitar("esp-aa", 1, 9001)
+    assert t.aceitar("esp-aa", 2, 9002)
+    assert not t.aceitar("esp-aa", 2, 9002)
+    assert t.reinicios == 1
+    assert t.stats()["dispositivos"]["esp-aa"] == 2
+
+
+def test_seq_abaixo_da_janela_reinicia_a_estacao():
+    t = DeviceSeqTracker(janela=100)
+    for s in range(1, 301):
+        t.aceitar("esp-aa", s)
+    assert not t.aceitar("esp-aa", 250)
+    assert t.aceitar("esp-aa", 5)
+    assert t.reinicios == 1
+
+
+def test_esquecer_deixa_o_reenvio_passar():
+    t = DeviceSeqTracker()
+    t.aceitar("esp-aa", 1, 1001)
+    t.esquecer("esp-aa", 1)
+    assert t.aceitar("esp-aa", 1, 1001)
+
+
+def test_vistos_limitados_pela_janela():
+    t = DeviceSeqTracker(janela=10)
+    for s in range(1, 1001):
+        t.aceitar("esp-aa", s)
+    assert len(t._dispositivos["esp-aa"].vistos) <= 21
+
+
+def test_parse_device_seq():
+    assert parse_device_seq("P;1;1;2;1") is None
+    assert parse_device_seq("2025-01-02 08:00:00 | P;1;1;2;1;esp-aa;7") == ("esp-aa", 7, None)
+    assert parse_device_seq("P;1;1;2;1;esp-aa;7;1700000000;850") == ("esp-aa", 7, 1700000000)
+    assert parse_device_seq("P;1;1;2;1;esp-aa;x") is None
+
+
+def test_carrega_do_banco(tmp_path):
+    store = CycleStore(tmp_path / "ciclos.db", parse_log_line)
+    store.insert_lines(
+        [
+            "2025-01-02 08:00:00 | P;1;1;2;1",
+            "2025-01-02 08:00:01 | P;1;1;2;1;esp-aa;1;1700000001;0;1000;0;1000",
+            "2025-01-02 08:00:02 | P;1;1;2;1;esp-aa;2;1700000002;0;1000;0;1000",
+            "2025-01-02 08:00:03 | P;1;1;2;1;esp-bb;9",
+        ]
+    )
+    t = DeviceSeqTracker()
+    assert t.carregar(store.iter_origens(1000)) == 3
+    assert list(store.iter_origens(1)) == [("esp-bb", 9, None)]
+    store.close()
+
+    assert (t.aceitos, t.reinicios) == (0, 0)
+    assert not t.aceitar("esp-aa", 2, 1700000002)
+    assert not t.aceitar("esp-bb", 9)
+    assert t.aceitar("esp-aa", 3, 1700000003)
@@ -0,0 +1,36 @@
+"""EventBroker: ids dos eventos e cliente lento."""
+
+from core.events import EventBroker, format_sse
+
+
+def test_format_sse_com_id():
+    assert format_sse("ciclo", {"a": 1}, id=7) == 'id: 7\nevent: ciclo\ndata: {"a":1}\n\n'
+    assert format_sse("ciclo", {"a": 1}) == 'event: ciclo\ndata: {"a":1}\n\n'
+
+
+def test_publish_entrega_id_e_mensagem():
+    broker = EventBroker()
+    q = broker.subscribe()
+    broker.publish("ciclo", {"a": 1}, id=3)
+
+    assert q.get_nowait() == (3, format_sse("ciclo", {"a": 1}, id=3))
+
+
+def test_cliente_lento_recebe_none():
+    broker = EventBroker(max_queue=1)
+    q = broker.subscribe()
+    broker.publish("ciclo", 1)
+    broker.publish("ciclo", 2)
+
+    assert q.get_nowait() is None
+    assert not broker.has_subscribers()
+
+
+def test_subscriber_count():
+    broker = EventBroker()
+    q = broker.subscribe()
+    broker.subscribe()
+    assert broker.subscriber_count() == 2
+
+    broker.unsubscribe(q)
+    assert broker.subscriber_count() == 1
@@ -0,0 +1,66 @@
+"""/export: CSV (sep), NDJSON e Parquet (501 sem o pyarrow)."""
+
+import io
+import json
+import sys
+
+import pytest
+
+LINHAS = [
+    "2025-01-02 08:00:00 | TKC110 002 002;120;15;135;1",
+    "2025-01-02 09:30:00 | TKC220;60;0;60;1",
+    "2025-01-03 10:00:00 | TKC110 002 002;90;5;95;1",
+]
+
+
+@pytest.fixture
+def cliente(main):
+    for linha in LINHAS:
+        main.salvar_log(linha).result(timeout=5)
+    return main.app.test_client()
+
+
+def test_csv_com_ponto_e_virgula(cliente):
+    r = cliente.get("/export?sep=;&product=TKC110 002 002")
+    assert r.status_code == 200
+    assert r.mimetype == "text/csv"
+    assert 'filename="ciclos_TKC110-002-002.csv"' in r.headers["Content-Disposition"]
+    assert r.get_data(as_text=True).splitlines() == [
+        "data;produto;tempo_producao;tempo_pausa;tempo_total;quantidade",
+        "2025-01-02 08:00:00;TKC110 002 002;120;15;135;1",
+        "2025-01-03 10:00:00;TKC110 002 002;90;5;95;1",
+    ]
+
+
+def test_csv_sep_invalido(cliente):
+    assert cliente.get("/export?sep=|").status_code == 400
+
+
+def test_ndjson_janela(cliente):
+    r = cliente.get("/export?format=ndjson&from=2025-01-02&to=2025-01-02 23:59:59")
+    assert r.status_code == 200
+    assert [json.loads(linha) for linha in r.get_data(as_text=True).splitlines()] == [
+        {"data": "2025-01-02 08:00:00", "produto": "TKC110 002 002", "tempo_producao": 120,
+         "tempo_pausa": 15, "tempo_total": 135, "quantidade": 1},
+        {"data": "2025-01-02 09:30:00", "produto": "TKC220", "tempo_producao": 60,
+         "tempo_pausa": 0, "tempo_total": 60, "quantidade": 1},
+    ]
+
+
+def test_parquet_sem_pyarrow_responde_501(cliente, monkeypatch):
+    # None em sys.modules faz o import falhar com ImportError
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    r = cliente.get("/export?format=parquet")
+    assert r.status_code == 501
+    assert "pyarrow" in r.get_json()["erro"]
+
+
+def test_parquet(cliente):
+    pq = pytest.importorskip("pyarrow.parquet")
+    r = cliente.get("/export?format=parquet&product=TKC220")
+    assert r.status_code == 200
+    tabela = pq.read_table(io.BytesIO(r.get_data()))
+    assert tabela.column_names == ["data", "produto", "tempo_producao", "tempo_pausa", "tempo_total", "quantidade"]
+    assert tabela.column("produto").to_pylist() == ["TKC220"]
+    assert tabela.column("tempo_total").to_pylist() == [60]
@@ -0,0 +1,72 @@
+"""extract_first_table devolve o mesmo que o caminho antigo com BeautifulSoup."""
+
+import pathlib
+
+import pytest
+
+from benchmarks.bench_html import extrair_bs4, extrair_rapido
+from core.html_table import EMPTY_RESULT_SENTINEL, extract_first_table
+
+AMOSTRA = pathlib.Path(__file__).parents[1] / "benchmarks" / "data" / "export_ordens.html"
+
+
+def _pagina(tabela: str, head: str = "") -> bytes:
+    return f"<html><head>{head}</head><body><div>menu</div>{tabela}</body></html>".encode()
+
+
+def test_pagina_de_exportacao_igual_ao_bs4():
+    raw = AMOSTRA.read_bytes()
+    linhas = extract_first_table(raw)
+    assert linhas == extrair_bs4(raw)
+    assert sum(1 for linha in linhas if linha) >= 100
+
+
+TABELAS = {
+    "celulas vazias": "<table><tr><th>OP</th><th>Qtd</th></tr><tr><td></td><td> 5 </td></tr></table>",
+    "linha curta": "<table><tbody><tr><td>OP1</td><td>10</td><td>x</td></tr><tr><td>OP2</td></tr></tbody></table>",
+    "entidades e tags": "<table><tr><td>A &amp; B</td><td><b>1</b>2&nbsp;</td></tr></table>",
+    "script com table": "<table><tr><td>OP1</td></tr></table>",
+    "sem tabela": "<p>nada</p>",
+}
+
+
+@pytest.mark.parametrize("nome", TABELAS)
+def test_tabelas_irregulares_iguais_ao_bs4(nome):
+    head = "<script>var s = '<table>';</script>" if nome == "script com table" else ""
+    raw = _pagina(TABELAS[nome], head)
+    assert extract_first_table(raw) == extrair_bs4(raw)
+
+
+def test_pagina_sem_resultado():
+    raw = _pagina(f"<p>{EMPTY_RESULT_SENTINEL}</p><table><tr><td>rodapé</td></tr></table>")
+    assert extrair_rapido(raw) is None
+    assert extrair_bs4(raw) is None
+
+
+def test_tabela_sem_fechar_mantem_o_que_leu():
+    raw = _pagina("<table><tr><td>OP1</td><td>10</td></tr><tr><td>OP2")
+    assert extract_first_table(raw) == [["OP1", "10"], ["OP2"]]
+
+
+# HTML malformado: o html.parser do bs4 aninha td/tr sem fechamento e repete
+# o texto nas células de fora; aqui cada célula aparece uma vez, como no navegador
+MALFORMADAS = {
+    "td sem fechar": (
+        "<table><tr><td>OP1<td>10</tr><tr><td>OP2<td>20</tr></table>",
+        [["OP1", "10"], ["OP2", "20"]],
+    ),
+    "tr sem fechar": (
+        "<table><tr><td>OP1</td><td>10</td><tr><td>OP2</td></table>",
+        [["OP1", "10"], ["OP2"]],
+    ),
+    "tabela aninhada": (
+        "<table><tr><td>OP1</td><td><table><tr><td>x</td></tr></table></td></tr></table>",
+        [["OP1", "x"]],
+    ),
+}
+
+
+@pytest.mark.parametrize("nome", MALFORMADAS)
+def test_tabelas_malformadas(nome):
+    tabela, esperado = MALFORMADAS[nome]
+    assert extract_first_table(_pagina(tabela)) == esperado
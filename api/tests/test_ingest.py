@@ -0,0 +1,145 @@
+"""Ingest TCP do main.py: handle_client() atendendo um cliente de verdade."""
+
+import asyncio
+
+import pytest
+
+from core.protocol import FrameRecord, encode_frame
+
+DEVICE = "esp-aabbccddeeff"
+
+
+def _rodar(main, cliente):
+    """Sobe o handle_client() numa porta livre e roda cliente(porta) contra ele."""
+
+    async def cenario():
+        main.ingest_pronto.set()
+        servidor = await asyncio.start_server(main.handle_client, "127.0.0.1", 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.wait_for(cliente(porta), 10)
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+
+    return asyncio.run(cenario())
+
+
+async def _esperar_ack(reader: asyncio.StreamReader, seq: int) -> list[bytes]:
+    """Linhas recebidas até o ACK cumulativo chegar a seq."""
+    linhas = []
+    while True:
+        linha = await reader.readline()
+        assert linha, f"conexão fechada antes do ACK {seq}: {linhas}"
+        linhas.append(linha)
+        if linha == f"ACK {DEVICE} {seq}\n".encode():
+            return linhas
+
+
+def _registro(seq: int, produto: str = "TKC110") -> FrameRecord:
+    return FrameRecord(seq, 0, 120_000, 15_000, 135_000, 1, 850, produto)
+
+
+def test_quadro_com_codigo_invalido_nao_trava_os_acks(main):
+    async def cliente(porta):
+        reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+        writer.write(encode_frame(DEVICE, [_registro(1), _registro(2, "P;2"), _registro(3)]))
+        writer.write(encode_frame(DEVICE, [_registro(4, "P\n")]))
+        writer.write(encode_frame(DEVICE, [_registro(5)]))
+        await writer.drain()
+        linhas = await _esperar_ack(reader, 5)
+        writer.close()
+        await writer.wait_closed()
+        return linhas
+
+    linhas = _rodar(main, cliente)
+    assert all(linha.startswith(f"ACK {DEVICE} ".encode()) for linha in linhas)
+    # os recusados são confirmados mas não gravados
+    assert [r.produto for r in main.cycle_store.iter_records()] == ["TKC110"] * 3
+    assert main.m_registros_recusados.value() == 2
+
+
+async def _fechada(reader: asyncio.StreamReader) -> bool:
+    """True se o servidor fechou (ou derrubou) a conexão."""
+    try:
+        return await asyncio.wait_for(reader.read(), 2) == b""
+    except ConnectionError:
+        return True
+
+
+def test_limite_por_ip_derruba_a_conexao_mais_antiga(main, monkeypatch):
+    monkeypatch.setattr(main, "TCP_MAX_CONEXOES_POR_IP", 1)
+
+    async def cliente(porta):
+        r1, w1 = await asyncio.open_connection("127.0.0.1", porta)
+        w1.write(b"TKC110;120;15;135;1\n")
+        assert await r1.readexactly(2) == b"OK"
+
+        r2, w2 = await asyncio.open_connection("127.0.0.1", porta)
+        w2.write(b"TKC110;120;15;135;1\n")
+        assert await r2.readexactly(2) == b"OK"
+        assert await _fechada(r1)
+        w1.close()
+        w2.close()
+
+    _rodar(main, cliente)
+    assert main.m_limites.value(limite="por_ip") == 1
+
+
+def test_limite_total_recusa_a_conexao_nova(main, monkeypatch):
+    monkeypatch.setattr(main, "TCP_MAX_CONEXOES", 1)
+    monkeypatch.setattr(main, "TCP_MAX_CONEXOES_POR_IP", 0)
+
+    async def cliente(porta):
+        r1, w1 = await asyncio.open_connection("127.0.0.1", porta)
+        w1.write(b"TKC110;120;15;135;1\n")
+        assert await r1.readexactly(2) == b"OK"
+
+        r2, w2 = await asyncio.open_connection("127.0.0.1", porta)
+        assert await _fechada(r2)
+        # a antiga continua atendida
+        w1.write(b"TKC110;120;15;135;1\n")
+        assert await r1.readexactly(2) == b"OK"
+        w1.close()
+        w2.close()
+
+    _rodar(main, cliente)
+    assert main.m_limites.value(limite="conexoes") == 1
+
+
+@pytest.fixture
+def sobrecarga(main, monkeypatch):
+    """Modo "nack" com a fila do escritor cheia enquanto cheia[0] for True."""
+    cheia = [True]
+    monkeypatch.setattr(main, "INGEST_SOBRECARGA", "nack")
+    monkeypatch.setattr(main, "_sobrecarregado", lambda: cheia[0])
+    return cheia
+
+
+def test_sobrecarga_nack_para_quadro(main, sobrecarga):
+    async def cliente(porta):
+        reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+        writer.write(encode_frame(DEVICE, [_registro(7), _registro(8)]))
+        resposta = await reader.readline()
+        assert await _fechada(reader)
+        writer.close()
+        return resposta
+
+    assert _rodar(main, cliente) == f"NACK {DEVICE} 7\n".encode()
+    assert list(main.cycle_store.iter_records()) == []
+
+
+def test_sobrecarga_atrasa_cliente_de_texto(main, sobrecarga):
+    async def cliente(porta):
+        reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+        writer.write(b"TKC110;120;15;135;1\n")
+        # sem seq o cliente não reenviaria: nada de NACK, só espera a fila
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(reader.readexactly(2), 0.3)
+        sobrecarga[0] = False
+        resposta = await reader.readexactly(2)
+        writer.close()
+        return resposta
+
+    assert _rodar(main, cliente) == b"OK"
+    assert [r.produto for r in main.cycle_store.iter_records()] == ["TKC110"]
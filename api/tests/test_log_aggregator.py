@@ -0,0 +1,26 @@
+"""LogAggregator: os registros mais novos por data, mesmo com atrasados."""
+
+from core.log_aggregator import LogAggregator
+from core.log_parser import parse_log_line
+
+
+def _horas(agg: LogAggregator, produto: str = "TKC110") -> list[str]:
+    return [r["datetime"][11:] for r in agg.snapshot()[produto]["logs"]]
+
+
+def test_registro_atrasado_nao_tira_um_mais_novo(tmp_path):
+    logs = tmp_path / "logs.txt"
+    logs.write_text(
+        "".join(f"2025-01-02 08:00:0{i} | TKC110;10;0;10;1\n" for i in range(3)),
+        encoding="utf-8",
+    )
+    agg = LogAggregator(logs, parse_log_line, max_logs=3)
+    agg.refresh()
+
+    with open(logs, "a", encoding="utf-8") as f:
+        f.write("2025-01-02 07:59:00 | TKC110;40;0;40;1\n")  # mais velho que todos
+        f.write("2025-01-02 08:00:01 | TKC110;70;0;70;1\n")  # atrasado, entra no meio
+    agg.refresh()
+
+    assert _horas(agg) == ["08:00:02", "08:00:01", "08:00:01"]
+    assert agg.media("TKC110") == 28
@@ -0,0 +1,59 @@
+"""parse_log_line (caminho rápido) devolve o mesmo que o parser antigo (tolerante)."""
+
+import pytest
+
+from core.log_parser import parse_log_line, parse_log_line_tolerant
+
+CAMPOS = ("data", "datetime", "produto", "tempo_producao", "tempo_pausa", "tempo_total", "quantidade")
+
+LINHAS = [
+    # formato exato
+    "2025-01-02 08:00:00 | TKC110 002 002;120;15;135;1",
+    "2025-12-31 23:59:59 | X;0;0;0;0",
+    # campos extras (seq/device e quadros binários)
+    "2025-01-02 08:00:00 | TKC110;120;15;135;1;esp-aabbcc;42;1735804800",
+    "2025-01-02 08:00:00 | TKC110;120;15;135;1;esp-aabbcc;42;0;850;120400;15200;135600",
+    # espaços a mais
+    "2025-01-02 08:00:00 |  TKC110 ; 120 ; 15 ; 135 ; 1 ",
+    "2025-01-02 08:00:00   |   TKC110;120;15;135;1",
+    "2025-01-02  08:00:00 | TKC110;120;15;135;1",
+    # separador colado (formato antigo)
+    "2025-01-02 08:00:00|TKC110;120;15;135;1",
+    "2025-01-02 08:00:00 |TKC110;120;15;135;1",
+    "2025-01-02 08:00:00| TKC110;120;15;135;1",
+    # hora sem zero à esquerda
+    "2025-01-02 8:00:00 | TKC110;120;15;135;1",
+    # campos faltando, vazios ou inválidos
+    "2025-01-02 08:00:00 | TKC110;120;15",
+    "2025-01-02 08:00:00 | TKC110;;;;",
+    "2025-01-02 08:00:00 | TKC110;abc;15;135;1",
+    "2025-01-02 08:00:00 | TKC110;120;15;xx;1",
+    "2025-01-02 08:00:00 | TKC110;120;15;135;um",
+    "2025-01-02 08:00:00 | ",
+    # malformadas
+    "",
+    "lixo",
+    "TKC110;120;15;135;1",
+    "2025-01-02 | TKC110;120;15;135;1",
+    "2025-13-02 08:00:00 | TKC110;120;15;135;1",
+    "2025-01-02 25:00:00 | TKC110;120;15;135;1",
+    "2025-01-02T08:00:00 | TKC110;120;15;135;1",
+    "2025/01/02 08:00:00 | TKC110;120;15;135;1",
+    "2025-01-02 08:00:0x | TKC110;120;15;135;1",
+]
+
+
+@pytest.mark.parametrize("linha", LINHAS)
+def test_caminho_rapido_igual_ao_antigo(linha):
+    antigo = parse_log_line_tolerant(linha)
+    novo = parse_log_line(linha)
+    if antigo is None:
+        assert novo is None
+    else:
+        assert novo is not None
+        assert {c: novo[c] for c in CAMPOS} == antigo
+
+
+def test_extras_so_no_caminho_rapido():
+    r = parse_log_line("2025-01-02 08:00:00 | TKC110;120;15;135;1;esp-aabbcc;42;0;850;120400;15200;135600")
+    assert (r.device, r.seq, r.epoch, r.tempos_ms) == ("esp-aabbcc", 42, None, (120400, 15200, 135600))
@@ -0,0 +1,161 @@
+"""BatchLogWriter: atomicidade do lote e caminhos de falha."""
+
+import datetime
+import os
+
+import pytest
+
+from core.cycle_store import CycleStore
+from core.log_parser import parse_log_line
+from core.log_writer import BatchLogWriter
+from core.rollups import RollupStore
+
+LINHAS = [
+    "2025-01-02 08:00:00 | TKC110;100;10;110;1",
+    "2025-01-02 08:00:05 | TKC110;120;0;120;1",
+]
+
+
+def _gravar(writer: BatchLogWriter, linhas: list[str]) -> list:
+    futs = [writer.submit(line) for line in linhas]
+    writer.stop()
+    return futs
+
+
+def _contagens(store: CycleStore) -> tuple[int, int]:
+    conn = store.connection()
+    ciclos = conn.execute("SELECT COUNT(*) FROM ciclos").fetchone()[0]
+    rollups = conn.execute("SELECT COUNT(*) FROM rollups").fetchone()[0]
+    return ciclos, rollups
+
+
+@pytest.fixture
+def stores(tmp_path):
+    store = CycleStore(tmp_path / "ciclos.db", parse_log_line)
+    rollups = RollupStore(tmp_path / "rollups.db", store=store)
+    yield store, rollups
+    store.close()
+
+
+def _writer(path, store, rollups, **kw) -> BatchLogWriter:
+    writer = BatchLogWriter(
+        path,
+        max_delay=0.01,
+        sinks=[store.insert_records, rollups.add_records],
+        transaction=store.transaction,
+        parse_line=parse_log_line,
+        **kw,
+    )
+    writer.start()
+    return writer
+
+
+def test_lote_gravado_no_banco_e_no_espelho(tmp_path, stores):
+    store, rollups = stores
+    logs = tmp_path / "logs.txt"
+    futs = _gravar(_writer(logs, store, rollups), LINHAS)
+
+    assert [f.exception(1) for f in futs] == [None, None]
+    assert _contagens(store) == (2, 3)
+    assert logs.read_text(encoding="utf-8").splitlines() == LINHAS
+
+
+def test_falha_num_sink_desfaz_o_lote_inteiro(tmp_path, stores):
+    store, rollups = stores
+
+    def falha(registros):
+        raise RuntimeError("disco cheio")
+
+    writer = _writer(tmp_path / "logs.txt", store, rollups)
+    writer.sinks.append(falha)
+    futs = _gravar(writer, LINHAS)
+
+    assert all(isinstance(f.exception(1), RuntimeError) for f in futs)
+    # ciclos e rollups gravados antes da falha voltam junto
+    assert _contagens(store) == (0, 0)
+    assert not (tmp_path / "logs.txt").exists()
+
+
+def test_falha_no_espelho_texto_nao_falha_o_ack(tmp_path, stores):
+    store, rollups = stores
+    # um diretório no lugar do logs.txt: open() falha
+    logs = tmp_path / "logs.txt"
+    logs.mkdir()
+    futs = _gravar(_writer(logs, store, rollups), LINHAS)
+
+    assert [f.exception(1) for f in futs] == [None, None]
+    assert _contagens(store) == (2, 3)
+
+
+def test_falha_em_mirror_e_listener_nao_falha_o_ack(tmp_path, stores):
+    store, rollups = stores
+
+    def falha(registros):
+        raise RuntimeError("boom")
+
+    writer = _writer(None, store, rollups, mirrors=[falha], listeners=[falha])
+    futs = _gravar(writer, LINHAS)
+
+    assert [f.exception(1) for f in futs] == [None, None]
+    assert writer.seq == 2
+
+
+def test_backend_texto_falha_na_gravacao_falha_os_futures(tmp_path):
+    logs = tmp_path / "logs.txt"
+    logs.mkdir()
+    recebidos = []
+    writer = BatchLogWriter(logs, max_delay=0.01, mirrors=[recebidos.extend], parse_line=parse_log_line)
+    writer.start()
+    futs = _gravar(writer, LINHAS)
+
+    assert all(isinstance(f.exception(1), OSError) for f in futs)
+    # nada gravado: os derivados não veem o lote
+    assert recebidos == []
+    assert writer.seq == 0
+
+
+def test_backend_texto_abre_o_arquivo_uma_vez(tmp_path, monkeypatch):
+    abertos = []
+
+    def abrir(*args, **kwargs):
+        f = open(*args, **kwargs)
+        abertos.append(f)
+        return f
+
+    monkeypatch.setattr("core.log_writer.open", abrir, raising=False)
+    logs = tmp_path / "logs.txt"
+    writer = BatchLogWriter(logs, max_delay=0.01, parse_line=parse_log_line)
+    writer.start()
+    for line in LINHAS * 3:
+        writer.submit(line).result(1)
+    writer.stop()
+
+    assert len(abertos) == 1
+    assert abertos[0].closed
+    assert logs.read_text(encoding="utf-8").splitlines() == LINHAS * 3
+
+
+def test_rotaciona_arquivo_de_outro_dia(tmp_path):
+    logs = tmp_path / "logs.txt"
+    logs.write_text(LINHAS[0] + "\n", encoding="utf-8")
+    os.utime(logs, (0, 86400 * 365))
+    rotacionados = []
+    writer = BatchLogWriter(
+        logs, max_delay=0.01, parse_line=parse_log_line, rotate=lambda path, dia: rotacionados.append(dia)
+    )
+    writer.start()
+    _gravar(writer, LINHAS[1:])
+
+    assert rotacionados == [datetime.date.fromtimestamp(86400 * 365)]
+
+
+def test_snapshot_devolve_o_seq_do_que_ja_foi_gravado(tmp_path, stores):
+    store, rollups = stores
+    writer = _writer(tmp_path / "logs.txt", store, rollups)
+    for f in [writer.submit(line) for line in LINHAS]:
+        f.result(1)
+
+    seq, ciclos = writer.snapshot(lambda: _contagens(store)[0])
+    writer.stop()
+
+    assert (seq, ciclos) == (2, 2)
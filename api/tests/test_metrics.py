@@ -0,0 +1,27 @@
+"""Métricas: limite de valores distintos por rótulo nos contadores."""
+
+from core.metrics import OUTRO, MetricsRegistry
+
+
+def test_valores_alem_do_limite_viram_outro():
+    registro = MetricsRegistry("t_")
+    c = registro.counter("recebidos_total", "x", ("device", "produto"), max_valores=2)
+    c.inc(device="a", produto="P1")
+    c.inc(device="b", produto="P2")
+    c.inc(device="c", produto="P1")
+    c.inc(device="a", produto="P3")
+
+    assert c.value(device="a", produto="P1") == 1
+    assert c.value(device=OUTRO, produto="P1") == 1
+    assert c.value(device="a", produto=OUTRO) == 1
+    # consultar um valor novo não ocupa vaga
+    assert c.value(device="z", produto="P9") == 0
+    assert c.value(device=OUTRO, produto=OUTRO) == 0
+    assert len(c.render().splitlines()) == 2 + 4
+
+
+def test_sem_limite():
+    c = MetricsRegistry("t_").counter("recebidos_total", "x", ("produto",))
+    for i in range(500):
+        c.inc(produto=f"P{i}")
+    assert c.value(produto="P499") == 1
@@ -0,0 +1,124 @@
+"""OrderCache: TTL, LRU, coalescência e stale-while-revalidate."""
+
+import asyncio
+
+import pytest
+
+from core.order_cache import OrderCache
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+class Fetcher:
+    """Fetch falso: conta chamadas por OP e pode segurar a resposta até `liberar`."""
+
+    def __init__(self):
+        self.chamadas: dict[str, int] = {}
+        self.liberar: asyncio.Event | None = None
+        self.falhar = False
+
+    async def __call__(self, code: str):
+        n = self.chamadas[code] = self.chamadas.get(code, 0) + 1
+        if self.liberar is not None:
+            await self.liberar.wait()
+        if self.falhar:
+            raise RuntimeError("ERP fora")
+        return f"{code}#{n}"
+
+
+def test_ttl_expira():
+    async def rodar():
+        relogio, fetch = Relogio(), Fetcher()
+        cache = OrderCache(fetch, ttl=60, clock=relogio)
+        assert await cache.get("OP1") == "OP1#1"
+        relogio.agora += 59
+        assert await cache.get("OP1") == "OP1#1"
+        relogio.agora += 1
+        assert await cache.get("OP1") == "OP1#2"
+        return cache.stats()
+
+    stats = asyncio.run(rodar())
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_lru_descarta_o_menos_usado():
+    async def rodar():
+        fetch = Fetcher()
+        cache = OrderCache(fetch, max_size=2, clock=Relogio())
+        await cache.get("OP1")
+        await cache.get("OP2")
+        await cache.get("OP1")  # OP2 vira o menos usado
+        await cache.get("OP3")
+        await cache.get("OP1")
+        await cache.get("OP2")
+        return fetch.chamadas, cache.stats()["size"]
+
+    chamadas, tamanho = asyncio.run(rodar())
+    assert chamadas == {"OP1": 1, "OP2": 2, "OP3": 1}
+    assert tamanho == 2
+
+
+def test_buscas_simultaneas_compartilham_o_fetch():
+    async def rodar():
+        fetch = Fetcher()
+        fetch.liberar = asyncio.Event()
+        cache = OrderCache(fetch, clock=Relogio())
+        tarefas = [asyncio.create_task(cache.get("OP1")) for _ in range(5)]
+        await asyncio.sleep(0)
+        fetch.liberar.set()
+        return await asyncio.gather(*tarefas), fetch.chamadas, cache.stats()
+
+    valores, chamadas, stats = asyncio.run(rodar())
+    assert valores == ["OP1#1"] * 5
+    assert chamadas == {"OP1": 1}
+    assert (stats["misses"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_cancelar_um_chamador_nao_cancela_o_fetch():
+    async def rodar():
+        fetch = Fetcher()
+        fetch.liberar = asyncio.Event()
+        cache = OrderCache(fetch, clock=Relogio())
+        primeiro = asyncio.create_task(cache.get("OP1"))
+        segundo = asyncio.create_task(cache.get("OP1"))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+        fetch.liberar.set()
+        return await segundo
+
+    assert asyncio.run(rodar()) == "OP1#1"
+
+
+def test_stale_while_revalidate_devolve_o_antigo_e_atualiza():
+    async def rodar():
+        relogio, fetch = Relogio(), Fetcher()
+        cache = OrderCache(fetch, ttl=60, stale_while_revalidate=True, clock=relogio)
+        await cache.get("OP1")
+        relogio.agora += 120
+        antigo = await cache.get("OP1")
+        await asyncio.sleep(0)  # refresh em segundo plano termina
+        novo = await cache.get("OP1")
+        return antigo, novo, cache.stats()
+
+    antigo, novo, stats = asyncio.run(rodar())
+    assert (antigo, novo) == ("OP1#1", "OP1#2")
+    assert (stats["stale_hits"], stats["hits"]) == (1, 1)
+
+
+def test_erro_nao_fica_em_cache():
+    async def rodar():
+        fetch = Fetcher()
+        fetch.falhar = True
+        cache = OrderCache(fetch, clock=Relogio())
+        with pytest.raises(RuntimeError):
+            await cache.get("OP1")
+        fetch.falhar = False
+        return await cache.get("OP1"), cache.stats()["errors"]
+
+    assert asyncio.run(rodar()) == ("OP1#2", 1)
@@ -0,0 +1,73 @@
+"""OrderIndex.apply_sync: diferenças, remoções e página vazia."""
+
+from datetime import datetime
+
+import pytest
+
+from core.order_index import OrderIndex
+from core.orders import Order
+
+
+def _ordem(code: int, product: str = "TKC110", quantity: int = 10, status: str | None = "1") -> Order:
+    return Order(datetime(2025, 1, 10 + code % 10), code, product, f"OP {code}", quantity, status)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return OrderIndex(tmp_path / "ordens.db")
+
+
+def test_sync_completo_aplica_so_as_diferencas(index):
+    index.apply_sync([_ordem(1), _ordem(2), _ordem(3)])
+    r = index.apply_sync([_ordem(1), _ordem(2, quantity=20), _ordem(4, "XYZ")])
+    assert (r["seen"], r["added"], r["updated"], r["removed"]) == (3, 1, 1, 1)
+    assert index.get(3) is None
+    assert [o.code for o in index.by_product("TKC110")] == [1, 2]
+
+
+def test_sync_parcial_nao_remove(index):
+    index.apply_sync([_ordem(1), _ordem(2)])
+    r = index.apply_sync([_ordem(1, quantity=5)], complete=False)
+    assert r["removed"] == 0
+    assert len(index) == 2
+
+
+def test_pagina_vazia_nao_apaga_o_indice(index, tmp_path):
+    index.apply_sync([_ordem(1), _ordem(2)])
+    r = index.apply_sync([], complete=True)
+    assert (r["removed"], r["complete"]) == (0, False)
+    assert len(index) == 2
+    # nem no banco
+    assert len(OrderIndex(tmp_path / "ordens.db")) == 2
+
+
+def test_indice_vazio_aceita_sync_vazio(index):
+    r = index.apply_sync([], complete=True)
+    assert (r["seen"], r["complete"]) == (0, True)
+
+
+def test_status_persistido(index, tmp_path):
+    index.apply_sync([_ordem(1, status="2")])
+    assert OrderIndex(tmp_path / "ordens.db").get(1).status == "2"
+    # mudança de status conta como atualização
+    assert index.apply_sync([_ordem(1, status="1")])["updated"] == 1
+
+
+def test_listeners_recebem_os_produtos_alterados(index):
+    recebidos = []
+    index.listeners.append(recebidos.append)
+    index.apply_sync([_ordem(1), _ordem(2, "XYZ")])
+    index.apply_sync([_ordem(1)])
+    assert recebidos == [{"TKC110", "XYZ"}, {"XYZ"}]
+
+
+def test_ordem_repetida_entre_passadas_conta_uma_vez(index):
+    resultado = index.apply_sync([_ordem(1, status="1"), _ordem(2), _ordem(1, status="2")])
+    assert (resultado["seen"], resultado["added"], resultado["updated"]) == (2, 2, 0)
+    assert index.get(1).status == "2"
+    assert len(index) == 2
+
+
+def test_to_dict_sem_status():
+    # /scrape/<op> devolve o mesmo formato de antes do índice
+    assert "status" not in _ordem(1).to_dict()
@@ -0,0 +1,45 @@
+"""AuthOnCM.iter_order_pages: página de erro x listagem vazia."""
+
+import asyncio
+import pathlib
+
+import pytest
+
+from core.html_table import EMPTY_RESULT_SENTINEL
+from core.session_manager import AuthOnCM
+
+EXPORT = pathlib.Path(__file__).parent.parent / "benchmarks" / "data" / "export_ordens.html"
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    # configs.json é criado no diretório atual
+    monkeypatch.chdir(tmp_path)
+    return AuthOnCM(str(tmp_path))
+
+
+def _paginas(scraper: AuthOnCM, corpo: bytes, status: str = "1") -> list:
+    async def fetch_page(path, params=None):
+        return corpo, "utf-8"
+
+    async def ler():
+        return [o async for pagina in scraper.iter_order_pages(status, page_size=10_000) for o in pagina]
+
+    scraper.fetch_page = fetch_page
+    return asyncio.run(ler())
+
+
+def test_ordens_marcadas_com_o_status(scraper):
+    ordens = _paginas(scraper, EXPORT.read_bytes(), status="2")
+    assert ordens
+    assert {o.status for o in ordens} == {"2"}
+
+
+def test_listagem_vazia_do_erp(scraper):
+    corpo = f"<html><body><p>{EMPTY_RESULT_SENTINEL}</p></body></html>".encode()
+    assert _paginas(scraper, corpo) == []
+
+
+def test_pagina_sem_tabela_e_erro(scraper):
+    with pytest.raises(RuntimeError, match="no order table"):
+        _paginas(scraper, b"<html><body>Erro interno</body></html>")
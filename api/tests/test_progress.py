@@ -0,0 +1,104 @@
+"""ProgressTracker: alocação FIFO das peças às OPs abertas."""
+
+import datetime
+
+import pytest
+
+from core.log_parser import CycleRecord
+from core.order_index import OrderIndex
+from core.orders import Order
+from core.progress import ProgressTracker
+
+
+def _ordem(code: int, dias: int, quantity: int, status: str | None = "1") -> Order:
+    entrega = datetime.datetime.combine(datetime.date.today(), datetime.time()) + datetime.timedelta(days=dias)
+    return Order(entrega, code, "TKC110", f"OP {code}", quantity, status)
+
+
+def _ciclos(n: int, tempo_total: int = 60) -> list[CycleRecord]:
+    agora = datetime.datetime.now().replace(microsecond=0)
+    data = agora.strftime("%Y-%m-%d %H:%M:%S")
+    return [CycleRecord(data, agora, "TKC110", tempo_total, 0, tempo_total, 1) for _ in range(n)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return OrderIndex(tmp_path / "ordens.db")
+
+
+def _alocacao(tracker: ProgressTracker) -> list[tuple[int, int, int]]:
+    return [(o["op"], o["produzido"], o["restante"]) for o in tracker.product_progress("TKC110")["ordens"]]
+
+
+def test_fifo_pela_entrega(index):
+    index.apply_sync([_ordem(2, dias=5, quantity=10), _ordem(1, dias=2, quantity=4)])
+    tracker = ProgressTracker(index)
+    tracker.add_records(_ciclos(7))
+    assert _alocacao(tracker) == [(1, 4, 0), (2, 3, 7)]
+    assert tracker.product_progress("TKC110")["excedente"] == 0
+
+
+def test_excedente_alem_das_ops(index):
+    index.apply_sync([_ordem(1, dias=2, quantity=3)])
+    tracker = ProgressTracker(index)
+    tracker.add_records(_ciclos(5))
+    p = tracker.product_progress("TKC110")
+    assert (p["ordens"][0]["risco"], p["excedente"]) == ("concluida", 2)
+
+
+def test_ops_fechadas_nao_recebem_pecas(index):
+    index.apply_sync(
+        [
+            _ordem(1, dias=-3, quantity=10, status="3"),
+            _ordem(2, dias=1, quantity=10, status=None),
+            _ordem(3, dias=4, quantity=10, status="2"),
+        ]
+    )
+    tracker = ProgressTracker(index)
+    tracker.add_records(_ciclos(6))
+    assert _alocacao(tracker) == [(3, 6, 4)]
+    assert tracker.order_progress(1) is None
+
+
+def test_sync_atualiza_as_ops(index):
+    index.apply_sync([_ordem(1, dias=2, quantity=4), _ordem(2, dias=5, quantity=10)])
+    tracker = ProgressTracker(index)
+    tracker.add_records(_ciclos(6))
+    # OP 1 saiu das abertas (finalizada no ERP): o próximo sync não a traz mais,
+    # e as 4 peças dela não passam para a OP 2
+    index.apply_sync([_ordem(2, dias=5, quantity=10)])
+    assert _alocacao(tracker) == [(2, 2, 8)]
+    tracker.add_records(_ciclos(3))
+    assert _alocacao(tracker) == [(2, 5, 5)]
+    assert tracker.product_progress("TKC110")["produzido"] == 9
+
+
+def test_op_reaberta_volta_a_receber_pecas(index):
+    index.apply_sync([_ordem(1, dias=2, quantity=4), _ordem(2, dias=5, quantity=10)])
+    tracker = ProgressTracker(index)
+    tracker.add_records(_ciclos(6))
+    index.apply_sync([_ordem(1, dias=2, quantity=4, status="3"), _ordem(2, dias=5, quantity=10)])
+    assert _alocacao(tracker) == [(2, 2, 8)]
+    index.apply_sync([_ordem(1, dias=2, quantity=4), _ordem(2, dias=5, quantity=10)])
+    assert _alocacao(tracker) == [(1, 4, 0), (2, 2, 8)]
+
+
+def test_credito_sai_com_a_janela(index):
+    index.apply_sync([_ordem(1, dias=2, quantity=4), _ordem(2, dias=5, quantity=10)])
+    tracker = ProgressTracker(index, desde_dias=30)
+    tracker.add_records(_ciclos(6))
+    index.apply_sync([_ordem(2, dias=5, quantity=10)])
+    # 31 dias depois: produção e crédito da OP 1 já saíram da janela
+    tracker.desde_dias = -1
+    assert _alocacao(tracker) == [(2, 0, 10)]
+    assert tracker.product_progress("TKC110")["excedente"] == 0
+
+
+def test_eta_acumula_na_ordem_da_fila(index):
+    index.apply_sync([_ordem(1, dias=2, quantity=2), _ordem(2, dias=5, quantity=3)])
+    tracker = ProgressTracker(index)
+    tracker.add_records(_ciclos(1, tempo_total=3600))
+    ordens = tracker.product_progress("TKC110")["ordens"]
+    eta1, eta2 = (datetime.datetime.fromisoformat(o["eta"]) for o in ordens)
+    # OP 1: 1 peça restante; OP 2: espera a OP 1 e mais 3 peças
+    assert round((eta2 - eta1).total_seconds()) == 3 * 3600
@@ -0,0 +1,166 @@
+"""Quadro binário v1: parse, validação dos campos e crc."""
+
+import struct
+import zlib
+
+import pytest
+
+from core.cycle_store import CycleStore
+from core.log_parser import parse_log_line
+from core.protocol import (
+    CABECALHO,
+    CRC,
+    MAGIC,
+    REGISTRO,
+    VERSAO,
+    FrameChecksumError,
+    FrameContentError,
+    FrameError,
+    FrameRecord,
+    encode_frame,
+    has_control_chars,
+    is_frame_start,
+    parse_frame,
+    to_log_fields,
+)
+
+
+def _registro(seq: int = 1, produto: str = "TKC110 002 002") -> FrameRecord:
+    return FrameRecord(seq, 1_700_000_000, 120_000, 15_000, 135_000, 1, 850, produto)
+
+
+def _quadro_cru(device: bytes, codigos: list[bytes]) -> bytes:
+    """Quadro montado à mão (sem a validação do encode_frame), com crc correto."""
+    corpo = bytes([len(device)]) + device
+    for i, codigo in enumerate(codigos):
+        corpo += REGISTRO.pack(i, 0, 1000, 0, 1000, 1, 0, len(codigo)) + codigo
+    quadro = CABECALHO.pack(MAGIC, VERSAO, len(codigos), len(corpo)) + corpo
+    return quadro + CRC.pack(zlib.crc32(quadro))
+
+
+def test_ida_e_volta():
+    registros = [_registro(1), _registro(2, "Peça Ç")]
+    device, lidos = parse_frame(encode_frame("esp-aabbccddeeff", registros))
+    assert device == "esp-aabbccddeeff"
+    assert lidos == registros
+
+
+def test_crc_errado():
+    quadro = bytearray(encode_frame("esp-aa", [_registro()]))
+    quadro[-5] ^= 0xFF
+    with pytest.raises(FrameChecksumError):
+        parse_frame(quadro)
+
+
+@pytest.mark.parametrize(
+    "quadro",
+    [
+        b"",
+        MAGIC + bytes([VERSAO]),
+        encode_frame("esp-aa", [_registro()])[:-1],
+        encode_frame("esp-aa", [_registro()]) + b"\x00",
+    ],
+)
+def test_tamanho_invalido(quadro):
+    with pytest.raises(FrameError):
+        parse_frame(quadro)
+
+
+def test_versao_desconhecida():
+    quadro = bytearray(encode_frame("esp-aa", [_registro()]))
+    quadro[2] = VERSAO + 1
+    with pytest.raises(FrameError):
+        parse_frame(bytes(quadro))
+
+
+def test_nregistros_maior_que_o_corpo():
+    quadro = _quadro_cru(b"esp-aa", [b"P"])
+    cabecalho = CABECALHO.pack(MAGIC, VERSAO, 2, struct.unpack_from("<H", quadro, 4)[0])
+    corpo = cabecalho + quadro[CABECALHO.size : -CRC.size]
+    with pytest.raises(FrameError, match="truncado"):
+        parse_frame(corpo + CRC.pack(zlib.crc32(corpo)))
+
+
+@pytest.mark.parametrize(
+    "codigo",
+    [
+        b"P\n2020-01-01 00:00:00 | EVIL;1;1;2;1",
+        b"P\r",
+        b"P;1",
+        b"P|Q",
+        b"P\x00",
+        "P\u0085".encode(),
+        b"\xff\xfe",
+        b"",
+        b"   ",
+        b"P" * 65,
+    ],
+)
+def test_codigo_invalido(codigo):
+    with pytest.raises(FrameError):
+        parse_frame(_quadro_cru(b"esp-aa", [codigo]))
+
+
+def test_codigo_invalido_recusa_so_o_registro():
+    with pytest.raises(FrameContentError) as exc:
+        parse_frame(_quadro_cru(b"esp-aa", [b"P1", b"P;2", b"P3", b"\xff"]))
+    e = exc.value
+    assert e.device == "esp-aa"
+    assert [r.seq for r in e.registros] == [0, 1, 2, 3]
+    assert [r.produto for i, r in enumerate(e.registros) if i not in e.recusados] == ["P1", "P3"]
+    assert e.recusados == {1, 3}
+
+
+def test_quadro_estrutural_nao_e_recusa_de_registro():
+    # device inválido: nada a confirmar, o quadro inteiro é recusado
+    with pytest.raises(FrameError) as exc:
+        parse_frame(_quadro_cru(b"esp;aa", [b"P;1"]))
+    assert not isinstance(exc.value, FrameContentError)
+
+
+@pytest.mark.parametrize("device", [b"esp aa", b"esp;aa", b"esp|aa", b"esp\n", b"esp-\xc3\xa9", b"", b"e" * 33])
+def test_device_invalido(device):
+    with pytest.raises(FrameError):
+        parse_frame(_quadro_cru(device, [b"P"]))
+
+
+def test_has_control_chars():
+    assert has_control_chars("P;1;1;2;1\r2020-01-01 00:00:00 | EVIL")
+    assert not has_control_chars("TKC110 002 002;120;15;135;1")
+
+
+def test_to_log_fields_leva_os_ms():
+    r = _registro(7)._replace(tempo_producao_ms=120_999)
+    assert to_log_fields("esp-aa", r) == (
+        "TKC110 002 002;120;15;135;1;esp-aa;7;1700000000;850;120999;15000;135000"
+    )
+    registro = parse_log_line("2025-01-02 08:00:00 | " + to_log_fields("esp-aa", r))
+    assert (registro.tempo_producao, registro.tempos_ms) == (120, (120_999, 15_000, 135_000))
+
+
+def test_cycle_store_guarda_os_ms(tmp_path):
+    store = CycleStore(tmp_path / "ciclos.db", parse_log_line)
+    store.insert_lines(
+        [
+            "2025-01-02 08:00:00 | " + to_log_fields("esp-aa", _registro()._replace(tempo_total_ms=135_450)),
+            "2025-01-02 08:00:05 | TKC110 002 002;120;15;135;1",
+        ]
+    )
+    rows = store.connection().execute("SELECT tempo_total, tempo_total_ms FROM ciclos ORDER BY id").fetchall()
+    store.close()
+    assert rows == [(135, 135_450), (135, None)]
+
+
+@pytest.mark.parametrize(
+    "inicio, quadro",
+    [
+        (MAGIC + bytes([VERSAO]), True),
+        ("Š".encode(), False),
+        ("ŠKC;1;1;2;1\n".encode(), False),
+        (MAGIC + bytes([VERSAO + 1]), False),
+        (MAGIC[:1], False),
+        (b"TKC", False),
+    ],
+)
+def test_is_frame_start(inicio, quadro):
+    assert is_frame_start(inicio) is quadro
@@ -0,0 +1,90 @@
+"""RollupStore: baldes minuto/hora/dia incrementais, consulta e reconstrução."""
+
+import datetime
+
+import pytest
+
+from core.cycle_store import CycleStore
+from core.log_parser import parse_log_line
+from core.rollups import RollupStore
+from core.utils.time_utils import epoch_seconds
+
+LINHAS = [
+    "2025-01-02 08:00:10 | TKC110;100;10;110;1",
+    "2025-01-02 08:00:50 | TKC110;80;0;80;1",
+    "2025-01-02 08:01:05 | TKC110;120;30;150;1",
+    "2025-01-02 09:30:00 | ABC;50;0;50;1",
+]
+
+
+def _registros(linhas: list[str]) -> list:
+    return [parse_log_line(line) for line in linhas]
+
+
+def _epoch(texto: str) -> int:
+    return epoch_seconds(datetime.datetime.fromisoformat(texto))
+
+
+@pytest.fixture
+def rollups(tmp_path):
+    return RollupStore(tmp_path / "rollups.db")
+
+
+def test_baldes_por_granularidade(rollups):
+    rollups.add_records(_registros(LINHAS))
+
+    minutos = rollups.query("minute", "TKC110")["TKC110"]
+    assert [(b["inicio"], b["ciclos"], b["tempo_total"]) for b in minutos] == [
+        ("2025-01-02T08:00:00", 2, 190),
+        ("2025-01-02T08:01:00", 1, 150),
+    ]
+    assert (minutos[0]["min_total"], minutos[0]["max_total"], minutos[0]["media"]) == (80, 110, 95)
+
+    horas = rollups.query("hour")
+    assert [(b["inicio"], b["ciclos"]) for b in horas["TKC110"]] == [("2025-01-02T08:00:00", 3)]
+    assert [(b["inicio"], b["ciclos"]) for b in horas["ABC"]] == [("2025-01-02T09:00:00", 1)]
+
+    dia = rollups.query("day", "TKC110")["TKC110"][0]
+    assert (dia["ciclos"], dia["tempo_producao"], dia["tempo_pausa"], dia["tempo_total"]) == (3, 300, 40, 340)
+
+
+def test_lotes_somam_no_mesmo_balde(rollups):
+    rollups.add_records(_registros(LINHAS[:1]))
+    rollups.add_records(_registros(LINHAS[1:2]))
+
+    balde = rollups.query("minute", "TKC110")["TKC110"][0]
+    assert (balde["ciclos"], balde["tempo_total"], balde["min_total"], balde["max_total"]) == (2, 190, 80, 110)
+
+
+def test_consulta_por_intervalo_inclui_o_balde_do_inicio(rollups):
+    rollups.add_records(_registros(LINHAS))
+
+    # início no meio do balde das 08:00: o balde entra inteiro; fim é exclusivo
+    r = rollups.query("minute", inicio=_epoch("2025-01-02 08:00:30"), fim=_epoch("2025-01-02 08:01:00"))
+    assert [b["inicio"] for b in r["TKC110"]] == ["2025-01-02T08:00:00"]
+    assert "ABC" not in r
+
+    with pytest.raises(ValueError):
+        rollups.query("week")
+
+
+def test_rebuild_recria_os_baldes(rollups):
+    rollups.add_records(_registros(LINHAS))
+    assert not rollups.is_empty()
+
+    assert rollups.rebuild(_registros(LINHAS[3:])) == 1
+    assert list(rollups.query("day")) == ["ABC"]
+
+
+def test_store_compartilhado_entra_na_transacao_dos_ciclos(tmp_path):
+    store = CycleStore(tmp_path / "ciclos.db", parse_log_line)
+    rollups = RollupStore(tmp_path / "ignorado.db", store=store)
+    try:
+        with pytest.raises(RuntimeError):
+            with store.transaction():
+                rollups.add_records(_registros(LINHAS))
+                raise RuntimeError("falha no lote")
+        assert rollups.is_empty()
+        assert not (tmp_path / "ignorado.db").exists()
+    finally:
+        store.close()
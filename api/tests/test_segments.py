@@ -0,0 +1,111 @@
+"""SegmentArchive: rotação, compactação em gzip, índice e leitura por intervalo."""
+
+import datetime
+import gzip
+import json
+import threading
+import types
+
+import pytest
+
+from core.segments import SegmentArchive
+
+
+class _ThreadNaHora:
+    """Roda o alvo no start(): a compactação agendada pelo rotate() termina antes do assert."""
+
+    def __init__(self, target, args=(), daemon=None):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.target(*self.args)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr("core.segments.threading", types.SimpleNamespace(Thread=_ThreadNaHora, Lock=threading.Lock))
+    return SegmentArchive(tmp_path / "segments")
+
+
+def _rotacionar(archive: SegmentArchive, tmp_path, dia: str, linhas: list[str]) -> str:
+    ativo = tmp_path / "logs.txt"
+    ativo.write_text("".join(line + "\n" for line in linhas), encoding="utf-8")
+    return archive.rotate(str(ativo), datetime.date.fromisoformat(dia))
+
+
+DIA1 = [
+    "2025-01-01 08:00:00 | TKC110;10;0;10;1",
+    "2025-01-01 09:00:00 | ABC;20;5;25;1",
+    "2025-01-01 10:00:00 | TKC110;30;0;30;1",
+    "linha inválida",
+]
+DIA2 = [
+    "2025-01-02 08:00:00 | TKC110;40;0;40;1",
+    "2025-01-02 09:00:00 | ABC;50;0;50;1",
+]
+
+
+def test_rotacao_compacta_e_indexa(archive, tmp_path):
+    destino = _rotacionar(archive, tmp_path, "2025-01-01", DIA1)
+    base = destino[: -len(".txt")]
+
+    assert not (tmp_path / "logs.txt").exists()
+    with open(base + ".idx.json", encoding="utf-8") as f:
+        indice = json.load(f)
+    assert (indice["ciclos"], indice["inicio"], indice["fim"]) == (3, "2025-01-01 08:00:00", "2025-01-01 10:00:00")
+    tkc = indice["produtos"]["TKC110"]
+    assert (tkc["ciclos"], tkc["soma_total"]) == (2, 40)
+    assert indice["invalidas"]["linhas"] == 1
+
+    # membros concatenados continuam um .gz válido, e cada membro abre sozinho pelo offset
+    with gzip.open(base + ".txt.gz", "rt", encoding="utf-8") as f:
+        assert sorted(f.read().splitlines()) == sorted(DIA1)
+    with open(base + ".txt.gz", "rb") as f:
+        f.seek(tkc["offset"])
+        membro = gzip.decompress(f.read(tkc["tamanho"])).decode("utf-8").splitlines()
+    assert membro == [DIA1[0], DIA1[2]]
+
+
+def test_mesmo_dia_rotacionado_duas_vezes_nao_sobrescreve(archive, tmp_path):
+    primeiro = _rotacionar(archive, tmp_path, "2025-01-01", DIA1[:1])
+    segundo = _rotacionar(archive, tmp_path, "2025-01-01", DIA1[1:2])
+
+    assert primeiro != segundo
+    assert archive.product_totals() == {"TKC110": [10, 1], "ABC": [25, 1]}
+
+
+def test_arquivo_vazio_nao_rotaciona(archive, tmp_path):
+    assert _rotacionar(archive, tmp_path, "2025-01-01", []) is None
+    assert archive.segments() == []
+
+
+def test_leitura_por_intervalo_atravessa_segmentos(archive, tmp_path):
+    _rotacionar(archive, tmp_path, "2025-01-01", DIA1)
+    _rotacionar(archive, tmp_path, "2025-01-02", DIA2)
+
+    todos = [r.data for r in archive.iter_records()]
+    assert todos == sorted(todos) and len(todos) == 5
+
+    janela = archive.iter_records(inicio="2025-01-01 09:00:00", fim="2025-01-02 09:00:00")
+    assert [(r.data, r.produto) for r in janela] == [
+        ("2025-01-01 09:00:00", "ABC"),
+        ("2025-01-01 10:00:00", "TKC110"),
+        ("2025-01-02 08:00:00", "TKC110"),
+    ]
+    assert [r.tempo_total for r in archive.iter_records("ABC")] == [25, 50]
+    assert [r.tempo_total for r in archive.recent_records("TKC110", 2)] == [30, 40]
+
+
+def test_segmento_pendente_e_lido_e_compactado_depois(tmp_path):
+    # sem a compactação síncrona: simula um segmento que ficou só em .txt
+    archive = SegmentArchive(tmp_path / "segments")
+    (tmp_path / "segments" / "logs-2025-01-01.txt").write_text("\n".join(DIA1) + "\n", encoding="utf-8")
+
+    assert archive.segments()[0][1] is None
+    assert [r.tempo_total for r in archive.iter_records("TKC110")] == [10, 30]
+
+    archive.compact_pending()
+    (base, indice), = archive.segments()
+    assert indice is not None and indice["ciclos"] == 3
+    assert [r.tempo_total for r in archive.iter_records("TKC110")] == [10, 30]
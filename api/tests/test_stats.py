@@ -0,0 +1,68 @@
+"""/stats: colunas do banco e alinhamento dos baldes."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+from core.cycle_store import CycleStore
+from core.log_parser import parse_log_line
+from core.stats import columns_from_chunks, columns_from_rows, compute_stats
+from core.utils.time_utils import epoch_seconds
+
+LINHAS = [
+    "2025-01-02 08:20:00 | TKC110;100;10;110;1",
+    "2025-01-02 08:40:00 | ABC;50;0;50;1",
+    "2025-01-02 09:10:00 | TKC110;120;0;120;1",
+    "2025-01-02 10:05:00 | TKC110;90;30;120;1",
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CycleStore(tmp_path / "ciclos.db", parse_log_line)
+    store.insert_lines(LINHAS)
+    yield store
+    store.close()
+
+
+def _por_produto(cols) -> dict[str, list[tuple]]:
+    grupos: dict[str, list[tuple]] = {}
+    for e, c, tp, pausa, total in zip(cols.epoch, cols.produto, cols.tempo_producao, cols.tempo_pausa, cols.tempo_total):
+        grupos.setdefault(cols.produtos[c], []).append((int(e), int(tp), int(pausa), int(total)))
+    return grupos
+
+
+def test_colunas_do_banco_iguais_as_das_tuplas(store):
+    do_banco = columns_from_chunks(*store.iter_numeric_chunks(chunk=2))
+    das_tuplas = columns_from_rows(store.iter_rows(epoch=True))
+
+    assert do_banco.epoch.dtype == np.int64
+    assert _por_produto(do_banco) == _por_produto(das_tuplas)
+
+
+def test_colunas_do_banco_com_filtro(store):
+    cols = columns_from_chunks(*store.iter_numeric_chunks("TKC110", "2025-01-02 09:00:00"))
+    assert cols.produtos == ["TKC110"]
+    assert cols.tempo_total.tolist() == [120, 120]
+
+    vazio = columns_from_chunks(*store.iter_numeric_chunks("NENHUM"))
+    assert len(vazio) == 0
+
+
+def test_baldes_sem_from_comecam_na_virada_da_hora(store):
+    cols = columns_from_chunks(*store.iter_numeric_chunks())
+    r = compute_stats(cols, bucket="hour")
+
+    assert r["janela"]["buckets"] == ["2025-01-02T08:00:00", "2025-01-02T09:00:00", "2025-01-02T10:00:00"]
+    assert r["produtos"]["TKC110"]["serie"] == [1, 1, 1]
+    assert r["produtos"]["ABC"]["serie"] == [1, 0, 0]
+
+
+def test_baldes_por_dia_sem_from():
+    inicio = epoch_seconds(datetime.datetime(2025, 1, 2, 8, 20))
+    cols = columns_from_rows([(inicio, "TKC110", 10, 0, 10), (inicio + 86400, "TKC110", 10, 0, 10)])
+    r = compute_stats(cols, bucket="day")
+
+    assert r["janela"]["buckets"] == ["2025-01-02T00:00:00", "2025-01-03T00:00:00"]
+    assert r["produtos"]["TKC110"]["serie"] == [1, 1]
@@ -12,146 +12,221 @@
 // tempo mínimo para enviar (só envia se for maior que isso)
 const int TEMPO_LIMITE = 5;
 
-// Flags e variáveis internas
-bool ultimoEstado = false;
-bool bipFeito = false;
+// entrada só muda depois de ficar estável por esse tempo (ms)
+const unsigned long DEBOUNCE_MS = 30;
+// duração do bip de início de ciclo (ms)
+const unsigned long BIP_MS = 1000;
+// período do pisca da pausa (ms)
+const unsigned long PISCA_MS = 300;
+// intervalo mínimo entre linhas de debug no Serial (ms)
+const unsigned long DEBUG_MS = 1000;
+
+// ======================================================
+//  ENTRADAS (interrupção + debounce)
+// ======================================================
+// A ISR só anota quando a entrada mexeu; o loop() lê o nível depois de
+// DEBOUNCE_MS sem bordas e usa o instante da borda como hora da mudança,
+// então o tempo medido não depende de quanto a passada do loop demorou.
+
+struct Entrada
+{
+    uint8_t pino;
+    volatile unsigned long ultimaBorda;
+    bool ativa;             // nível estável (LOW = ativa)
+    unsigned long mudouEm; // millis() da última mudança estável
+};
 
-unsigned long lastBlink = 0;
-bool blinkState = false;
+static Entrada chave = {SWITCH_PIN, 0, false, 0};
+static Entrada pausa = {PAUSE_PIN, 0, false, 0};
 
-unsigned long producaoStart = 0;
-unsigned long pausaStart = 0;
+void IRAM_ATTR isrChave() { chave.ultimaBorda = millis(); }
+void IRAM_ATTR isrPausa() { pausa.ultimaBorda = millis(); }
 
-unsigned long tempoProducao = 0;
-unsigned long tempoPausa = 0;
+// true se o nível estável mudou
+static bool lerEntrada(Entrada &e, unsigned long agora)
+{
+    unsigned long borda = e.ultimaBorda;
+    if (agora - borda < DEBOUNCE_MS)
+        return false;
+
+    bool ativa = (digitalRead(e.pino) == LOW);
+    if (ativa == e.ativa)
+        return false;
+
+    e.ativa = ativa;
+    // sem borda registrada (ex.: nível já ativo no boot) vale o instante da leitura
+    e.mudouEm = (borda != 0 && agora - borda < 1000) ? borda : agora;
+    return true;
+}
 
-void setup()
+// ======================================================
+//  MÁQUINA DE ESTADOS DO CICLO
+// ======================================================
+
+enum Estado
 {
-    Serial.begin(115200);
+    DESLIGADO, // chave desligada, LED vermelho
+    PRODUCAO,  // chave ligada, LED verde
+    PAUSA      // chave ligada + pausa, LED piscando
+};
 
-    ledsInit(LED_R, LED_G);
-    pinMode(PAUSE_PIN, INPUT_PULLUP);
-    pinMode(SWITCH_PIN, INPUT_PULLUP);
-    pinMode(BUZZER_PIN, OUTPUT);
+static Estado estado = DESLIGADO;
+static unsigned long inicioEstado = 0;
 
-    networkInit("", "", "", 5050);
+static unsigned long tempoProducao = 0;
+static unsigned long tempoPausa = 0;
+
+// maior intervalo entre duas passadas do loop() no ciclo atual (us):
+// quanto uma mudança de entrada pode ter esperado para ser vista.
+// Vai junto com o ciclo para o servidor.
+static unsigned long loopMaxUs = 0;
+static unsigned long ultimaPassadaUs = 0;
+
+// buzzer e LED guiados pelo millis(), sem delay()
+static bool buzzerLigado = false;
+static unsigned long buzzerInicio = 0;
+static unsigned long lastBlink = 0;
+static bool blinkState = false;
+
+static unsigned long lastDebug = 0;
+
+static void bip(unsigned long agora)
+{
+    digitalWrite(BUZZER_PIN, HIGH);
+    buzzerLigado = true;
+    buzzerInicio = agora;
 }
 
-void loop()
+static void finalizarCiclo()
 {
-    bool ativo = (digitalRead(SWITCH_PIN) == LOW);           // sensor ativo
-    bool pausePressionado = (digitalRead(PAUSE_PIN) == LOW); // botão de pausa
+    unsigned long tempoTotal = tempoProducao + tempoPausa;
 
-    // ======================================================
-    //  SENSOR DESATIVADO → FINALIZA CICLO E ENVIA TEMPOS
-    // ======================================================
-    if (!ativo)
+    if (tempoTotal > TEMPO_LIMITE * 1000)
     {
-        setRGB(1, 0); // LED vermelho
+        // entrega para a task de rede (outbox na flash); não espera a rede
+        if (!sendData("TKC110 002 002",
+                      tempoProducao,
+                      tempoPausa,
+                      tempoTotal,
+                      1,
+                      loopMaxUs))
+            Serial.println("[CICLO] Fila cheia, ciclo perdido!");
+        else
+            Serial.printf("[CICLO] %lus (pausa %lus), loop max %lu us\n",
+                          tempoTotal / 1000, tempoPausa / 1000, loopMaxUs);
+    }
 
-        // Finaliza tempos se estavam rolando
-        if (producaoStart > 0)
-            tempoProducao += (millis() - producaoStart);
+    tempoProducao = 0;
+    tempoPausa = 0;
+}
 
-        if (pausaStart > 0)
-            tempoPausa += (millis() - pausaStart);
+static void mudarEstado(Estado novo, unsigned long quando)
+{
+    if (novo == estado)
+        return;
+    // bordas quase simultâneas: nunca antes da transição anterior
+    if ((long)(quando - inicioEstado) < 0)
+        quando = inicioEstado;
 
-        unsigned long tempoTotal = tempoProducao + tempoPausa;
+    // fecha o tempo do estado que terminou
+    if (estado == PRODUCAO)
+        tempoProducao += quando - inicioEstado;
+    else if (estado == PAUSA)
+        tempoPausa += quando - inicioEstado;
 
-        if (tempoTotal > TEMPO_LIMITE * 1000)
-        {
-            // ======================================================
-            //  ENVIO COM VALIDAÇÃO DE CONEXÃO (não perde log)
-            // ======================================================
-            sendData(
-                "TKC110 002 002",
-                tempoProducao / 1000,
-                tempoPausa / 1000,
-                tempoTotal / 1000,
-                1
-            );
-            // O sendData() já:
-            // - verifica WiFi
-            // - verifica socket
-            // - reconecta automaticamente se falhar
-            // - tenta reenviar se for necessário
-        }
+    if (novo == DESLIGADO)
+    {
+        finalizarCiclo();
+    }
+    else if (estado == DESLIGADO)
+    {
+        // início de ciclo
+        bip(quando);
+        loopMaxUs = 0;
+    }
 
-        // Reset das variáveis
-        producaoStart = 0;
-        pausaStart = 0;
-        tempoProducao = 0;
-        tempoPausa = 0;
-        bipFeito = false;
-        ultimoEstado = false;
+    estado = novo;
+    inicioEstado = quando;
+}
 
-        return;
+static void atualizarSaidas(unsigned long agora)
+{
+    if (buzzerLigado && agora - buzzerInicio >= BIP_MS)
+    {
+        digitalWrite(BUZZER_PIN, LOW);
+        buzzerLigado = false;
     }
 
-    // ======================================================
-    //  ATIVO + PAUSE → PISCAR LED E CONTAR PAUSA
-    // ======================================================
-    if (pausePressionado)
+    switch (estado)
     {
-        // Pausa produção
-        if (producaoStart > 0)
-        {
-            tempoProducao += (millis() - producaoStart);
-            producaoStart = 0;
-        }
-
-        // Inicia pausa
-        if (pausaStart == 0)
-            pausaStart = millis();
-
+    case DESLIGADO:
+        setRGB(1, 0); // LED vermelho
+        break;
+    case PRODUCAO:
+        setRGB(0, 1); // LED verde
+        break;
+    case PAUSA:
         // Piscar LED vermelho / verde
-        if (millis() - lastBlink >= 300)
+        if (agora - lastBlink >= PISCA_MS)
         {
-            lastBlink = millis();
+            lastBlink = agora;
             blinkState = !blinkState;
-
-            if (blinkState)
-                setRGB(1, 0);
-            else
-                setRGB(0, 1);
+            setRGB(blinkState, !blinkState);
         }
+        break;
+    }
+}
 
+static void debug(unsigned long agora)
+{
+    if (estado == DESLIGADO || agora - lastDebug < DEBUG_MS)
         return;
-    }
+    lastDebug = agora;
 
-    // ======================================================
-    //  ATIVO SEM PAUSE → CONTAGEM DE PRODUÇÃO
-    // ======================================================
+    unsigned long prod = tempoProducao + (estado == PRODUCAO ? agora - inicioEstado : 0);
+    unsigned long pau = tempoPausa + (estado == PAUSA ? agora - inicioEstado : 0);
+    Serial.printf("Produção: %lus | Pausa: %lus | loop max %lu us\n", prod / 1000, pau / 1000, loopMaxUs);
+}
 
-    setRGB(0, 1); // LED verde
+void setup()
+{
+    Serial.begin(115200);
 
-    // Parar contagem de pausa se estava pausado
-    if (pausaStart > 0)
-    {
-        tempoPausa += (millis() - pausaStart);
-        pausaStart = 0;
-    }
+    ledsInit(LED_R, LED_G);
+    pinMode(PAUSE_PIN, INPUT_PULLUP);
+    pinMode(SWITCH_PIN, INPUT_PULLUP);
+    pinMode(BUZZER_PIN, OUTPUT);
+
+    attachInterrupt(digitalPinToInterrupt(SWITCH_PIN), isrChave, CHANGE);
+    attachInterrupt(digitalPinToInterrupt(PAUSE_PIN), isrPausa, CHANGE);
 
-    // Inicia contagem de produção
-    if (producaoStart == 0)
-        producaoStart = millis();
+    // não bloqueia: WiFi, TCP e outbox ficam na task de rede
+    networkInit("", "", "", 5050);
+}
 
-    // ---------- BIP NA TRANSIÇÃO ----------
-    if (ativo && !ultimoEstado && !bipFeito)
+void loop()
+{
+    unsigned long agoraUs = micros();
+    if (estado != DESLIGADO && ultimaPassadaUs != 0 && agoraUs - ultimaPassadaUs > loopMaxUs)
+        loopMaxUs = agoraUs - ultimaPassadaUs;
+    ultimaPassadaUs = agoraUs;
+
+    unsigned long agora = millis();
+
+    bool mudouChave = lerEntrada(chave, agora);
+    bool mudouPausa = lerEntrada(pausa, agora);
+
+    if (mudouChave || mudouPausa)
     {
-        digitalWrite(BUZZER_PIN, HIGH);
-        delay(1000);
-        digitalWrite(BUZZER_PIN, LOW);
+        // a transição vale a partir da borda mais recente
+        unsigned long quando = chave.mudouEm;
+        if (mudouPausa && (!mudouChave || (long)(pausa.mudouEm - quando) > 0))
+            quando = pausa.mudouEm;
 
-        bipFeito = true;
+        Estado novo = !chave.ativa ? DESLIGADO : (pausa.ativa ? PAUSA : PRODUCAO);
+        mudarEstado(novo, quando);
     }
 
-    ultimoEstado = true;
-
-    // Debug
-    Serial.print("Produção: ");
-    Serial.print((tempoProducao + (producaoStart ? millis() - producaoStart : 0)) / 1000);
-    Serial.print("s | Pausa: ");
-    Serial.print((tempoPausa + (pausaStart ? millis() - pausaStart : 0)) / 1000);
-    Serial.println("s");
+    atualizarSaidas(agora);
+    debug(agora);
 }
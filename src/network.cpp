@@ -1,12 +1,49 @@
 #include <Arduino.h>
 #include <WiFi.h>
+#include <time.h>
 #include "network.h"
+#include "outbox.h"
+#include "protocol.h"
+
+// a rede roda numa task própria: reconexões e escritas no socket não travam o loop()
+static TaskHandle_t taskRede = nullptr;
+// ciclos do loop() para a task de rede, que os grava no outbox
+static QueueHandle_t filaCiclos = nullptr;
 
 static WiFiClient client;
 static String _serverIP;
 static int _serverPort;
 
+// identificação da estação no servidor (deduplicação por device + seq)
+static char deviceId[20];
+
 unsigned long lastReconnectAttempt = 0;
+unsigned long lastWiFiAttempt = 0;
+
+// envio do outbox: registros do índice tail até enviadoAte já foram escritos no socket
+static uint32_t enviadoAte = 0;
+static unsigned long lastAckMs = 0;
+static bool relogioConfigurado = false;
+
+// servidor sobrecarregado (NACK): não reconecta antes disso
+static unsigned long esperaAte = 0;
+
+// resposta do servidor ("ACK <device> <seq>\n" ou "NACK <device> <seq>\n")
+static char ackBuf[48];
+static size_t ackLen = 0;
+
+// quantos ciclos sem ACK podem estar em trânsito
+const uint32_t LOTE_ENVIO = 20;
+// sem ACK nesse tempo -> reenvia a partir do mais antigo pendente
+const unsigned long ACK_TIMEOUT = 5000;
+// depois de um NACK (servidor sobrecarregado) espera isso antes de reenviar
+const unsigned long NACK_ESPERA = 5000;
+// ciclos aguardando a task de rede gravar no outbox
+const int FILA_CICLOS = 32;
+// intervalo entre passadas da task de rede
+const TickType_t REDE_INTERVALO = pdMS_TO_TICKS(10);
+
+static void networkTask(void *);
 
 // ------------------------
 //  Iniciar WiFi
@@ -16,18 +53,18 @@ void networkInit(const char *ssid, const char *pass, const char *serverIP, int p
     _serverIP = serverIP;
     _serverPort = port;
 
+    snprintf(deviceId, sizeof(deviceId), "esp-%012llx", ESP.getEfuseMac());
+    outboxInit();
+    enviadoAte = outboxTail();
+
+    // não espera a conexão: os ciclos ficam no outbox até a rede voltar
     Serial.println("[WiFi] Conectando...");
     WiFi.begin(ssid, pass);
+    lastWiFiAttempt = millis();
 
-    while (WiFi.status() != WL_CONNECTED)
-    {
-        delay(300);
-        Serial.print(".");
-    }
-
-    Serial.println("\n[WiFi] Conectado!");
-    Serial.print("IP: ");
-    Serial.println(WiFi.localIP());
+    filaCiclos = xQueueCreate(FILA_CICLOS, sizeof(OutboxRecord));
+    // core 0 (o do WiFi); o loop() do Arduino fica sozinho no core 1
+    xTaskCreatePinnedToCore(networkTask, "rede", 8192, nullptr, 1, &taskRede, 0);
 }
 
 // ------------------------
@@ -36,22 +73,23 @@ void networkInit(const char *ssid, const char *pass, const char *serverIP, int p
 void ensureWiFi()
 {
     if (WiFi.status() == WL_CONNECTED)
+    {
+        if (!relogioConfigurado)
+        {
+            // hora real dos ciclos capturados offline (enviada junto com o seq)
+            configTime(0, 0, "pool.ntp.org", "time.google.com");
+            relogioConfigurado = true;
+        }
         return;
+    }
 
-    Serial.println("[WiFi] PERDEU A CONEXAO! Tentando voltar...");
+    if (millis() - lastWiFiAttempt < 5000)
+        return;
+    lastWiFiAttempt = millis();
 
+    Serial.println("[WiFi] PERDEU A CONEXAO! Tentando voltar...");
     WiFi.disconnect();
     WiFi.reconnect();
-
-    unsigned long start = millis();
-    while (WiFi.status() != WL_CONNECTED && millis() - start < 5000)
-    {
-        delay(200);
-        Serial.print(".");
-    }
-
-    if (WiFi.status() == WL_CONNECTED)
-        Serial.println("\n[WiFi] Reconectado!");
 }
 
 // ------------------------
@@ -62,14 +100,23 @@ bool ensureTCP()
     if (client.connected())
         return true;
 
+    if (WiFi.status() != WL_CONNECTED)
+        return false;
+
+    if ((long)(esperaAte - millis()) > 0)
+        return false;
+
     Serial.println("[TCP] Desconectado! Tentando reconectar...");
 
     client.stop();
-    delay(150);
 
     if (client.connect(_serverIP.c_str(), _serverPort, 2000))
     {
         Serial.println("[TCP] Reconectado!");
+        // o que estava em trânsito sem ACK é reenviado (o servidor descarta repetidos)
+        enviadoAte = outboxTail();
+        ackLen = 0;
+        lastAckMs = millis();
         return true;
     }
 
@@ -78,76 +125,179 @@ bool ensureTCP()
 }
 
 // ------------------------
-//  Loop opcional (manutenção)
+//  ACKs do servidor
 // ------------------------
-void networkLoop()
+static void lerAcks()
 {
-    unsigned long now = millis();
-
-    if (now - lastReconnectAttempt >= 2000)
+    while (client.available())
     {
-        lastReconnectAttempt = now;
-        ensureWiFi();
-        ensureTCP();
+        char c = client.read();
+        if (c != '\n')
+        {
+            if (ackLen < sizeof(ackBuf) - 1)
+                ackBuf[ackLen++] = c;
+            continue;
+        }
+        ackBuf[ackLen] = '\0';
+        ackLen = 0;
+
+        // "ACK <device> <seq>": tudo até seq está gravado no servidor
+        char dev[24];
+        unsigned long seq;
+        if (sscanf(ackBuf, "ACK %23s %lu", dev, &seq) == 2 && strcmp(dev, deviceId) == 0)
+        {
+            outboxAck(seq);
+            lastAckMs = millis();
+            if (enviadoAte < outboxTail())
+                enviadoAte = outboxTail();
+        }
+        // "NACK <device> <seq>": servidor sobrecarregado, nada a partir de seq foi
+        // gravado e ele fecha a conexão; espera e reenvia a partir do pendente
+        else if (sscanf(ackBuf, "NACK %23s %lu", dev, &seq) == 2 && strcmp(dev, deviceId) == 0)
+        {
+            Serial.printf("[TCP] Servidor ocupado (NACK %lu), aguardando %lu ms\n", seq, NACK_ESPERA);
+            esperaAte = millis() + NACK_ESPERA;
+            enviadoAte = outboxTail();
+            client.stop();
+            return;
+        }
     }
 }
 
 // ------------------------
-//   Envio confiável
+//  Envio do outbox
 // ------------------------
-void sendData(const char *codigo,
-              unsigned long tempoProd,
-              unsigned long tempoPause,
-              unsigned long tempoTotal,
-              int qtd)
+static uint32_t epochDoCiclo(const OutboxRecord &rec)
 {
-    // ========== GARANTE WIFI ==========
-    ensureWiFi();
-    if (WiFi.status() != WL_CONNECTED)
+    if (rec.epoch)
+        return rec.epoch;
+
+    // capturado antes da sincronização do relógio: só dá para calcular no mesmo boot
+    time_t agora = time(nullptr);
+    if (rec.boot != outboxBoot() || agora < 1600000000)
+        return 0;
+    return (uint32_t)(agora - (millis() - rec.capturadoMs) / 1000);
+}
+
+static void drenarOutbox()
+{
+    lerAcks();
+    if (!client.connected())
+        return;
+
+    // sem resposta: volta ao mais antigo pendente
+    if (enviadoAte > outboxTail() && millis() - lastAckMs > ACK_TIMEOUT)
     {
-        Serial.println("[WiFi] Sem WiFi, não enviando.");
+        Serial.println("[TCP] Sem ACK, reenviando pendentes...");
+        enviadoAte = outboxTail();
+        lastAckMs = millis();
+    }
+
+    if (enviadoAte < outboxTail())
+        enviadoAte = outboxTail();
+
+    // um quadro binário com todos os pendentes que cabem na janela
+    static uint8_t buf[PROTOCOL_TAMANHO_MAX(LOTE_ENVIO)];
+    ProtocolQuadro quadro;
+    protocolBegin(quadro, buf, sizeof(buf), deviceId);
+
+    uint32_t ate = enviadoAte;
+    while (ate < outboxHead() && ate - outboxTail() < LOTE_ENVIO)
+    {
+        OutboxRecord rec;
+        if (!outboxRead(ate, rec))
+        {
+            Serial.println("[OUTBOX] Registro ilegível, pulando.");
+            // só dá para descartar sem furar o ACK cumulativo se for o mais antigo
+            if (ate == outboxTail())
+                outboxAck(ate + 1);
+            ate++;
+            continue;
+        }
+        if (!protocolAdd(quadro, rec, epochDoCiclo(rec)))
+            break;
+        ate++;
+    }
+
+    if (quadro.registros == 0)
+    {
+        enviadoAte = ate;
         return;
     }
 
-    // ========== GARANTE TCP ==========
-    if (!ensureTCP())
+    size_t len = protocolEnd(quadro);
+    if (client.write(buf, len) != len)
     {
-        Serial.println("[TCP] Sem TCP, não enviando.");
+        Serial.println("[TCP] Erro ao enviar! Reconectando...");
+        client.stop();
         return;
     }
 
-    // ---------- Monta mensagem ----------
-    String msg =
-        String(codigo) + ";" +
-        tempoProd + ";" +
-        tempoPause + ";" +
-        tempoTotal + ";" +
-        qtd + "\n";
+    if (enviadoAte == outboxTail())
+        lastAckMs = millis();
+    enviadoAte = ate;
 
-    // ---------- Envia ----------
-    size_t enviado = client.write((const uint8_t *)msg.c_str(), msg.length());
+    // uma linha por quadro, não por ciclo
+    Serial.printf("[TCP] Quadro com %u ciclo(s) (%u bytes), %u sem ACK\n", quadro.registros, len, outboxCount());
+}
 
-    if (enviado != msg.length())
+// ------------------------
+//  Loop de rede (task própria)
+// ------------------------
+void networkLoop()
+{
+    // ciclos novos vão para a flash aqui, fora do loop() de medição
+    OutboxRecord rec;
+    while (xQueueReceive(filaCiclos, &rec, 0) == pdTRUE)
     {
-        Serial.println("[TCP] Erro ao enviar! Tentando reconectar...");
+        if (!outboxPush(rec))
+            Serial.println("[OUTBOX] Ciclo não gravado!");
+    }
 
-        // PRIMEIRA TENTATIVA DE RECONECTAR
-        if (!ensureTCP())
-        {
-            Serial.println("[TCP] Falha no retry.");
-            return;
-        }
+    unsigned long now = millis();
 
-        // SEGUNDA TENTATIVA DE ENVIO
-        enviado = client.write((const uint8_t *)msg.c_str(), msg.length());
+    if (now - lastReconnectAttempt >= 2000)
+    {
+        lastReconnectAttempt = now;
+        ensureWiFi();
+        if (outboxCount() > 0)
+            ensureTCP();
+    }
 
-        if (enviado != msg.length())
-        {
-            Serial.println("[TCP] Falhou mesmo após reconectar!");
-            return;
-        }
+    if (client.connected())
+        drenarOutbox();
+}
+
+static void networkTask(void *)
+{
+    for (;;)
+    {
+        networkLoop();
+        vTaskDelay(REDE_INTERVALO);
     }
+}
+
+// ------------------------
+//   Registro de ciclo
+// ------------------------
+bool sendData(const char *codigo,
+              unsigned long tempoProdMs,
+              unsigned long tempoPauseMs,
+              unsigned long tempoTotalMs,
+              int qtd,
+              unsigned long loopMaxUs)
+{
+    // só monta o registro e passa para a task de rede (sem esperar fila cheia)
+    OutboxRecord rec = {};
+    time_t agora = time(nullptr);
+    rec.epoch = agora > 1600000000 ? (uint32_t)agora : 0;
+    rec.capturadoMs = millis();
+    rec.tempoProd = tempoProdMs;
+    rec.tempoPausa = tempoPauseMs;
+    rec.tempoTotal = tempoTotalMs;
+    rec.qtd = qtd;
+    rec.loopMaxUs = loopMaxUs;
+    strlcpy(rec.codigo, codigo, sizeof(rec.codigo));
 
-    Serial.print("[TCP] Enviado: ");
-    Serial.println(msg);
+    return filaCiclos != nullptr && xQueueSend(filaCiclos, &rec, 0) == pdTRUE;
 }
@@ -1,14 +1,18 @@
 #ifndef NETWORK_H
 #define NETWORK_H
 
+// conecta em segundo plano e inicia a task de rede (que chama networkLoop())
 void networkInit(const char* ssid, const char* pass, const char* serverIP, int port);
 void networkLoop();
 
-void sendData(const char* codigo,
-              unsigned long tempoProd,
-              unsigned long tempoPause,
-              unsigned long tempoTotal,
-              int qtd);
+// não bloqueia: entrega o ciclo à task de rede; false se a fila estiver cheia.
+// Durações em ms.
+bool sendData(const char* codigo,
+              unsigned long tempoProdMs,
+              unsigned long tempoPauseMs,
+              unsigned long tempoTotalMs,
+              int qtd,
+              unsigned long loopMaxUs);
 
 void ensureWiFi();
 bool ensureTCP();
@@ -0,0 +1,114 @@
+#include <Arduino.h>
+#include <LittleFS.h>
+#include <Preferences.h>
+#include "outbox.h"
+
+// ------------------------
+//  Outbox persistente
+// ------------------------
+// Os ciclos ficam num arquivo de registros de tamanho fixo no LittleFS,
+// usado como buffer circular (slot = índice % OUTBOX_CAPACITY). Os
+// índices head/tail são contadores crescentes guardados na NVS, e o seq
+// de cada ciclo é o próprio índice + 1: confirmar o seq N libera todos os
+// registros até o índice N - 1. Assim nada se perde com a rede fora ou
+// com o ESP reiniciando antes do ACK.
+
+static const char *OUTBOX_FILE = "/outbox.bin";
+
+static Preferences prefs;
+static File arquivo;
+static uint32_t head = 0; // próximo índice a gravar
+static uint32_t tail = 0; // registro mais antigo ainda sem ACK
+static uint32_t boot = 0;
+
+static bool outboxSeek(uint32_t idx)
+{
+    return arquivo.seek((idx % OUTBOX_CAPACITY) * sizeof(OutboxRecord));
+}
+
+bool outboxInit()
+{
+    prefs.begin("outbox", false);
+    head = prefs.getUInt("head", 0);
+    tail = prefs.getUInt("tail", 0);
+    boot = prefs.getUInt("boot", 0) + 1;
+    prefs.putUInt("boot", boot);
+
+    if (!LittleFS.begin(true))
+    {
+        Serial.println("[OUTBOX] Falha ao montar o LittleFS!");
+        return false;
+    }
+
+    const char *modo = LittleFS.exists(OUTBOX_FILE) ? "r+" : "w+";
+    arquivo = LittleFS.open(OUTBOX_FILE, modo);
+    if (!arquivo)
+    {
+        Serial.println("[OUTBOX] Falha ao abrir o arquivo!");
+        return false;
+    }
+
+    // arquivo perdido (formatação) ou gravado com outro formato de registro
+    // (atualização de firmware): os pendentes antigos não podem ser lidos
+    uint32_t formato = (OUTBOX_FORMATO << 16) | sizeof(OutboxRecord);
+    if ((arquivo.size() == 0 || prefs.getUInt("formato", 0) != formato) && head != tail)
+    {
+        Serial.printf("[OUTBOX] %u ciclo(s) antigo(s) descartado(s)\n", head - tail);
+        tail = head;
+        prefs.putUInt("tail", tail);
+    }
+    prefs.putUInt("formato", formato);
+
+    Serial.printf("[OUTBOX] %u ciclo(s) pendente(s), boot %u\n", head - tail, boot);
+    return true;
+}
+
+bool outboxPush(OutboxRecord &rec)
+{
+    if (!arquivo)
+        return false;
+
+    rec.seq = head + 1;
+    rec.boot = boot;
+
+    if (!outboxSeek(head) || arquivo.write((const uint8_t *)&rec, sizeof(rec)) != sizeof(rec))
+    {
+        Serial.println("[OUTBOX] Erro ao gravar ciclo!");
+        return false;
+    }
+    arquivo.flush();
+
+    head++;
+    if (head - tail > OUTBOX_CAPACITY)
+    {
+        // cheio: o slot do mais antigo acabou de ser sobrescrito
+        tail = head - OUTBOX_CAPACITY;
+        prefs.putUInt("tail", tail);
+        Serial.println("[OUTBOX] Cheio! Ciclo mais antigo descartado.");
+    }
+    prefs.putUInt("head", head);
+    return true;
+}
+
+uint32_t outboxHead() { return head; }
+uint32_t outboxTail() { return tail; }
+uint32_t outboxCount() { return head - tail; }
+uint32_t outboxBoot() { return boot; }
+
+bool outboxRead(uint32_t idx, OutboxRecord &rec)
+{
+    if (!arquivo || idx < tail || idx >= head)
+        return false;
+    if (!outboxSeek(idx))
+        return false;
+    return arquivo.read((uint8_t *)&rec, sizeof(rec)) == sizeof(rec) && rec.seq == idx + 1;
+}
+
+void outboxAck(uint32_t seq)
+{
+    // seq N confirma os índices < N
+    if (seq <= tail || seq > head)
+        return;
+    tail = seq;
+    prefs.putUInt("tail", tail);
+}
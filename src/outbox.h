@@ -0,0 +1,39 @@
+#ifndef OUTBOX_H
+#define OUTBOX_H
+
+#include <stdint.h>
+
+// quantos ciclos cabem no outbox (cheio -> descarta o mais antigo)
+#define OUTBOX_CAPACITY 1024
+// muda quando o significado dos campos muda (2: durações em ms)
+#define OUTBOX_FORMATO 2
+
+struct OutboxRecord
+{
+    uint32_t seq;         // número do ciclo na estação (1, 2, 3...)
+    uint32_t epoch;       // hora da captura (0 = relógio ainda não sincronizado)
+    uint32_t capturadoMs; // millis() na captura, para calcular a hora depois
+    uint32_t boot;        // boot em que o ciclo foi capturado
+    uint32_t tempoProd;  // ms
+    uint32_t tempoPausa; // ms
+    uint32_t tempoTotal; // ms
+    int32_t qtd;
+    uint32_t loopMaxUs; // maior duração de uma passada do loop() durante o ciclo
+    char codigo[24];
+};
+
+bool outboxInit();
+// grava o ciclo (seq e boot são preenchidos aqui)
+bool outboxPush(OutboxRecord &rec);
+
+// registros pendentes vão de outboxTail() (mais antigo) a outboxHead() (exclusivo)
+uint32_t outboxHead();
+uint32_t outboxTail();
+uint32_t outboxCount();
+uint32_t outboxBoot();
+bool outboxRead(uint32_t idx, OutboxRecord &rec);
+
+// servidor confirmou tudo até `seq`
+void outboxAck(uint32_t seq);
+
+#endif
@@ -0,0 +1,70 @@
+#include <Arduino.h>
+#include <rom/crc.h>
+#include "protocol.h"
+
+static void put8(ProtocolQuadro &q, uint8_t v)
+{
+    q.buf[q.tamanho++] = v;
+}
+
+static void put16(ProtocolQuadro &q, uint16_t v)
+{
+    put8(q, v & 0xFF);
+    put8(q, v >> 8);
+}
+
+static void put32(ProtocolQuadro &q, uint32_t v)
+{
+    put16(q, v & 0xFFFF);
+    put16(q, v >> 16);
+}
+
+void protocolBegin(ProtocolQuadro &q, uint8_t *buf, size_t capacidade, const char *device)
+{
+    q.buf = buf;
+    q.capacidade = capacidade;
+    q.registros = 0;
+    // cabeçalho é preenchido no protocolEnd()
+    q.tamanho = PROTOCOL_CABECALHO;
+
+    size_t n = strlen(device);
+    put8(q, n);
+    memcpy(q.buf + q.tamanho, device, n);
+    q.tamanho += n;
+}
+
+bool protocolAdd(ProtocolQuadro &q, const OutboxRecord &rec, uint32_t epoch)
+{
+    size_t n = strnlen(rec.codigo, sizeof(rec.codigo));
+    if (q.registros == 0xFF || q.tamanho + PROTOCOL_REGISTRO + n + PROTOCOL_CRC > q.capacidade)
+        return false;
+
+    put32(q, rec.seq);
+    put32(q, epoch);
+    put32(q, rec.tempoProd);
+    put32(q, rec.tempoPausa);
+    put32(q, rec.tempoTotal);
+    put16(q, rec.qtd);
+    put32(q, rec.loopMaxUs);
+    put8(q, n);
+    memcpy(q.buf + q.tamanho, rec.codigo, n);
+    q.tamanho += n;
+    q.registros++;
+    return true;
+}
+
+size_t protocolEnd(ProtocolQuadro &q)
+{
+    size_t corpo = q.tamanho - PROTOCOL_CABECALHO;
+    q.buf[0] = PROTOCOL_MAGIC_0;
+    q.buf[1] = PROTOCOL_MAGIC_1;
+    q.buf[2] = PROTOCOL_VERSAO;
+    q.buf[3] = q.registros;
+    q.buf[4] = corpo & 0xFF;
+    q.buf[5] = corpo >> 8;
+
+    // crc32_le(0, ...) da ROM = zlib.crc32
+    uint32_t crc = crc32_le(0, q.buf, q.tamanho);
+    put32(q, crc);
+    return q.tamanho;
+}
@@ -0,0 +1,41 @@
+#ifndef PROTOCOL_H
+#define PROTOCOL_H
+
+#include <stddef.h>
+#include <stdint.h>
+#include "outbox.h"
+
+// Quadro binário v1 (mesmo layout de api/core/protocol.py), little-endian:
+//   cabeçalho: magic C5 7E | versão u8 | nº de registros u8 | tamanho do corpo u16
+//   corpo:     tamanho do device u8 | device
+//              por registro: seq u32 | epoch u32 | tp_ms u32 | pausa_ms u32 | total_ms u32
+//                            | qtd u16 | loop_us u32 | tamanho do código u8 | código
+//   crc32 (zlib) do cabeçalho + corpo
+
+#define PROTOCOL_MAGIC_0 0xC5
+#define PROTOCOL_MAGIC_1 0x7E
+#define PROTOCOL_VERSAO 1
+
+#define PROTOCOL_CABECALHO 6
+#define PROTOCOL_REGISTRO 27
+#define PROTOCOL_CRC 4
+
+// maior quadro com `n` registros de código até 23 bytes e device até 19
+#define PROTOCOL_TAMANHO_MAX(n) (PROTOCOL_CABECALHO + 1 + 19 + (n) * (PROTOCOL_REGISTRO + 23) + PROTOCOL_CRC)
+
+struct ProtocolQuadro
+{
+    uint8_t *buf;
+    size_t capacidade;
+    size_t tamanho;
+    uint8_t registros;
+};
+
+// começa um quadro em `buf` com o device da estação
+void protocolBegin(ProtocolQuadro &q, uint8_t *buf, size_t capacidade, const char *device);
+// acrescenta um ciclo (epoch já resolvido); false se não couber
+bool protocolAdd(ProtocolQuadro &q, const OutboxRecord &rec, uint32_t epoch);
+// fecha cabeçalho e crc; devolve o tamanho total a enviar
+size_t protocolEnd(ProtocolQuadro &q);
+
+#endif